@@ -0,0 +1,211 @@
+"""
+Run the song metadata backfill against the local fake Spotify server.
+
+Stream history rows for `--songs` new song IDs are imported into a scratch database,
+a share of them unknown to the fake server (answered with null, like removed
+tracks). The backfill then runs twice: the first pass is interrupted after
+`--interrupt-after` track requests, like a Ctrl-C, and the second pass resumes with
+the IDs that are still unknown and the skip list the first pass saved. The report
+gives, per pass, the IDs requested, the batches loaded, the unavailable IDs and the
+IDs requested again although the first pass had already loaded or skipped them.
+
+    python -m benchmarks.backfill --db-uri postgresql://localhost/spotify_bench \
+        --songs 2000 --unknown-share 0.05 --interrupt-after 10
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+
+from sqlalchemy import create_engine
+
+from database.utils import (
+    copy_stream_history,
+    create_database,
+    get_unknown_song_ids,
+    promote_stream_history,
+)
+from utils.backfill import backfill_song_metadata, load_skipped_ids
+from utils.fake_spotify import FakeSpotifyServer, get_fake_spotify_client
+
+
+def run_pass(engine, sp, run: str, args, skip_file: str, interrupt_after=None) -> dict:
+    """
+    Backfill the run's unknown song IDs once, optionally interrupted.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The scratch database engine.
+        sp (spotipy.Spotify): A client of the fake server.
+        run (str): The prefix of this run's song IDs.
+        args (argparse.Namespace): The parsed command line.
+        skip_file (str): Path of the JSON skip list.
+        interrupt_after (Optional[int]): Raise KeyboardInterrupt on this track request.
+
+    Returns:
+        dict: The IDs requested, the backfill totals and whether it was interrupted.
+    """
+    song_ids = [
+        song_id for song_id in get_unknown_song_ids(engine) if song_id.startswith(run)
+    ]
+    requested = []
+    lock = threading.Lock()
+    fetch = sp.tracks
+
+    def tracks(ids, *fetch_args, **fetch_kwargs):
+        with lock:
+            if interrupt_after is not None and len(requested) >= interrupt_after:
+                raise KeyboardInterrupt
+            requested.append(list(ids))
+        return fetch(ids, *fetch_args, **fetch_kwargs)
+
+    sp.tracks = tracks
+    started = time.perf_counter()
+    totals, interrupted = {}, False
+    try:
+        totals = backfill_song_metadata(
+            engine,
+            sp,
+            song_ids,
+            max_workers=args.workers,
+            calls_per_second=args.calls_per_second,
+            skip_file=skip_file,
+        )
+    except KeyboardInterrupt:
+        interrupted = True
+    finally:
+        sp.tracks = fetch
+
+    return {
+        "unknown_ids": len(song_ids),
+        "requested": [song_id for batch in requested for song_id in batch],
+        "interrupted": interrupted,
+        "seconds": round(time.perf_counter() - started, 2),
+        "batches": totals.get("batches"),
+        "failed_batches": totals.get("failed_batches"),
+        "unavailable": totals.get("unavailable"),
+    }
+
+
+def run_benchmark(args) -> dict:
+    rng = random.Random(args.seed)
+    run = uuid.uuid4().hex[:8]
+    song_ids = [f"{run}t{i:05d}" for i in range(args.songs)]
+    unknown_ids = set(rng.sample(song_ids, int(args.songs * args.unknown_share)))
+
+    create_database(args.db_uri)
+    engine = create_engine(args.db_uri)
+    played_at = datetime.datetime(2020, 1, 1)
+    copy_stream_history(
+        engine,
+        (
+            (song_id, (played_at + datetime.timedelta(minutes=i)).isoformat())
+            for i, song_id in enumerate(song_ids)
+        ),
+    )
+
+    skip_file = os.path.join(tempfile.mkdtemp(), "backfill_skipped.json")
+    with FakeSpotifyServer(
+        latency=args.latency,
+        latency_jitter=args.latency,
+        error_rate=args.error_rate,
+        unknown_ids=unknown_ids,
+        seed=args.seed,
+    ) as server:
+        sp = get_fake_spotify_client(
+            server.url,
+            resilient=True,
+            calls_per_second=args.calls_per_second,
+            pool_size=args.workers,
+        )
+        first = run_pass(engine, sp, run, args, skip_file, args.interrupt_after)
+        # Everything the first pass loaded or saved to the skip list is settled.
+        still_unknown = set(get_unknown_song_ids(engine)) - load_skipped_ids(skip_file)
+        settled = set(first["requested"]) - still_unknown
+        second = run_pass(engine, sp, run, args, skip_file)
+
+    promoted = promote_stream_history(engine)
+    remaining = {
+        song_id for song_id in get_unknown_song_ids(engine) if song_id.startswith(run)
+    }
+    engine.dispose()
+
+    passes = []
+    for name, result in (("interrupted", first), ("resumed", second)):
+        requested = result.pop("requested")
+        result["requested_ids"] = len(requested)
+        result["requested_again"] = (
+            len(settled & set(requested)) if name == "resumed" else 0
+        )
+        passes.append({"pass": name, **result})
+
+    return {
+        "songs": args.songs,
+        "unknown_to_server": len(unknown_ids),
+        "skip_list": len(load_skipped_ids(skip_file)),
+        "streams_promoted": promoted,
+        "still_unknown": len(remaining),
+        "all_known_loaded": remaining == unknown_ids,
+        "passes": passes,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db-uri", required=True, help="Scratch database URI")
+    parser.add_argument("--songs", type=int, default=2000)
+    parser.add_argument("--unknown-share", type=float, default=0.05)
+    parser.add_argument(
+        "--interrupt-after",
+        type=int,
+        default=10,
+        help="Interrupt the first pass on this track request",
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--calls-per-second", type=float, default=50.0)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+
+    print(
+        f"{report['songs']} songs, {report['unknown_to_server']} unknown to the "
+        f"server, {report['skip_list']} in the skip list, {report['still_unknown']} "
+        f"still unknown, {report['streams_promoted']} streams promoted"
+    )
+    print(
+        f"{'pass':>12} {'unknown':>8} {'requested':>10} {'again':>6} {'batches':>8} "
+        f"{'failed':>7} {'unavail':>8} {'seconds':>8}"
+    )
+    for result in report["passes"]:
+        # An interrupted pass returns no totals.
+        totals = {
+            key: "-" if result[key] is None else result[key]
+            for key in ("batches", "failed_batches", "unavailable")
+        }
+        print(
+            f"{result['pass']:>12} {result['unknown_ids']:>8} "
+            f"{result['requested_ids']:>10} {result['requested_again']:>6} "
+            f"{totals['batches']:>8} {totals['failed_batches']:>7} "
+            f"{totals['unavailable']:>8} {result['seconds']:>8.2f}"
+        )
+    if not report["all_known_loaded"]:
+        print("Some song IDs the server knows were not loaded")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fp:
+            json.dump(report, fp, indent=4)
+
+    if not report["all_known_loaded"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
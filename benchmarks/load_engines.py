@@ -0,0 +1,134 @@
+"""
+Compare the "insert" and "copy" load engines of database.utils.load_entities.
+
+Each run generates fresh synthetic entity lists (so every row is new) sized by the
+number of streams, loads them with every engine and reports wall time and rows/sec.
+Point it at a scratch database; it creates the tables if needed and leaves the
+generated rows behind.
+
+    python -m benchmarks.load_engines --db-uri postgresql://localhost/spotify_bench \
+        --sizes 50 10000 1000000
+"""
+import argparse
+import datetime
+import json
+import random
+import time
+import uuid
+
+from sqlalchemy import create_engine
+
+from database.models import Album, AlbumArtist, Artist, Song, SongArtist, SongStreamed
+from database.utils import LOAD_ENGINES, create_database, load_entities
+
+
+def generate_entities(num_streams: int, seed: int = 42) -> tuple:
+    """
+    Build entity lists shaped like a parsed ETL batch with `num_streams` streams.
+
+    Songs, albums and artists scale with the number of streams (1/2, 1/4 and 1/5 of
+    it) and every song has one to three artists. IDs carry a random run prefix so
+    repeated runs against the same database insert new rows.
+    """
+    rng = random.Random(seed)
+    run = uuid.uuid4().hex[:8]
+    num_songs = max(1, num_streams // 2)
+    num_albums = max(1, num_streams // 4)
+    num_artists = max(1, num_streams // 5)
+
+    artists = [Artist(id=f"{run}ar{i}", name=f"Artist {i}") for i in range(num_artists)]
+    albums = [
+        Album(id=f"{run}al{i}", name=f"Album {i}", release_year="2020")
+        for i in range(num_albums)
+    ]
+    album_artists = [
+        AlbumArtist(album_id=album.id, artist_id=rng.choice(artists).id)
+        for album in albums
+    ]
+    songs = [
+        Song(
+            id=f"{run}s{i}",
+            name=f"Song {i}",
+            album_id=rng.choice(albums).id,
+            length=rng.randint(90000, 400000),
+        )
+        for i in range(num_songs)
+    ]
+    song_artists = list(
+        {
+            (song.id, artist.id): SongArtist(song_id=song.id, artist_id=artist.id)
+            for song in songs
+            for artist in rng.sample(artists, min(len(artists), rng.randint(1, 3)))
+        }.values()
+    )
+    start = datetime.datetime(2020, 1, 1)
+    streams = [
+        SongStreamed(
+            song_id=rng.choice(songs).id,
+            played_at=start + datetime.timedelta(seconds=i * 181),
+        )
+        for i in range(num_streams)
+    ]
+    return artists, albums, album_artists, songs, song_artists, streams
+
+
+def run_benchmark(db_uri: str, sizes: list[int], engines: list[str]) -> list[dict]:
+    create_database(db_uri)
+    engine = create_engine(db_uri)
+    results = []
+
+    for size in sizes:
+        for load_engine in engines:
+            data_lists = generate_entities(size)
+            total_rows = sum(len(data_list) for data_list in data_lists)
+
+            start = time.perf_counter()
+            try:
+                row_counts, error = load_entities(engine, data_lists, load_engine)
+            except Exception as e:
+                row_counts, error = None, str(e)
+            elapsed = time.perf_counter() - start
+
+            results.append(
+                {
+                    "streams": size,
+                    "engine": load_engine,
+                    "rows": total_rows,
+                    "seconds": round(elapsed, 4),
+                    "rows_per_sec": round(total_rows / elapsed) if elapsed else None,
+                    "row_counts": row_counts,
+                    "error": error and error[:200],
+                }
+            )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db-uri", required=True, help="Scratch database URI")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[50, 10_000, 1_000_000]
+    )
+    parser.add_argument(
+        "--engines", nargs="+", choices=sorted(LOAD_ENGINES), default=sorted(LOAD_ENGINES)
+    )
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.db_uri, args.sizes, args.engines)
+
+    print(f"{'streams':>10} {'engine':>8} {'rows':>10} {'seconds':>10} {'rows/sec':>10}")
+    for result in results:
+        print(
+            f"{result['streams']:>10,} {result['engine']:>8} {result['rows']:>10,} "
+            f"{result['seconds']:>10.3f} {result['rows_per_sec'] or 0:>10,}"
+            + (f"  ERROR: {result['error']}" if result["error"] else "")
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fp:
+            json.dump(results, fp, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Time every public query function of database/utils.py against a benchmark database.
+
+Each query runs once to warm the caches and then `--repeat` times; p50 and p95 wall
+times are reported together with the rows the query read from the music schema
+(sequential plus index tuple reads from pg_stat_user_tables, PostgreSQL 15+). The
+result cache is disabled so every call reaches the database. Results can be written
+as JSON and compared with an earlier run to spot regressions between commits.
+
+    python -m benchmarks.synthetic_data --db-uri postgresql://localhost/spotify_bench --reset
+    python -m benchmarks.queries --db-uri postgresql://localhost/spotify_bench \
+        --json results.json --compare baseline.json
+"""
+import argparse
+import datetime
+import json
+import statistics
+import subprocess
+import time
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine, text
+
+from database import cache, utils
+
+ROWS_READ_SQL = text(
+    "SELECT coalesce(sum(coalesce(seq_tup_read, 0) + coalesce(idx_tup_fetch, 0)), 0) "
+    "FROM pg_stat_user_tables WHERE schemaname = 'music'"
+)
+
+
+def benchmark_queries(engine) -> Dict[str, Callable]:
+    """
+    Map a name to a zero-argument call of every public query function, with
+    representative arguments taken from the data in the database.
+    """
+    today = datetime.datetime.utcnow()
+    yesterday = today - datetime.timedelta(days=1)
+    week = [today - datetime.timedelta(days=offset) for offset in range(7)]
+    week_span = datetime.timedelta(days=7)
+    year = datetime.timedelta(days=365)
+    with engine.connect() as connection:
+        song_id = connection.execute(
+            text(
+                "SELECT song_id FROM music.daily_song_streams "
+                "ORDER BY stream_count DESC LIMIT 1"
+            )
+        ).scalar()
+        artist_id = connection.execute(
+            text("SELECT artist_id FROM music.song_artists WHERE song_id = :song_id"),
+            {"song_id": song_id},
+        ).scalar()
+
+    return {
+        "get_bucketed_stream_counts[day, year]": lambda: (
+            utils.get_bucketed_stream_counts(engine, today - year, today)
+        ),
+        "get_bucketed_stream_counts[hour, week]": lambda: (
+            utils.get_bucketed_stream_counts(engine, today - week_span, today, "hour")
+        ),
+        "get_bucketed_stream_counts[month, artist]": lambda: (
+            utils.get_bucketed_stream_counts(
+                engine, today - 5 * year, today, "month", artist_id=artist_id
+            )
+        ),
+        "get_known_entity_ids": lambda: utils.get_known_entity_ids(engine),
+        "get_latest_played_at": lambda: utils.get_latest_played_at(engine),
+        "get_percentage_difference": lambda: utils.get_percentage_difference(engine),
+        "get_play_counts[since week]": lambda: utils.get_play_counts(
+            engine, today - week_span
+        ),
+        "get_random_songs[uniform]": lambda: utils.get_random_songs(engine, 100),
+        "get_random_songs[play_count]": lambda: utils.get_random_songs(
+            engine, 100, "play_count"
+        ),
+        "get_random_songs[not_recent]": lambda: utils.get_random_songs(
+            engine, 100, "not_recent"
+        ),
+        "get_song_id_count": lambda: utils.get_song_id_count(engine, song_id),
+        "get_songs_by_date": lambda: utils.get_songs_by_date(engine, yesterday),
+        "get_stream_counts_by_day": lambda: utils.get_stream_counts_by_day(engine, week),
+        "get_top_songs_and_artists": lambda: utils.get_top_songs_and_artists(engine),
+        "get_top_songs_by_year": lambda: utils.get_top_songs_by_year(engine, today.year),
+        "get_unknown_song_ids": lambda: utils.get_unknown_song_ids(engine),
+        "get_weekly_summary": lambda: utils.get_weekly_summary(
+            engine, [{"week_day": day.date()} for day in week]
+        ),
+        "get_yesterday_top_ten": lambda: utils.get_yesterday_top_ten(engine),
+        "monthly_summary": lambda: utils.monthly_summary(engine, today),
+        "summary_queries[serial]": lambda: utils.summary_queries(engine, 1),
+        "summary_queries[4 workers]": lambda: utils.summary_queries(engine, 4),
+        "table_counts": lambda: utils.table_counts(engine),
+        "top_streamed_song_ids": lambda: utils.top_streamed_song_ids(engine),
+    }
+
+
+def rows_read(engine) -> Optional[int]:
+    """
+    Return the tuples read from the music tables so far, after flushing this server's
+    pending statistics; None before PostgreSQL 15, where statistics arrive late.
+    """
+    with engine.connect() as connection:
+        if connection.dialect.server_version_info < (15,):
+            return None
+        connection.execute(text("SELECT pg_stat_force_next_flush()"))
+        connection.commit()
+        connection.execute(text("SELECT pg_stat_clear_snapshot()"))
+        return int(connection.execute(ROWS_READ_SQL).scalar())
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+def run_benchmark(db_uri: str, repeat: int = 5, only: Optional[List[str]] = None) -> dict:
+    cache.result_cache.enabled = False
+    engine = create_engine(db_uri, pool_size=4, max_overflow=0)
+    stats_engine = create_engine(db_uri, pool_size=1, max_overflow=0)
+
+    def measure_rows_read() -> Optional[int]:
+        # Closed backends flush their statistics on exit.
+        engine.dispose()
+        time.sleep(0.1)
+        return rows_read(stats_engine)
+
+    queries = benchmark_queries(engine)
+
+    results = []
+    for name, query in queries.items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        query()
+        before = measure_rows_read()
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            query()
+            samples.append(time.perf_counter() - start)
+        after = measure_rows_read()
+        results.append(
+            {
+                "query": name,
+                "runs": repeat,
+                "p50_ms": round(statistics.median(samples) * 1000, 2),
+                "p95_ms": round(percentile(samples, 0.95) * 1000, 2),
+                "min_ms": round(min(samples) * 1000, 2),
+                "rows_read": (
+                    (after - before) // repeat
+                    if before is not None and after is not None
+                    else None
+                ),
+            }
+        )
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "run_at": datetime.datetime.utcnow().isoformat(),
+        "table_counts": {
+            row["model"].__tablename__: row["count"] for row in utils.table_counts(engine)
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db-uri", required=True, help="Benchmark database URI")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--only", nargs="+", help="Run the queries whose name contains one of these"
+    )
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    parser.add_argument("--compare", help="Earlier JSON results to compare p50 against")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.db_uri, args.repeat, args.only)
+    baseline = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as fp:
+            baseline = {row["query"]: row for row in json.load(fp)["results"]}
+
+    print(f"commit {report['commit']}, {report['table_counts']}")
+    print(
+        f"{'query':<44} {'p50 ms':>10} {'p95 ms':>10} {'rows read':>12}"
+        + (f" {'vs base':>8}" if baseline else "")
+    )
+    for row in report["results"]:
+        line = (
+            f"{row['query']:<44} {row['p50_ms']:>10.2f} {row['p95_ms']:>10.2f} "
+            f"{row['rows_read'] if row['rows_read'] is not None else '-':>12}"
+        )
+        base = baseline.get(row["query"])
+        if base and base["p50_ms"]:
+            line += f" {row['p50_ms'] / base['p50_ms']:>7.2f}x"
+        print(line)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fp:
+            json.dump(report, fp, indent=4)
+
+
+if __name__ == "__main__":
+    main()
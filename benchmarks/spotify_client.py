@@ -0,0 +1,139 @@
+"""
+Load-test the Spotify client against the local fake Spotify server.
+
+Worker threads share one client and run the calls the commands make: recently
+played, currently playing, track lookups and playlist syncs. The fake server adds
+latency, answers 429 above its rate limit and fails a share of requests with 5xx,
+half of the failed writes after applying them, so the run shows how the client's
+retries, rate limiter and GET cache hold up. The report gives the failed calls, the
+requests that reached the server, the tracks that ended up twice in a playlist
+(a write repeated after it was applied) and the client's counters for the plain
+spotipy client and for ResilientSpotify.
+
+    python -m benchmarks.spotify_client --workers 8 --calls 50 --rate-limit 40 \
+        --error-rate 0.05 --latency 0.02
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from typing import List
+
+from utils.fake_spotify import FakeSpotifyServer, get_fake_spotify_client
+from utils.playlist_sync import sync_playlist
+
+
+def workload(sp, worker: int, calls: int, seed: int) -> int:
+    """
+    Make `calls` client calls in a random mix; return the number that failed.
+    """
+    rng = random.Random(seed + worker)
+    track_ids = [f"track{i:04d}" for i in range(300)]
+    playlist_id = f"playlist{worker}"
+    failures = 0
+    for _ in range(calls):
+        choice = rng.random()
+        try:
+            if choice < 0.3:
+                sp.current_user_recently_played(limit=50)
+            elif choice < 0.5:
+                sp.currently_playing()
+            elif choice < 0.8:
+                sp.tracks(rng.sample(track_ids, 50))
+            else:
+                sync_playlist(sp, playlist_id, rng.sample(track_ids, rng.randint(20, 150)))
+        except Exception:
+            failures += 1
+    return failures
+
+
+def run_client(kind: str, args) -> dict:
+    with FakeSpotifyServer(
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        latency_jitter=args.latency,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    ) as server:
+        server.add_plays([f"track{i:04d}" for i in range(100)])
+        server.now_playing = "track0001"
+        if kind == "resilient":
+            sp = get_fake_spotify_client(
+                server.url,
+                resilient=True,
+                calls_per_second=args.rate_limit or 1000,
+                pool_size=args.workers,
+            )
+        else:
+            sp = get_fake_spotify_client(server.url)
+
+        failures: List[int] = []
+        threads = [
+            threading.Thread(
+                target=lambda worker=worker: failures.append(
+                    workload(sp, worker, args.calls, args.seed)
+                )
+            )
+            for worker in range(args.workers)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - started
+
+        return {
+            "client": kind,
+            "calls": args.workers * args.calls,
+            "failed": sum(failures),
+            "seconds": round(seconds, 2),
+            "server_requests": server.request_count,
+            "server_429": server.throttled_count,
+            "server_5xx": server.error_count,
+            "server_5xx_applied": server.applied_error_count,
+            "duplicate_tracks": sum(
+                len(playlist["tracks"]) - len(set(playlist["tracks"]))
+                for playlist in server.playlists.values()
+            ),
+            "client_stats": sp.stats() if kind == "resilient" else None,
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=50, help="Calls per worker")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--rate-limit", type=float, default=40.0)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--clients", nargs="+", choices=["plain", "resilient"], default=["plain", "resilient"]
+    )
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = [run_client(kind, args) for kind in args.clients]
+
+    print(
+        f"{'client':>10} {'calls':>7} {'failed':>7} {'seconds':>8} {'requests':>9} "
+        f"{'429':>6} {'5xx':>6} {'applied':>7} {'dupes':>5}  client stats"
+    )
+    for result in results:
+        print(
+            f"{result['client']:>10} {result['calls']:>7} {result['failed']:>7} "
+            f"{result['seconds']:>8.2f} {result['server_requests']:>9} "
+            f"{result['server_429']:>6} {result['server_5xx']:>6} "
+            f"{result['server_5xx_applied']:>7} {result['duplicate_tracks']:>5}  "
+            f"{result['client_stats'] or ''}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fp:
+            json.dump(results, fp, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Check that every CLI command starts within its import time budget.
+
+Each command's modules (main.COMMAND_MODULES) are imported in a fresh interpreter
+under `python -X importtime`, the cumulative time of the top-level imports is summed
+and compared with the command's budget. The script exits with status 1 when any
+command is over budget, so it can gate CI or a deploy.
+
+Before measuring, the lists are checked against the imports of the command functions
+themselves (see derive_command_modules); a list that drifted fails the check too, as
+its import time would no longer mean anything.
+
+    python -m benchmarks.startup_time --budget-ms 750 --budget etl=600 --repeat 3
+"""
+import argparse
+import ast
+import json
+import subprocess
+import sys
+
+import main as cli
+from main import COMMAND_MODULES
+
+DEFAULT_BUDGET_MS = 750.0
+
+
+def derive_command_modules(source_path: str = cli.__file__) -> dict:
+    """
+    Derive each command's modules from the lazy imports in main.py.
+
+    A command is mapped to its function through the `match args.function` cases of
+    main(). Its modules are those imported inside the function body plus, through
+    any reference to another function of main.py (e.g. daemon's job table), those of
+    the functions it runs.
+
+    Args:
+        source_path (str): The path of main.py.
+
+    Returns:
+        dict: The sorted module names per command.
+    """
+    with open(source_path, encoding="utf-8") as fp:
+        tree = ast.parse(fp.read())
+    functions = {
+        node.name: node for node in tree.body if isinstance(node, ast.FunctionDef)
+    }
+
+    commands = {}
+    for node in ast.walk(functions["main"]):
+        if not isinstance(node, ast.match_case):
+            continue
+        if not isinstance(node.pattern, ast.MatchValue):
+            continue  # the wildcard case
+        call = node.body[0].value
+        commands[node.pattern.value.value] = call.func.id
+
+    def modules_of(name: str, seen: set) -> set:
+        seen.add(name)
+        modules = set()
+        for node in ast.walk(functions[name]):
+            if isinstance(node, ast.ImportFrom) and not node.level:
+                modules.add(node.module)
+            elif isinstance(node, ast.Import):
+                modules.update(alias.name for alias in node.names)
+            elif (
+                isinstance(node, ast.Name)
+                and node.id in functions
+                and node.id not in seen
+            ):
+                modules |= modules_of(node.id, seen)
+        return modules
+
+    return {
+        command: sorted(modules_of(function, set()))
+        for command, function in commands.items()
+    }
+
+
+def check_command_modules() -> list[str]:
+    """
+    Compare main.COMMAND_MODULES with the modules derived from the command functions.
+
+    Returns:
+        list[str]: One line per command whose list differs; empty when in sync.
+    """
+    derived = derive_command_modules()
+    errors = []
+    for command in sorted(set(COMMAND_MODULES) | set(derived)):
+        listed = set(COMMAND_MODULES.get(command, []))
+        imported = set(derived.get(command, []))
+        if listed != imported:
+            errors.append(
+                f"{command}: missing {sorted(imported - listed)}, "
+                f"unused {sorted(listed - imported)}"
+            )
+    return errors
+
+
+def parse_importtime(stderr: str) -> dict:
+    """
+    Sum the cumulative import time of the top-level modules in `-X importtime` output.
+
+    Args:
+        stderr (str): The interpreter's stderr, one "import time:" line per module.
+
+    Returns:
+        dict: "total_ms" and the "slowest" top-level modules as (name, ms) pairs.
+    """
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        # Nested imports are indented by two spaces per level below the top level.
+        if name.startswith(" ") and not name.startswith("  "):
+            top_level.append((name.strip(), int(cumulative) / 1000))
+
+    return {
+        "total_ms": round(sum(ms for _, ms in top_level), 1),
+        "slowest": sorted(top_level, key=lambda item: item[1], reverse=True)[:5],
+    }
+
+
+def measure_command(command: str) -> dict:
+    """
+    Import `main` and the modules of one command in a fresh interpreter.
+
+    The modules are imported with plain import statements rather than
+    main.load_command, because `-X importtime` only tracks nesting for those.
+
+    Args:
+        command (str): A key of main.COMMAND_MODULES.
+
+    Returns:
+        dict: See parse_importtime.
+    """
+    process = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "; ".join(
+                ["import main"]
+                + [f"import {module_name}" for module_name in COMMAND_MODULES[command]]
+            ),
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(process.stderr)
+
+
+def run_benchmark(commands: list[str], budgets: dict, repeat: int = 3) -> list[dict]:
+    results = []
+    for command in commands:
+        # The first run also warms the bytecode and filesystem caches; keep the best.
+        runs = [measure_command(command) for _ in range(repeat)]
+        best = min(runs, key=lambda run: run["total_ms"])
+        budget = budgets.get(command, budgets["default"])
+        results.append(
+            {
+                "command": command,
+                "import_ms": best["total_ms"],
+                "budget_ms": budget,
+                "ok": best["total_ms"] <= budget,
+                "slowest": best["slowest"],
+            }
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--commands",
+        nargs="+",
+        choices=sorted(COMMAND_MODULES),
+        default=sorted(COMMAND_MODULES),
+    )
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=DEFAULT_BUDGET_MS,
+        help="Import time budget for commands without their own --budget",
+    )
+    parser.add_argument(
+        "--budget",
+        action="append",
+        default=[],
+        metavar="COMMAND=MS",
+        help="Per-command budget, may be repeated",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    budgets = {"default": args.budget_ms}
+    for entry in args.budget:
+        command, ms = entry.split("=", 1)
+        budgets[command] = float(ms)
+
+    drift = check_command_modules()
+    for line in drift:
+        print(f"COMMAND_MODULES out of sync with main.py: {line}")
+
+    results = run_benchmark(args.commands, budgets, args.repeat)
+
+    print(f"{'command':<28} {'import ms':>10} {'budget':>8}  slowest imports")
+    for result in results:
+        slowest = ", ".join(f"{name} {ms:.0f}" for name, ms in result["slowest"][:3])
+        print(
+            f"{result['command']:<28} {result['import_ms']:>10.1f} "
+            f"{result['budget_ms']:>8.0f}  {slowest}"
+            + ("" if result["ok"] else "  <-- over budget")
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fp:
+            json.dump(results, fp, indent=4)
+
+    if drift or not all(result["ok"] for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Fill a scratch database with realistic, skewed synthetic listening history.
+
+Song popularity follows a Zipf distribution (a few songs get most plays), artist
+popularity is Zipfian as well, every song has one to three artists, and the
+streams are spread over several years in played_at order. Rows are loaded with
+COPY in chunks, with the rollup trigger disabled and the rollups rebuilt once at
+the end. Point it at a database used only for benchmarks: --reset empties every
+table of the music schema first. With --partitioned a new database gets a streams
+table partitioned by month, with a partition for every generated month.
+
+    python -m benchmarks.synthetic_data --db-uri postgresql://localhost/spotify_bench \
+        --streams 10000000 --songs 200000 --artists 20000 --years 5 --reset
+"""
+import argparse
+import datetime
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from database.models import Base
+from database.partitioning import ensure_partitions, is_partitioned
+from database.utils import copy_rows, create_database, rebuild_rollups
+
+CHUNK_SIZE = 1_000_000
+
+
+def zipf_probabilities(size: int, exponent: float) -> np.ndarray:
+    """Probability of each rank 1..size under a (finite) Zipf distribution."""
+    weights = 1.0 / np.arange(1, size + 1) ** exponent
+    return weights / weights.sum()
+
+
+def generate_catalog(
+    rng: np.random.Generator,
+    num_songs: int,
+    num_albums: int,
+    num_artists: int,
+    exponent: float,
+) -> dict:
+    """
+    Build artists, albums, songs and their artist links as row tuples.
+
+    Popular artists (by Zipf rank) get proportionally more songs and albums.
+    """
+    artist_ids = np.array([f"bart{i:07d}" for i in range(num_artists)])
+    album_ids = np.array([f"balb{i:07d}" for i in range(num_albums)])
+    song_ids = np.array([f"bsng{i:08d}" for i in range(num_songs)])
+    artist_p = zipf_probabilities(num_artists, exponent)
+
+    album_artist = rng.choice(num_artists, size=num_albums, p=artist_p)
+    song_album = rng.integers(0, num_albums, size=num_songs)
+    extra_artists = rng.choice(num_artists, size=(num_songs, 2), p=artist_p)
+    artist_count = rng.choice([1, 2, 3], size=num_songs, p=[0.7, 0.2, 0.1])
+
+    song_artists = set()
+    for song, album in enumerate(song_album):
+        song_artists.add((song_ids[song], artist_ids[album_artist[album]]))
+        for extra in extra_artists[song, : artist_count[song] - 1]:
+            song_artists.add((song_ids[song], artist_ids[extra]))
+
+    return {
+        "artists": [(artist_id, f"Artist {artist_id}") for artist_id in artist_ids],
+        "albums": [
+            (album_id, f"Album {album_id}", str(rng.integers(1960, 2025)))
+            for album_id in album_ids
+        ],
+        "album_artists": [
+            (album_ids[album], artist_ids[artist])
+            for album, artist in enumerate(album_artist)
+        ],
+        "songs": [
+            (song_ids[song], f"Song {song_ids[song]}", album_ids[album], int(length))
+            for song, (album, length) in enumerate(
+                zip(song_album, rng.integers(90_000, 420_000, size=num_songs))
+            )
+        ],
+        "song_artists": sorted(song_artists),
+        "song_ids": song_ids,
+    }
+
+
+def generate_stream_chunks(
+    rng: np.random.Generator,
+    song_ids: np.ndarray,
+    num_streams: int,
+    years: float,
+    exponent: float,
+    chunk_size: int = CHUNK_SIZE,
+):
+    """
+    Yield (song_id, played_at) rows in played_at order, `chunk_size` at a time.
+
+    Stream i is played in the i-th of `num_streams` equal slices of the last `years`
+    years, at a random offset inside the slice, so timestamps are unique and sorted.
+    """
+    song_p = zipf_probabilities(len(song_ids), exponent)
+    # Shuffle which song gets which popularity rank.
+    song_p = song_p[rng.permutation(len(song_ids))]
+    end = datetime.datetime.utcnow().replace(microsecond=0)
+    start = end - datetime.timedelta(days=365.25 * years)
+    slice_us = (end - start) / datetime.timedelta(microseconds=1) / num_streams
+    start_us = np.datetime64(start, "us")
+
+    for offset in range(0, num_streams, chunk_size):
+        size = min(chunk_size, num_streams - offset)
+        songs = rng.choice(len(song_ids), size=size, p=song_p)
+        positions = np.arange(offset, offset + size) + rng.random(size)
+        played_at = start_us + (positions * slice_us).astype("timedelta64[us]")
+        yield list(zip(song_ids[songs], played_at.astype(datetime.datetime)))
+
+
+def load_synthetic_data(
+    db_uri: str,
+    num_streams: int,
+    num_songs: int,
+    num_albums: int,
+    num_artists: int,
+    years: float,
+    exponent: float = 1.1,
+    seed: int = 42,
+    reset: bool = False,
+    partitioned: bool = False,
+    log=print,
+) -> dict:
+    """
+    Generate and COPY a synthetic catalog and listening history into the database.
+
+    Returns:
+        dict: Rows loaded per table and the seconds spent.
+    """
+    create_database(db_uri, partition_streams=partitioned)
+    engine = create_engine(db_uri)
+    if is_partitioned(engine):
+        ensure_partitions(
+            engine,
+            start=datetime.datetime.utcnow() - datetime.timedelta(days=365.25 * years),
+        )
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+
+    if reset:
+        tables = ", ".join(
+            f"music.{table.name}"
+            for table in Base.metadata.sorted_tables
+            if table.schema == "music"
+        )
+        with engine.begin() as connection:
+            connection.execute(text(f"TRUNCATE {tables} CASCADE"))
+
+    catalog = generate_catalog(rng, num_songs, num_albums, num_artists, exponent)
+    row_counts = {}
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            for table, columns in (
+                ("artists", ["id", "name"]),
+                ("albums", ["id", "name", "release_year"]),
+                ("album_artists", ["album_id", "artist_id"]),
+                ("songs", ["id", "name", "album_id", "length"]),
+                ("song_artists", ["song_id", "artist_id"]),
+            ):
+                copy_rows(cursor, f"music.{table}", columns, catalog[table])
+                row_counts[table] = len(catalog[table])
+            connection.commit()
+            log(f"Catalog loaded: {row_counts}")
+
+            cursor.execute(
+                "ALTER TABLE music.streams DISABLE TRIGGER streams_update_rollups"
+            )
+            connection.commit()
+            row_counts["streams"] = 0
+            for chunk in generate_stream_chunks(
+                rng, catalog["song_ids"], num_streams, years, exponent
+            ):
+                copy_rows(cursor, "music.streams", ["song_id", "played_at"], chunk)
+                connection.commit()
+                row_counts["streams"] += len(chunk)
+                log(f"Streams loaded: {row_counts['streams']:,}/{num_streams:,}")
+            cursor.execute("ALTER TABLE music.streams ENABLE TRIGGER streams_update_rollups")
+            connection.commit()
+    finally:
+        connection.close()
+
+    row_counts.update(rebuild_rollups(engine))
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("VACUUM ANALYZE"))
+    row_counts["seconds"] = round(time.perf_counter() - started, 1)
+    return row_counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db-uri", required=True, help="Scratch database URI")
+    parser.add_argument("--streams", type=int, default=1_000_000)
+    parser.add_argument("--songs", type=int, default=50_000)
+    parser.add_argument("--albums", type=int, default=None, help="Default: songs / 10")
+    parser.add_argument("--artists", type=int, default=None, help="Default: songs / 10")
+    parser.add_argument("--years", type=float, default=5.0)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--reset", action="store_true", help="Empty the music tables before loading"
+    )
+    parser.add_argument(
+        "--partitioned",
+        action="store_true",
+        help="Create streams partitioned by month (new PostgreSQL databases only)",
+    )
+    args = parser.parse_args()
+
+    print(
+        load_synthetic_data(
+            args.db_uri,
+            args.streams,
+            args.songs,
+            args.albums or max(1, args.songs // 10),
+            args.artists or max(1, args.songs // 10),
+            args.years,
+            args.zipf,
+            args.seed,
+            args.reset,
+            args.partitioned,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
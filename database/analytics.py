@@ -0,0 +1,229 @@
+"""
+Analytics copy of the music tables for the summary queries.
+
+The summary queries aggregate whole years of rollups and streams. Run against a
+columnar embedded engine such as DuckDB (`duckdb:///analytics.duckdb`, needs the
+optional duckdb_engine package) they scan only the columns they use and answer in
+well under a second, without loading the primary database. Any URL that
+database.backend.create_engine accepts works as a target, so SQLite can hold a
+portable copy as well.
+
+The copy has the same tables as the primary database without foreign keys; a
+columnar engine gets no primary keys or indexes either, as it scans by column
+anyway. It is refreshed incrementally by sync_analytics:
+
+    catalog tables  rows that are new or changed since the last sync
+    streams         the days whose stream count differs between the two databases
+    rollups         rebuilt in the copy after streams changed (no triggers needed)
+"""
+import datetime
+import functools
+import operator
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import Column, Index, MetaData, Table, delete, insert, select
+
+from database import backend
+from database.models import (
+    Album,
+    AlbumArtist,
+    Artist,
+    Base,
+    DailyStreamCount,
+    Song,
+    SongArtist,
+    SongStreamed,
+)
+from database.utils import SessionManager, day_bounds, played_within, rebuild_rollups
+
+CATALOG_MODELS = [Artist, Album, AlbumArtist, Song, SongArtist]
+
+
+@functools.lru_cache(maxsize=None)
+def get_analytics_engine(url: str):
+    """Return one engine per analytics URL for the life of the process."""
+    return backend.create_engine(url)
+
+
+def analytics_metadata(columnar: bool = True) -> MetaData:
+    """
+    Copies of the model tables without foreign keys, for creating the analytics copy.
+
+    Args:
+        columnar (bool, optional): Also leave out primary keys and indexes.
+    """
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        copy = Table(
+            table.name,
+            metadata,
+            *(
+                Column(
+                    column.name,
+                    column.type,
+                    primary_key=column.primary_key and not columnar,
+                )
+                for column in table.columns
+            ),
+            schema=table.schema,
+        )
+        if not columnar:
+            for index in table.indexes:
+                Index(index.name, *(copy.c[column.name] for column in index.columns))
+    return metadata
+
+
+def create_analytics_database(engine) -> None:
+    backend.create_schema(engine)
+    analytics_metadata(columnar=backend.dialect_name(engine) == "duckdb").create_all(
+        engine
+    )
+
+
+def day_ranges(
+    days: Iterable[datetime.date],
+) -> List[Tuple[datetime.datetime, datetime.datetime]]:
+    """
+    Merge days into half-open [start, end) timestamp ranges of consecutive days.
+    """
+    ranges = []
+    for day in sorted(days):
+        start, end = day_bounds(day)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def daily_stream_counts(engine) -> Dict[datetime.date, int]:
+    with SessionManager(engine) as session:
+        return {
+            day: count
+            for day, count in session.query(
+                DailyStreamCount.day, DailyStreamCount.stream_count
+            )
+        }
+
+
+def sync_catalog_table(source, target, model, chunk_size: int) -> int:
+    """
+    Copy the rows of a catalog table that are missing from, or differ in, the target.
+
+    The source is read `chunk_size` rows at a time and each chunk is diffed by primary
+    key: the target rows sharing the chunk's first key column are looked up with one
+    IN query, and only keys present on both sides are compared column by column.
+    Memory is bounded by the chunk size rather than by the size of the catalog.
+    Changed rows are replaced by primary key. Rows deleted from the source are kept.
+
+    Returns:
+        int: The number of rows written.
+    """
+    table = model.__table__
+    key_columns = list(table.primary_key.columns)
+    lookup = key_columns[0]
+    names = [column.name for column in table.columns]
+    # Rows are compared as tuples in table column order, keyed by their primary key.
+    primary_key = operator.itemgetter(
+        *(names.index(column.name) for column in key_columns)
+    )
+    lookup_value = operator.itemgetter(names.index(lookup.name))
+
+    written = 0
+    with source.connect() as source_connection, target.begin() as target_connection:
+        result = source_connection.execution_options(
+            stream_results=True, yield_per=chunk_size
+        ).execute(select(table))
+        for partition in result.partitions():
+            source_rows = [tuple(row) for row in partition]
+            existing = {
+                primary_key(row): tuple(row)
+                for row in target_connection.execute(
+                    select(table).where(
+                        lookup.in_({lookup_value(row) for row in source_rows})
+                    )
+                )
+            }
+            rows = [row for row in source_rows if existing.get(primary_key(row)) != row]
+            if not rows:
+                continue
+            changed = [row for row in rows if primary_key(row) in existing]
+            if changed and len(key_columns) == 1:
+                target_connection.execute(
+                    delete(table).where(
+                        lookup.in_([lookup_value(row) for row in changed])
+                    )
+                )
+            target_connection.execute(
+                insert(table), [dict(zip(names, row)) for row in rows]
+            )
+            written += len(rows)
+    return written
+
+
+def sync_streams(source, target, chunk_size: int) -> Tuple[int, int]:
+    """
+    Recopy the streams of every day whose count differs between source and target.
+
+    The source counts come from its trigger maintained rollup and the target counts
+    from the rollup rebuilt at the end of the previous sync, so comparing them costs
+    two small queries and also catches backfilled history from older exports.
+
+    Returns:
+        tuple: The number of days recopied and of stream rows written.
+    """
+    source_days = daily_stream_counts(source)
+    target_days = daily_stream_counts(target)
+    stale_days = {
+        day
+        for day in source_days.keys() | target_days.keys()
+        if source_days.get(day) != target_days.get(day)
+    }
+
+    written = 0
+    table = SongStreamed.__table__
+    for start, end in day_ranges(stale_days):
+        with source.connect() as source_connection, target.begin() as target_connection:
+            target_connection.execute(
+                delete(table).where(played_within(table.c.played_at, start, end))
+            )
+            result = source_connection.execution_options(
+                stream_results=True, yield_per=chunk_size
+            ).execute(
+                select(table.c.song_id, table.c.played_at)
+                .where(played_within(table.c.played_at, start, end))
+                .order_by(table.c.played_at)
+            )
+            for partition in result.partitions():
+                target_connection.execute(
+                    insert(table), [row._asdict() for row in partition]
+                )
+                written += len(partition)
+    return len(stale_days), written
+
+
+def sync_analytics(source, target, chunk_size: int = 50_000) -> Dict[str, int]:
+    """
+    Bring the analytics copy up to date with the primary database.
+
+    Args:
+        source (sqlalchemy.engine.Engine): The primary database.
+        target (sqlalchemy.engine.Engine): The analytics copy; its tables are created
+                                           on the first sync.
+        chunk_size (int, optional): Rows read and written at a time.
+
+    Returns:
+        Dict[str, int]: Rows written per model name, the number of days whose streams
+                        were recopied and, when there were any, the rollup rows.
+    """
+    create_analytics_database(target)
+    row_counts = {
+        model.__name__: sync_catalog_table(source, target, model, chunk_size)
+        for model in CATALOG_MODELS
+    }
+    row_counts["stale_days"], row_counts[SongStreamed.__name__] = sync_streams(
+        source, target, chunk_size
+    )
+    if row_counts["stale_days"]:
+        row_counts.update(rebuild_rollups(target))
+    return row_counts
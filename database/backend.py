@@ -0,0 +1,183 @@
+"""
+Dialect differences between the supported database engines.
+
+The models and query functions are written once against SQLAlchemy; the helpers
+here supply the pieces that differ per engine:
+
+    postgresql  the primary store: COPY, TABLESAMPLE, statement level triggers
+    sqlite      embedded store; the music schema is mapped to the main database
+    duckdb      columnar analytics copy (see database/analytics.py, needs duckdb_engine)
+
+DuckDB speaks the PostgreSQL dialect for everything used here (date_trunc,
+generate_series, ON CONFLICT), so only SQLite needs its own date math.
+"""
+import datetime
+import math
+import sqlite3
+from typing import Iterator
+
+import sqlalchemy
+from sqlalchemy import (
+    Date,
+    DateTime,
+    Integer,
+    cast,
+    event,
+    func,
+    literal_column,
+    text,
+    type_coerce,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+
+# strftime formats truncating an SQLite timestamp to the start of a bucket; weeks
+# start on Monday (step to the coming Sunday, then back six days).
+SQLITE_BUCKET_FORMATS = {
+    "hour": ("%Y-%m-%d %H:00:00",),
+    "day": ("%Y-%m-%d 00:00:00",),
+    "week": ("%Y-%m-%d 00:00:00", "weekday 0", "-6 days"),
+    "month": ("%Y-%m-01 00:00:00",),
+    "year": ("%Y-01-01 00:00:00",),
+}
+
+
+def dialect_name(bind) -> str:
+    """Return "postgresql", "sqlite" or "duckdb" for an engine, connection or session."""
+    if hasattr(bind, "get_bind"):
+        bind = bind.get_bind()
+    return bind.dialect.name
+
+
+def is_postgresql(bind) -> bool:
+    """True only for a PostgreSQL server (COPY, TABLESAMPLE, pg_class and triggers)."""
+    return dialect_name(bind) == "postgresql"
+
+
+def is_sqlite(bind) -> bool:
+    return dialect_name(bind) == "sqlite"
+
+
+def _sqlite_connect(dbapi_connection, connection_record) -> None:
+    dbapi_connection.execute("PRAGMA foreign_keys = ON")
+    dbapi_connection.execute("PRAGMA journal_mode = WAL")
+    try:
+        dbapi_connection.execute("SELECT ln(1)")
+    except sqlite3.OperationalError:
+        # SQLite built without the math functions.
+        dbapi_connection.create_function("ln", 1, math.log, deterministic=True)
+
+
+def create_engine(url, **kwargs):
+    """
+    Create an engine for any supported database URL.
+
+    For SQLite the `music` schema of the models is translated to the main database,
+    foreign keys are enforced and the WAL journal lets readers run during a load.
+    Other URLs are passed to `sqlalchemy.create_engine` unchanged.
+
+    Args:
+        url (str | sqlalchemy.engine.URL): The database URL.
+        **kwargs: Passed to `sqlalchemy.create_engine`.
+    """
+    engine = sqlalchemy.create_engine(url, **kwargs)
+    if make_url(url).get_backend_name() == "sqlite":
+        event.listen(engine, "connect", _sqlite_connect)
+        return engine.execution_options(schema_translate_map={"music": None})
+    return engine
+
+
+def create_schema(engine) -> None:
+    """Create the music schema where the engine has schemas."""
+    if is_sqlite(engine):
+        return
+    with engine.begin() as connection:
+        connection.execute(text("CREATE SCHEMA IF NOT EXISTS music"))
+
+
+def insert(bind, model):
+    """
+    Return an INSERT for the model that supports `on_conflict_do_nothing()`.
+    """
+    if is_sqlite(bind):
+        return sqlite.insert(model)
+    return postgresql.insert(model)
+
+
+def truncate_to(bind, bucket: str, column):
+    """
+    Truncate a timestamp or date expression to the start of its bucket (see TIME_BUCKETS).
+
+    Returns:
+        A DateTime expression.
+    """
+    if is_sqlite(bind):
+        fmt, *modifiers = SQLITE_BUCKET_FORMATS[bucket]
+        return type_coerce(func.strftime(fmt, column, *modifiers), DateTime)
+    return func.date_trunc(literal_column(f"'{bucket}'"), column)
+
+
+def to_date(bind, column):
+    """The calendar day of a timestamp expression."""
+    if is_sqlite(bind):
+        return type_coerce(func.date(column), Date)
+    return cast(column, Date)
+
+
+def days_since(bind, column):
+    """Whole days from a date expression to today."""
+    if is_sqlite(bind):
+        return cast(func.julianday(func.date("now")) - func.julianday(column), Integer)
+    return func.current_date() - column
+
+
+def least(bind, *expressions):
+    if is_sqlite(bind):
+        return func.min(*expressions)
+    return func.least(*expressions)
+
+
+def random_fraction(bind):
+    """A uniform random number in [0, 1) per row."""
+    if is_sqlite(bind):
+        # SQLite's random() is a signed 64 bit integer.
+        return func.random() / 18446744073709551616.0 + 0.5
+    return func.random()
+
+
+def truncate_datetime(value: datetime.datetime, bucket: str) -> datetime.datetime:
+    """Python counterpart of truncate_to."""
+    if bucket == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    day = datetime.datetime.combine(value.date(), datetime.time.min)
+    if bucket == "week":
+        return day - datetime.timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    if bucket == "year":
+        return day.replace(month=1, day=1)
+    return day
+
+
+def next_bucket(value: datetime.datetime, bucket: str) -> datetime.datetime:
+    """The start of the bucket following the one starting at `value`."""
+    if bucket in ("hour", "day", "week"):
+        return value + datetime.timedelta(**{f"{bucket}s": 1})
+    if bucket == "month":
+        return value.replace(
+            year=value.year + value.month // 12, month=value.month % 12 + 1
+        )
+    return value.replace(year=value.year + 1)
+
+
+def bucket_starts(
+    start: datetime.datetime, end: datetime.datetime, bucket: str
+) -> Iterator[datetime.datetime]:
+    """
+    Yield the start of every bucket from the one containing `start` up to `end`
+    (exclusive), like generate_series over truncated timestamps.
+    """
+    value = truncate_datetime(start, bucket)
+    while value < end:
+        yield value
+        value = next_bucket(value, bucket)
@@ -0,0 +1,234 @@
+import datetime
+import functools
+import hashlib
+import pickle
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class ResultCache:
+    """
+    Cache for the results of the analytics query functions.
+
+    Results are pickled and stored either in Redis or, without a Redis client (or
+    once a Redis command fails), in an in-process dictionary. Every key embeds a
+    generation number; invalidate() bumps the generation, so all results computed
+    before new streams were committed stop matching at once without scanning keys,
+    and the orphaned entries simply expire. Hits and misses are counted per function.
+
+    Args:
+        redis_client (Optional[redis.Redis]): Client of the Redis backend; None uses
+                                              the in-process store.
+        key_prefix (str, optional): Prefix of every key.
+        default_ttl (float, optional): Seconds a result is kept when the cached
+                                       function does not set its own TTL.
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        key_prefix: str = "spotify_history:results",
+        default_ttl: float = 300.0,
+    ):
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+        self.default_ttl = default_ttl
+        self.enabled = True
+        self.counters: Dict[str, Dict[str, int]] = {}
+        self._store: Dict[str, Tuple[float, bytes]] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> "ResultCache":
+        """
+        Build the cache from the `[cache]` section: `result_backend = memory|redis|off`,
+        `result_ttl` and the `redis_url` shared with the known entity cache.
+        """
+        backend = config.config.get("cache", "result_backend", fallback="memory")
+        default_ttl = config.config.getfloat("cache", "result_ttl", fallback=300.0)
+        redis_client = None
+        if backend == "redis":
+            import redis
+
+            redis_client = redis.Redis.from_url(
+                config.config.get("cache", "redis_url", fallback="redis://localhost:6379/0")
+            )
+        cache = cls(redis_client=redis_client, default_ttl=default_ttl)
+        cache.enabled = backend != "off"
+        return cache
+
+    @property
+    def backend(self) -> str:
+        return "redis" if self.redis is not None else "memory"
+
+    def generation(self) -> int:
+        if self.redis is not None:
+            try:
+                return int(self.redis.get(f"{self.key_prefix}:generation") or 0)
+            except Exception:
+                self.redis = None
+        return self._generation
+
+    def make_key(self, func_name: str, engine, args: tuple, kwargs: dict) -> str:
+        """
+        Derive the key of a call from the function, the database and the arguments.
+
+        The current UTC date is part of the key because several queries are relative
+        to today.
+        """
+        database = engine.url.render_as_string(hide_password=True)
+        arguments = repr((database, args, sorted(kwargs.items())))
+        digest = hashlib.sha1(arguments.encode("utf-8")).hexdigest()
+        today = datetime.datetime.utcnow().date().isoformat()
+        return f"{self.key_prefix}:{self.generation()}:{func_name}:{today}:{digest}"
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Look a key up.
+
+        Returns:
+            Tuple[bool, Any]: Whether the key was found and the cached value.
+        """
+        payload = None
+        if self.redis is not None:
+            try:
+                payload = self.redis.get(key)
+            except Exception:
+                self.redis = None
+        else:
+            with self._lock:
+                expires_at, payload = self._store.get(key, (0.0, None))
+                if payload is not None and expires_at < time.monotonic():
+                    del self._store[key]
+                    payload = None
+
+        if payload is None:
+            return False, None
+        return True, pickle.loads(payload)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = ttl or self.default_ttl
+        payload = pickle.dumps(value)
+        if self.redis is not None:
+            try:
+                self.redis.set(key, payload, px=int(ttl * 1000))
+                return
+            except Exception:
+                self.redis = None
+        with self._lock:
+            self._store[key] = (time.monotonic() + ttl, payload)
+
+    def get_or_compute(
+        self,
+        func_name: str,
+        engine,
+        args: tuple,
+        kwargs: dict,
+        compute: Callable[[], Any],
+        ttl: Optional[float] = None,
+    ) -> Tuple[bool, Any]:
+        """
+        Return the cached result of a call, or compute and store it.
+
+        Returns:
+            Tuple[bool, Any]: Whether the result came from the cache, and the result.
+        """
+        if not self.enabled:
+            return False, compute()
+
+        key = self.make_key(func_name, engine, args, kwargs)
+        hit, value = self.get(key)
+        self.record(func_name, hit)
+        if hit:
+            return True, value
+
+        value = compute()
+        self.set(key, value, ttl)
+        return False, value
+
+    def invalidate(self) -> int:
+        """
+        Make every cached result stale, e.g. after the ETL committed new streams.
+
+        Returns:
+            int: The new generation number.
+        """
+        with self._lock:
+            self._generation += 1
+            self._store.clear()
+        if self.redis is not None:
+            try:
+                return int(self.redis.incr(f"{self.key_prefix}:generation"))
+            except Exception:
+                self.redis = None
+        return self._generation
+
+    def record(self, func_name: str, hit: bool) -> None:
+        with self._lock:
+            counters = self.counters.setdefault(func_name, {"hits": 0, "misses": 0})
+            counters["hits" if hit else "misses"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the hit and miss counters, in total and per function.
+        """
+        with self._lock:
+            functions = {name: dict(counts) for name, counts in self.counters.items()}
+        return {
+            "backend": self.backend if self.enabled else "off",
+            "generation": self.generation(),
+            "hits": sum(counts["hits"] for counts in functions.values()),
+            "misses": sum(counts["misses"] for counts in functions.values()),
+            "functions": functions,
+        }
+
+
+result_cache = ResultCache()
+
+
+def configure_result_cache(config) -> ResultCache:
+    """
+    Replace the module level cache with one built from the config.
+    """
+    global result_cache
+    result_cache = ResultCache.from_config(config)
+    return result_cache
+
+
+def get_result_cache() -> ResultCache:
+    return result_cache
+
+
+def invalidate_results() -> int:
+    """Make every cached query result stale; called when new streams are committed."""
+    return result_cache.invalidate()
+
+
+def cached(ttl: Optional[float] = None) -> Callable:
+    """
+    Cache the results of a query function whose first argument is the engine.
+
+    The undecorated function stays available as `__wrapped__`.
+
+    Args:
+        ttl (Optional[float], optional): Seconds to keep results; defaults to the
+                                         cache's `default_ttl`.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(engine, *args, **kwargs):
+            return result_cache.get_or_compute(
+                func.__name__,
+                engine,
+                args,
+                kwargs,
+                lambda: func(engine, *args, **kwargs),
+                ttl,
+            )[1]
+
+        return wrapper
+
+    return decorator
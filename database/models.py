@@ -2,11 +2,14 @@ import datetime
 from dataclasses import dataclass, asdict
 from sqlalchemy import (
     Column,
+    Date,
     ForeignKey,
     ForeignKeyConstraint,
+    Index,
     Integer,
     String,
     DateTime,
+    TypeDecorator,
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
@@ -14,6 +17,26 @@ from sqlalchemy.orm import relationship
 Base = declarative_base()
 
 
+class Timestamp(TypeDecorator):
+    """
+    DateTime that also accepts ISO 8601 strings such as the API's `played_at`.
+
+    PostgreSQL parses the strings itself; SQLite only stores datetime objects. Aware
+    values are converted to naive UTC, the way PostgreSQL stores them in a
+    `timestamp without time zone` column.
+    """
+
+    impl = DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, str):
+            value = datetime.datetime.fromisoformat(value)
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value
+
+
 @dataclass
 class DictMixin:
     def as_dict(self):
@@ -132,7 +155,11 @@ class SongStreamed(Base, DictMixin):
     """Class to represent a record in the streams table"""
 
     __tablename__ = "streams"
-    __table_args__ = {"schema": "music"}
+    __table_args__ = (
+        # Serves played_at range filters; song_id makes per-day aggregates index-only.
+        Index("ix_streams_played_at_song_id", "played_at", "song_id"),
+        {"schema": "music"},
+    )
 
     song_id: str = Column(
         String(32),
@@ -141,7 +168,7 @@ class SongStreamed(Base, DictMixin):
         comment="Song ID that refrences songs table",
     )
     played_at: datetime.datetime = Column(
-        DateTime, primary_key=True, comment="Timestamp of when stream occured"
+        Timestamp, primary_key=True, comment="Timestamp of when stream occured"
     )
 
 
@@ -150,7 +177,10 @@ class StreamHistory(Base, DictMixin):
     """Class to represent a record in the streams table"""
 
     __tablename__ = "stream_history"
-    __table_args__ = {"schema": "music"}
+    __table_args__ = (
+        Index("ix_stream_history_played_at", "played_at"),
+        {"schema": "music"},
+    )
 
     song_id: str = Column(
         String(32),
@@ -158,10 +188,91 @@ class StreamHistory(Base, DictMixin):
         comment="Song ID that refrences songs table",
     )
     played_at: datetime.datetime = Column(
-        DateTime, primary_key=True, comment="Timestamp of when stream occurred"
+        Timestamp, primary_key=True, comment="Timestamp of when stream occurred"
     )
 
 
+@dataclass
+class DailyStreamCount(Base, DictMixin):
+    """Class to represent a record in the daily_streams rollup table"""
+
+    __tablename__ = "daily_streams"
+    __table_args__ = {"schema": "music"}
+
+    day: datetime.date = Column(Date, primary_key=True, comment="UTC day of the streams")
+    stream_count: int = Column(
+        Integer, nullable=False, default=0, comment="Number of streams on that day"
+    )
+
+
+@dataclass
+class DailySongStreamCount(Base, DictMixin):
+    """Class to represent a record in the daily_song_streams rollup table"""
+
+    __tablename__ = "daily_song_streams"
+    __table_args__ = (
+        Index("ix_daily_song_streams_song_id", "song_id"),
+        {"schema": "music"},
+    )
+
+    day: datetime.date = Column(Date, primary_key=True, comment="UTC day of the streams")
+    song_id: str = Column(
+        String(32), primary_key=True, comment="Song ID that refrences songs table"
+    )
+    stream_count: int = Column(
+        Integer, nullable=False, default=0, comment="Number of streams of the song that day"
+    )
+
+
+# Keeps the rollup tables in step with music.streams. The statement level trigger
+# sees only the rows an INSERT actually added (ON CONFLICT DO NOTHING skips are not
+# in the transition table) and runs inside the inserting transaction.
+STREAM_ROLLUP_TRIGGER_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION music.update_stream_rollups() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO music.daily_streams AS rollup (day, stream_count)
+        SELECT played_at::date, count(*) FROM new_streams GROUP BY 1
+        ON CONFLICT (day) DO UPDATE
+            SET stream_count = rollup.stream_count + EXCLUDED.stream_count;
+
+        INSERT INTO music.daily_song_streams AS rollup (day, song_id, stream_count)
+        SELECT played_at::date, song_id, count(*) FROM new_streams GROUP BY 1, 2
+        ON CONFLICT (day, song_id) DO UPDATE
+            SET stream_count = rollup.stream_count + EXCLUDED.stream_count;
+
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS streams_update_rollups ON music.streams",
+    """
+    CREATE TRIGGER streams_update_rollups
+    AFTER INSERT ON music.streams
+    REFERENCING NEW TABLE AS new_streams
+    FOR EACH STATEMENT EXECUTE FUNCTION music.update_stream_rollups()
+    """,
+]
+
+# SQLite has no transition tables, so its trigger counts row by row; rows skipped
+# by ON CONFLICT DO NOTHING do not fire it either.
+SQLITE_STREAM_ROLLUP_TRIGGER_SQL = [
+    "DROP TRIGGER IF EXISTS streams_update_rollups",
+    """
+    CREATE TRIGGER streams_update_rollups AFTER INSERT ON streams
+    BEGIN
+        INSERT INTO daily_streams (day, stream_count)
+        VALUES (date(NEW.played_at), 1)
+        ON CONFLICT (day) DO UPDATE SET stream_count = stream_count + 1;
+
+        INSERT INTO daily_song_streams (day, song_id, stream_count)
+        VALUES (date(NEW.played_at), NEW.song_id, 1)
+        ON CONFLICT (day, song_id) DO UPDATE SET stream_count = stream_count + 1;
+    END
+    """,
+]
+
+
 @dataclass
 class CurrentSong(DictMixin):
     song_id: str
@@ -0,0 +1,582 @@
+"""
+Monthly range partitioning of music.streams on PostgreSQL.
+
+A partitioned streams table is split into one partition per calendar month of
+`played_at` (music.streams_y2024m01, ...) plus a default partition that catches
+rows no monthly partition covers yet. Queries that filter on `played_at` then only
+read the partitions of the months they ask for (partition pruning), and old months
+can be detached or dropped without touching the rest of the table.
+
+    create_partitioned_streams  create the partitioned table (db_setup)
+    ensure_partitions           create upcoming months, move strays out of default
+    migrate_streams             convert an existing heap table online
+    verify_partition_pruning    check that date filtered queries prune partitions
+
+The primary key stays (song_id, played_at); it contains the partition key, as
+PostgreSQL requires of unique constraints on a partitioned table.
+"""
+import datetime
+import re
+import time
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+
+from database import backend
+from database.models import STREAM_ROLLUP_TRIGGER_SQL, SongStreamed
+from database.profiling import capture_statements, explain, plan_nodes
+
+SCHEMA = "music"
+TABLE = SongStreamed.__tablename__
+MIGRATION_TABLE = f"{TABLE}_partitioned"
+UNPARTITIONED_TABLE = f"{TABLE}_unpartitioned"
+MIRROR_TRIGGER = f"{TABLE}_mirror_partitioned"
+
+# Swapping the tables needs an ACCESS EXCLUSIVE lock for a moment; give up instead
+# of queueing every reader behind a long running query.
+SWAP_LOCK_TIMEOUT = "10s"
+
+BOUND_PATTERN = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def month_start(value) -> datetime.datetime:
+    """Return midnight of the first day of the month containing `value`."""
+    return datetime.datetime(value.year, value.month, 1)
+
+
+def add_months(month: datetime.datetime, months: int) -> datetime.datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime.datetime) -> str:
+    return f"{TABLE}_y{month.year}m{month.month:02d}"
+
+
+def partitioned_table_sql(table: str) -> List[str]:
+    """
+    The DDL of a streams table partitioned by month of `played_at`, with the
+    declared index and a default partition. Constraint and index names are derived
+    from `table`, so a migration table can exist next to music.streams.
+    """
+    statements = [
+        f"""
+        CREATE TABLE {SCHEMA}.{table} (
+            song_id VARCHAR(32) NOT NULL,
+            played_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT {table}_pkey PRIMARY KEY (song_id, played_at),
+            CONSTRAINT {table}_song_id_fkey FOREIGN KEY (song_id)
+                REFERENCES {SCHEMA}.songs (id)
+        ) PARTITION BY RANGE (played_at)
+        """,
+        f"CREATE TABLE {SCHEMA}.{TABLE}_default PARTITION OF {SCHEMA}.{table} DEFAULT",
+    ]
+    for index in SongStreamed.__table__.indexes:
+        columns = ", ".join(column.name for column in index.columns)
+        statements.append(
+            f"CREATE INDEX {index.name.replace(TABLE, table, 1)} "
+            f"ON {SCHEMA}.{table} ({columns})"
+        )
+    for column in SongStreamed.__table__.columns:
+        comment = column.comment.replace("'", "''")
+        statements.append(
+            f"COMMENT ON COLUMN {SCHEMA}.{table}.{column.name} IS '{comment}'"
+        )
+    return statements
+
+
+def is_partitioned(engine, table: str = TABLE) -> bool:
+    """Return whether `music.<table>` exists and is a partitioned table."""
+    if not backend.is_postgresql(engine):
+        return False
+    with engine.connect() as connection:
+        return bool(
+            connection.execute(
+                text(
+                    "SELECT 1 FROM pg_partitioned_table p "
+                    "JOIN pg_class c ON c.oid = p.partrelid "
+                    "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                    "WHERE n.nspname = :schema AND c.relname = :table"
+                ),
+                {"schema": SCHEMA, "table": table},
+            ).scalar()
+        )
+
+
+def table_exists(connection, table: str) -> bool:
+    return (
+        connection.execute(
+            text("SELECT to_regclass(:name)"), {"name": f"{SCHEMA}.{table}"}
+        ).scalar()
+        is not None
+    )
+
+
+def list_partitions(engine, table: str = TABLE) -> List[dict]:
+    """
+    Return the partitions of `music.<table>`, ordered by their lower bound.
+
+    Returns:
+        List[dict]: One entry per partition with "name", "lower" and "upper"; both
+                    bounds are None for the default partition, which comes last.
+    """
+    with engine.connect() as connection:
+        rows = connection.execute(
+            text(
+                "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+                "FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass(:name)"
+            ),
+            {"name": f"{SCHEMA}.{table}"},
+        ).all()
+
+    partitions = []
+    for name, bound in rows:
+        match = BOUND_PATTERN.search(bound)
+        lower, upper = (
+            [datetime.datetime.fromisoformat(value) for value in match.groups()]
+            if match
+            else (None, None)
+        )
+        partitions.append({"name": name, "lower": lower, "upper": upper})
+    return sorted(
+        partitions, key=lambda partition: partition["lower"] or datetime.datetime.max
+    )
+
+
+def create_partitioned_streams(engine, months_ahead: int = 3) -> bool:
+    """
+    Create music.streams as a partitioned table with partitions up to `months_ahead`
+    months after the current one.
+
+    Returns:
+        bool: False if music.streams already existed; it is left as it is (convert a
+              heap table with migrate_streams).
+    """
+    with engine.begin() as connection:
+        if table_exists(connection, TABLE):
+            return False
+        for statement in partitioned_table_sql(TABLE):
+            connection.execute(text(statement))
+    ensure_partitions(engine, months_ahead)
+    return True
+
+
+def ensure_partitions(
+    engine,
+    months_ahead: int = 3,
+    table: str = TABLE,
+    start: Optional[datetime.datetime] = None,
+) -> List[str]:
+    """
+    Create the missing monthly partitions from `start` (default: the current month)
+    to `months_ahead` months ahead, plus one for every month that has rows in the
+    default partition.
+
+    Each partition is created as a plain table, filled with its month's rows from
+    the default partition and then attached, all in one transaction. Attaching only
+    needs a SHARE UPDATE EXCLUSIVE lock on the parent, so readers and writers of
+    the other partitions are not blocked. Rows moved out of the default partition
+    do not pass through the parent, so the rollup trigger does not count them again.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
+        months_ahead (int, optional): Months after the current one to create.
+        table (str, optional): The partitioned table, e.g. the migration table.
+        start (Optional[datetime.datetime]): Earliest month to create.
+
+    Returns:
+        List[str]: The names of the partitions created.
+    """
+    partitions = list_partitions(engine, table)
+    existing = {partition["lower"] for partition in partitions if partition["lower"]}
+    default = next(
+        (partition["name"] for partition in partitions if not partition["lower"]), None
+    )
+
+    this_month = month_start(datetime.datetime.utcnow())
+    month = month_start(start) if start else this_month
+    months = set()
+    while month <= add_months(this_month, months_ahead):
+        months.add(month)
+        month = add_months(month, 1)
+    if default:
+        with engine.connect() as connection:
+            months.update(
+                connection.execute(
+                    text(
+                        f"SELECT DISTINCT date_trunc('month', played_at) "
+                        f"FROM {SCHEMA}.{default}"
+                    )
+                ).scalars()
+            )
+
+    created = []
+    for month in sorted(months - existing):
+        name = partition_name(month)
+        lower = month.isoformat(sep=" ")
+        upper = add_months(month, 1).isoformat(sep=" ")
+        with engine.begin() as connection:
+            connection.execute(
+                text(
+                    f"CREATE TABLE {SCHEMA}.{name} "
+                    f"(LIKE {SCHEMA}.{table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+                )
+            )
+            if default:
+                # Keep new rows of the month out of the default partition until the
+                # partition is attached; they wait and are then routed to it.
+                connection.execute(
+                    text(f"LOCK TABLE {SCHEMA}.{default} IN SHARE ROW EXCLUSIVE MODE")
+                )
+                connection.execute(
+                    text(
+                        f"WITH moved AS (DELETE FROM {SCHEMA}.{default} "
+                        f"WHERE played_at >= :lower AND played_at < :upper "
+                        f"RETURNING song_id, played_at) "
+                        f"INSERT INTO {SCHEMA}.{name} (song_id, played_at) "
+                        f"SELECT song_id, played_at FROM moved"
+                    ),
+                    {"lower": month, "upper": add_months(month, 1)},
+                )
+            connection.execute(
+                text(
+                    f"ALTER TABLE {SCHEMA}.{table} ATTACH PARTITION {SCHEMA}.{name} "
+                    f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+                )
+            )
+        created.append(name)
+    return created
+
+
+def rename_table(connection, table: str, new_name: str) -> None:
+    """
+    Rename a table together with the constraints and indexes named after it.
+    """
+    # Indexes that back a constraint are renamed with their constraint.
+    indexes = connection.execute(
+        text(
+            "SELECT c.relname FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE i.indrelid = to_regclass(:name) AND NOT EXISTS "
+            "(SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid)"
+        ),
+        {"name": f"{SCHEMA}.{table}"},
+    ).scalars().all()
+    constraints = connection.execute(
+        text("SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:name)"),
+        {"name": f"{SCHEMA}.{table}"},
+    ).scalars().all()
+    for index in indexes:
+        if table in index:
+            connection.execute(
+                text(
+                    f"ALTER INDEX {SCHEMA}.{index} "
+                    f"RENAME TO {index.replace(table, new_name, 1)}"
+                )
+            )
+    for constraint in constraints:
+        if table in constraint:
+            connection.execute(
+                text(
+                    f"ALTER TABLE {SCHEMA}.{table} RENAME CONSTRAINT {constraint} "
+                    f"TO {constraint.replace(table, new_name, 1)}"
+                )
+            )
+    connection.execute(text(f"ALTER TABLE {SCHEMA}.{table} RENAME TO {new_name}"))
+
+
+def migrate_streams(
+    engine,
+    months_ahead: int = 3,
+    keep_unpartitioned: bool = False,
+    log: Callable = print,
+) -> dict:
+    """
+    Convert music.streams into a partitioned table while the ETL keeps loading.
+
+    1. music.streams_partitioned is created and a trigger on music.streams starts
+       copying every new row into it. Creating the trigger waits for running
+       inserts to commit, so from then on no row can be missed.
+    2. Only then is the range of existing streams read; the new table gets a
+       partition for each of its months and the rows are copied one month per
+       transaction, so no long lock is held and an interrupted migration can
+       simply be run again.
+    3. In one short transaction the tables swap names (with their constraints and
+       indexes) and the rollup trigger moves to the new table. The rollups are
+       already up to date and are not rebuilt.
+    4. Any row of the old table still missing from the new one is copied straight
+       into its partition, bypassing the rollup trigger as the rollups already
+       count it. The old table is then dropped.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
+        months_ahead (int, optional): Months after the current one to create.
+        keep_unpartitioned (bool, optional): Keep the old table as
+                                             music.streams_unpartitioned.
+        log (Callable, optional): Called with a progress message per step.
+
+    Returns:
+        dict: "rows" copied, of which "caught_up" after the swap, "partitions"
+              created, "seconds" taken and whether the old table was "dropped".
+
+    Raises:
+        ValueError: If the database is not PostgreSQL or streams is already partitioned.
+    """
+    if not backend.is_postgresql(engine):
+        raise ValueError("Partitioning music.streams needs PostgreSQL")
+    if is_partitioned(engine):
+        raise ValueError(f"{SCHEMA}.{TABLE} is already partitioned")
+
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        if not table_exists(connection, MIGRATION_TABLE):
+            for statement in partitioned_table_sql(MIGRATION_TABLE):
+                connection.execute(text(statement))
+        connection.execute(
+            text(
+                f"""
+                CREATE OR REPLACE FUNCTION {SCHEMA}.{MIRROR_TRIGGER}() RETURNS trigger
+                AS $$
+                BEGIN
+                    INSERT INTO {SCHEMA}.{MIGRATION_TABLE} (song_id, played_at)
+                    SELECT song_id, played_at FROM new_streams ON CONFLICT DO NOTHING;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql
+                """
+            )
+        )
+        connection.execute(
+            text(f"DROP TRIGGER IF EXISTS {MIRROR_TRIGGER} ON {SCHEMA}.{TABLE}")
+        )
+        connection.execute(
+            text(
+                f"CREATE TRIGGER {MIRROR_TRIGGER} AFTER INSERT ON {SCHEMA}.{TABLE} "
+                f"REFERENCING NEW TABLE AS new_streams "
+                f"FOR EACH STATEMENT EXECUTE FUNCTION {SCHEMA}.{MIRROR_TRIGGER}()"
+            )
+        )
+
+    # Rows committed from here on are mirrored, so the range read now covers the rest.
+    with engine.connect() as connection:
+        first, last = connection.execute(
+            text(f"SELECT min(played_at), max(played_at) FROM {SCHEMA}.{TABLE}")
+        ).one()
+    partitions = ensure_partitions(engine, months_ahead, MIGRATION_TABLE, first)
+    log(f"Created {SCHEMA}.{MIGRATION_TABLE} with {len(partitions)} partitions")
+
+    rows = 0
+    month = month_start(first) if first else None
+    while month and month <= last:
+        with engine.begin() as connection:
+            rows += connection.execute(
+                text(
+                    f"INSERT INTO {SCHEMA}.{MIGRATION_TABLE} (song_id, played_at) "
+                    f"SELECT song_id, played_at FROM {SCHEMA}.{TABLE} "
+                    f"WHERE played_at >= :lower AND played_at < :upper "
+                    f"ON CONFLICT DO NOTHING"
+                ),
+                {"lower": month, "upper": add_months(month, 1)},
+            ).rowcount
+        log(f"Copied {month:%Y-%m} ({rows:,} rows so far)")
+        month = add_months(month, 1)
+
+    with engine.begin() as connection:
+        connection.execute(text(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'"))
+        connection.execute(
+            text(f"LOCK TABLE {SCHEMA}.{TABLE} IN ACCESS EXCLUSIVE MODE")
+        )
+        connection.execute(text(f"DROP TRIGGER {MIRROR_TRIGGER} ON {SCHEMA}.{TABLE}"))
+        connection.execute(
+            text(f"DROP TRIGGER IF EXISTS streams_update_rollups ON {SCHEMA}.{TABLE}")
+        )
+        connection.execute(text(f"DROP FUNCTION {SCHEMA}.{MIRROR_TRIGGER}()"))
+        rename_table(connection, TABLE, UNPARTITIONED_TABLE)
+        rename_table(connection, MIGRATION_TABLE, TABLE)
+        for statement in STREAM_ROLLUP_TRIGGER_SQL:
+            connection.execute(text(statement))
+    log(f"Swapped {SCHEMA}.{TABLE} for the partitioned table")
+
+    caught_up = copy_missing_rows(engine)
+    rows += caught_up
+    if caught_up:
+        log(f"Copied {caught_up:,} rows that were missing after the swap")
+
+    dropped = not keep_unpartitioned
+    with engine.begin() as connection:
+        connection.execute(text(f"ANALYZE {SCHEMA}.{TABLE}"))
+        if dropped:
+            connection.execute(text(f"DROP TABLE {SCHEMA}.{UNPARTITIONED_TABLE}"))
+
+    return {
+        "rows": rows,
+        "caught_up": caught_up,
+        "partitions": len(partitions),
+        "seconds": round(time.perf_counter() - started, 2),
+        "dropped": dropped,
+    }
+
+
+def copy_missing_rows(engine) -> int:
+    """
+    Copy the rows of music.streams_unpartitioned that music.streams lacks.
+
+    Nothing writes to the old table after the swap, while the ETL may already be
+    adding rows to the new one. The rows are inserted into their partitions (the
+    default partition for a month without one) rather than the parent, so the
+    rollup trigger on music.streams does not count them a second time.
+
+    Returns:
+        int: The rows copied.
+    """
+    missing_rows = (
+        f"FROM {SCHEMA}.{UNPARTITIONED_TABLE} old "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {SCHEMA}.{TABLE} new "
+        f"WHERE new.song_id = old.song_id AND new.played_at = old.played_at)"
+    )
+    with engine.connect() as connection:
+        months = connection.execute(
+            text(f"SELECT DISTINCT date_trunc('month', played_at) {missing_rows}")
+        ).scalars().all()
+    if not months:
+        return 0
+
+    partitions = {
+        partition["lower"]: partition["name"] for partition in list_partitions(engine)
+    }
+    copied = 0
+    for month in months:
+        with engine.begin() as connection:
+            copied += connection.execute(
+                text(
+                    f"INSERT INTO {SCHEMA}.{partitions.get(month, TABLE + '_default')} "
+                    f"(song_id, played_at) SELECT song_id, played_at {missing_rows} "
+                    f"AND old.played_at >= :lower AND old.played_at < :upper "
+                    f"ON CONFLICT DO NOTHING"
+                ),
+                {"lower": month, "upper": add_months(month, 1)},
+            ).rowcount
+    return copied
+
+
+def pruning_queries() -> Dict[str, Callable]:
+    """
+    The query functions that filter streams by date, called with representative
+    arguments. Functions served from the daily rollups read no partition at all.
+    """
+    from database import utils
+
+    today = datetime.datetime.utcnow()
+    yesterday = today - datetime.timedelta(days=1)
+    year_begin, year_end = utils.year_bounds(today.year)
+    return {
+        "get_top_songs_by_year": lambda engine: utils.get_top_songs_by_year(
+            engine, today.year
+        ),
+        "get_songs_by_date": lambda engine: utils.get_songs_by_date(engine, yesterday),
+        "hourly_stream_counts": lambda engine: utils.get_bucketed_stream_counts(
+            engine, yesterday, today, bucket="hour"
+        ),
+        "summary_year_count": lambda engine: utils.get_bucketed_stream_counts(
+            engine, year_begin, year_end, bucket="year"
+        ),
+        "get_percentage_difference": utils.get_percentage_difference,
+        "monthly_summary": lambda engine: utils.monthly_summary(engine, today),
+    }
+
+
+def date_range(parameters) -> tuple:
+    """Return the earliest and latest date or datetime among a statement's parameters."""
+    values = (parameters or {}).values() if isinstance(parameters, dict) else parameters
+    dates = [
+        value
+        if isinstance(value, datetime.datetime)
+        else datetime.datetime.combine(value, datetime.time.min)
+        for value in values or ()
+        if isinstance(value, datetime.date)
+    ]
+    return (min(dates), max(dates)) if dates else (None, None)
+
+
+def verify_partition_pruning(
+    engine, queries: Optional[Dict[str, Callable]] = None
+) -> List[dict]:
+    """
+    Check that the date filtered queries only read the partitions of their dates.
+
+    Each function is run while its SQL is captured and every captured statement is
+    explained. The partitions a plan still scans after pruning (plan time pruning
+    leaves them out, startup pruning reports them as "Subplans Removed") must all
+    overlap the range between the statement's earliest and latest date parameter;
+    the default partition may always be scanned.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
+        queries (Optional[Dict[str, Callable]]): Functions taking the engine, keyed by
+                                                 name. Defaults to pruning_queries().
+
+    Returns:
+        List[dict]: One row per statement reading streams (or per function reading
+                    none) with "function", "scanned", "expected", "total", "range"
+                    and "ok".
+
+    Raises:
+        ValueError: If music.streams is not partitioned.
+    """
+    if not is_partitioned(engine):
+        raise ValueError(f"{SCHEMA}.{TABLE} is not partitioned")
+    partitions = {partition["name"]: partition for partition in list_partitions(engine)}
+
+    report = []
+    for name, query in (queries or pruning_queries()).items():
+        with capture_statements(engine) as statements:
+            try:
+                query(engine)
+            except ZeroDivisionError:
+                pass  # get_percentage_difference on a database without last year's data
+
+        rows = []
+        for statement, parameters in statements:
+            scanned = {
+                node["Relation Name"]
+                for node in plan_nodes(explain(engine, statement, parameters))
+                if node.get("Relation Name") in partitions
+            }
+            if not scanned:
+                continue
+            lower, upper = date_range(parameters)
+            if lower is not None and lower == upper:
+                upper = datetime.datetime.max  # a single bound, e.g. played_at >= :day
+            expected = {
+                partition["name"]
+                for partition in partitions.values()
+                if not partition["lower"]
+                or lower is None
+                or (partition["lower"] < upper and partition["upper"] > lower)
+            }
+            rows.append(
+                {
+                    "function": name,
+                    "scanned": len(scanned),
+                    "expected": len(expected),
+                    "total": len(partitions),
+                    "range": (lower, upper),
+                    "ok": scanned <= expected,
+                }
+            )
+        report.extend(
+            rows
+            or [
+                {
+                    "function": name,
+                    "scanned": 0,
+                    "expected": 0,
+                    "total": len(partitions),
+                    "range": (None, None),
+                    "ok": True,
+                }
+            ]
+        )
+    return report
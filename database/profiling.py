@@ -0,0 +1,459 @@
+import contextlib
+import datetime
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from database import backend
+
+# Frames of these modules are skipped when attributing a statement to its caller.
+LIBRARY_MODULES = ("sqlalchemy", "contextlib", "functools", "concurrent", "threading")
+
+
+@contextlib.contextmanager
+def capture_statements(engine) -> Iterator[List[tuple]]:
+    """
+    Collect the SQL statements an engine executes inside the `with` block.
+
+    Yields:
+        List[tuple]: Filled with (statement, parameters) pairs as they are executed.
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def explain(
+    engine,
+    statement: str,
+    parameters=None,
+    options: str = "FORMAT JSON",
+    settings: Optional[Dict[str, str]] = None,
+) -> dict:
+    """
+    Return the PostgreSQL plan of a statement as parsed EXPLAIN (FORMAT JSON) output.
+
+    The statement runs in a transaction that is always rolled back, so EXPLAIN ANALYZE
+    of a data modifying statement leaves no trace.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
+        statement (str): SQL in the DBAPI's paramstyle, e.g. as captured by capture_statements.
+        parameters (optional): The statement's DBAPI parameters.
+        options (str, optional): EXPLAIN options; must include FORMAT JSON.
+        settings (Optional[Dict[str, str]]): Planner settings applied with SET LOCAL.
+
+    Returns:
+        dict: The top level "Plan" node.
+    """
+    return explain_output(engine, statement, parameters, options, settings)["Plan"]
+
+
+def explain_output(
+    engine,
+    statement: str,
+    parameters=None,
+    options: str = "FORMAT JSON",
+    settings: Optional[Dict[str, str]] = None,
+) -> dict:
+    """
+    Like explain, but return the whole EXPLAIN (FORMAT JSON) output: the "Plan" and,
+    with ANALYZE, "Planning Time" and "Execution Time".
+    """
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            for name, value in (settings or {}).items():
+                cursor.execute(f"SET LOCAL {name} = {value}")
+            cursor.execute(f"EXPLAIN ({options}) {statement}", parameters or None)
+            plan = cursor.fetchone()[0]
+    finally:
+        connection.rollback()
+        connection.close()
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def explain_query_plan(engine, statement: str, parameters=None) -> List[str]:
+    """
+    Return SQLite's EXPLAIN QUERY PLAN as indented lines; SQLite has no EXPLAIN ANALYZE.
+    """
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+        depth = {0: 0}
+        lines = []
+        for node_id, parent, _, detail in cursor.fetchall():
+            depth[node_id] = depth.get(parent, 0) + 1
+            lines.append("  " * (depth[node_id] - 1) + detail)
+        return lines
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+def plan_nodes(plan: dict) -> Iterator[dict]:
+    """
+    Walk a plan tree depth first, yielding every node.
+    """
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def relation_scans(plan: dict) -> List[dict]:
+    """
+    Summarise how each table is read in a plan.
+
+    Returns:
+        List[dict]: One entry per scan node with "relation", "node_type", "index" and
+                    "index_cond" (the predicate the index is searched with, if any).
+    """
+    scans = []
+    for node in plan_nodes(plan):
+        if "Relation Name" not in node:
+            continue
+        index_nodes = [node] if "Index Name" in node else []
+        if node["Node Type"] == "Bitmap Heap Scan":
+            index_nodes = [child for child in plan_nodes(node) if "Index Name" in child]
+        scans.append(
+            {
+                "relation": node["Relation Name"],
+                "node_type": node["Node Type"],
+                "index": ", ".join(child["Index Name"] for child in index_nodes) or None,
+                "index_cond": " AND ".join(
+                    child["Index Cond"] for child in index_nodes if "Index Cond" in child
+                )
+                or None,
+            }
+        )
+    return scans
+
+
+def indexed_queries() -> Dict[str, Callable]:
+    """
+    The query functions whose predicates must be able to use an index, called with
+    representative arguments.
+    """
+    from database import utils
+
+    today = datetime.datetime.utcnow()
+    yesterday = today - datetime.timedelta(days=1)
+    return {
+        "get_songs_by_date": lambda engine: utils.get_songs_by_date(engine, yesterday),
+        "get_song_id_count": lambda engine: utils.get_song_id_count(engine, "song"),
+        "get_top_songs_by_year": lambda engine: utils.get_top_songs_by_year(
+            engine, today.year
+        ),
+        "get_yesterday_top_ten": utils.get_yesterday_top_ten.__wrapped__,
+        "get_weekly_summary": lambda engine: utils.get_weekly_summary(
+            engine, [{"week_day": yesterday.date()}]
+        ),
+        "get_stream_counts_by_day": lambda engine: utils.get_stream_counts_by_day(
+            engine, [yesterday]
+        ),
+        "monthly_summary": lambda engine: utils.monthly_summary(engine, today),
+        "get_percentage_difference": utils.get_percentage_difference,
+    }
+
+
+def verify_index_usage(engine, queries: Optional[Dict[str, Callable]] = None) -> List[dict]:
+    """
+    Check that every table read by the given query functions can be read through an index.
+
+    Each function is run while its SQL is captured, then every captured statement is
+    explained with `enable_seqscan = off`. A predicate the planner can match to an
+    index then always produces an index (or bitmap) scan with an index condition
+    regardless of table size, while a non-sargable one falls back to a sequential
+    scan or a full index scan without a condition, so the check is meaningful on an
+    empty development database as well as on production data.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
+        queries (Optional[Dict[str, Callable]]): Functions taking the engine, keyed by
+                                                 name. Defaults to indexed_queries().
+
+    Returns:
+        List[dict]: One row per table scan with "function", "relation", "node_type",
+                    "index", "index_cond" and "ok".
+    """
+    report = []
+    for name, query in (queries or indexed_queries()).items():
+        with capture_statements(engine) as statements:
+            try:
+                query(engine)
+            except ZeroDivisionError:
+                pass  # get_percentage_difference on a database without last year's data
+
+        for statement, parameters in statements:
+            plan = explain(
+                engine, statement, parameters, settings={"enable_seqscan": "off"}
+            )
+            for scan in relation_scans(plan):
+                report.append(
+                    {
+                        "function": name,
+                        **scan,
+                        "ok": scan["index_cond"] is not None,
+                    }
+                )
+    return report
+
+
+def calling_function() -> str:
+    """
+    Name the innermost function outside SQLAlchemy and this module on the call stack,
+    e.g. "database.utils.get_top_songs_and_artists" or, for a lambda,
+    "database.utils.run_summary_queries.<locals>.<lambda>".
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module != __name__ and not module.startswith(LIBRARY_MODULES):
+            code = frame.f_code
+            return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+        frame = frame.f_back
+    return "unknown"
+
+
+def normalize_statement(statement: str) -> str:
+    """Collapse whitespace, and the value lists of multi-row inserts, to group statements."""
+    statement = re.sub(r"\s+", " ", statement).strip()
+    return re.sub(r"(VALUES \([^)]*\))(, \([^)]*\))+", r"\1, ...", statement)
+
+
+class QueryProfiler:
+    """
+    Record every SQL statement the process executes, per calling function.
+
+    While started, listeners on every Engine time each statement and attribute it to
+    the function that issued it (see calling_function). Statements are grouped by
+    function and normalized text, keeping the count, total and slowest duration, the
+    rows returned or affected and the parameters of the slowest run. When a SELECT
+    is slower than `slow_ms`, its slowest run is explained once the command is done:
+    EXPLAIN (ANALYZE, BUFFERS) on PostgreSQL, EXPLAIN QUERY PLAN on SQLite. The
+    explain runs on a separate connection after the profiled work, so it does not
+    distort the timings. Results served by the result cache never reach the
+    database and are therefore not recorded.
+
+    Args:
+        slow_ms (float, optional): Duration above which a SELECT is explained.
+        explain_slow (bool, optional): Capture plans of slow SELECTs at all.
+        max_explains (int, optional): Explain at most this many of the slowest
+                                      statements.
+    """
+
+    def __init__(
+        self, slow_ms: float = 100.0, explain_slow: bool = True, max_explains: int = 20
+    ):
+        self.slow_ms = slow_ms
+        self.explain_slow = explain_slow
+        self.max_explains = max_explains
+        self.stats: Dict[tuple, dict] = {}
+        self.started_at: Optional[datetime.datetime] = None
+        self.seconds = 0.0
+        self._started = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> "QueryProfiler":
+        """Build the profiler from the `[profiling]` section."""
+        return cls(
+            slow_ms=config.config.getfloat("profiling", "slow_ms", fallback=100.0),
+            explain_slow=config.config.getboolean("profiling", "explain", fallback=True),
+            max_explains=config.config.getint("profiling", "max_explains", fallback=20),
+        )
+
+    def start(self) -> "QueryProfiler":
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self._started = time.perf_counter()
+        event.listen(Engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", self._after_cursor_execute)
+        return self
+
+    def stop(self) -> None:
+        event.remove(Engine, "before_cursor_execute", self._before_cursor_execute)
+        event.remove(Engine, "after_cursor_execute", self._after_cursor_execute)
+        self.seconds = time.perf_counter() - self._started
+
+    def __enter__(self) -> "QueryProfiler":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    def _before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        conn.info.setdefault("query_profiler_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        started = conn.info["query_profiler_start"].pop()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        key = (calling_function(), normalize_statement(statement))
+        rows = cursor.rowcount if cursor.rowcount is not None else -1
+        with self._lock:
+            entry = self.stats.get(key)
+            if entry is None:
+                entry = self.stats[key] = {
+                    "function": key[0],
+                    "statement": key[1],
+                    "calls": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "rows": 0,
+                    "executemany": executemany,
+                }
+            entry["calls"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["rows"] += max(rows, 0)
+            if elapsed_ms >= entry["max_ms"]:
+                entry["max_ms"] = elapsed_ms
+                entry["slowest"] = (conn.engine, statement, parameters)
+
+    def explain_slow_statements(self) -> int:
+        """
+        Capture the plans of the slowest SELECTs above `slow_ms`.
+
+        Returns:
+            int: The number of plans captured.
+        """
+        slow = sorted(
+            (
+                entry
+                for entry in self.stats.values()
+                if entry["max_ms"] >= self.slow_ms
+                and not entry["executemany"]
+                and entry["statement"].upper().startswith(("SELECT", "WITH"))
+                and "plan" not in entry
+            ),
+            key=lambda entry: entry["max_ms"],
+            reverse=True,
+        )[: self.max_explains]
+        for entry in slow:
+            engine, statement, parameters = entry["slowest"]
+            try:
+                if backend.is_postgresql(engine):
+                    output = explain_output(
+                        engine,
+                        statement,
+                        parameters,
+                        "ANALYZE, BUFFERS, FORMAT JSON",
+                    )
+                    entry["plan"] = output["Plan"]
+                    entry["explain_ms"] = output.get("Execution Time")
+                elif backend.is_sqlite(engine):
+                    entry["plan"] = explain_query_plan(engine, statement, parameters)
+            except Exception as e:
+                entry["plan_error"] = str(e)
+        return len(slow)
+
+    def report(self, command: str = "", top: Optional[int] = None) -> dict:
+        """
+        Rank the recorded statements by total time.
+
+        Returns:
+            dict: The command, start time, wall seconds, the totals and "queries", the
+                  statement entries hottest first with mean and slowest durations,
+                  the slowest run's parameters and any captured plan.
+        """
+        queries = []
+        for entry in sorted(
+            self.stats.values(), key=lambda entry: entry["total_ms"], reverse=True
+        )[:top]:
+            _, _, parameters = entry["slowest"]
+            query = {
+                key: value
+                for key, value in entry.items()
+                if key not in ("slowest", "total_ms", "max_ms")
+            }
+            query.update(
+                total_ms=round(entry["total_ms"], 3),
+                mean_ms=round(entry["total_ms"] / entry["calls"], 3),
+                max_ms=round(entry["max_ms"], 3),
+                slowest_parameters=(
+                    None if entry["executemany"] else json.loads(
+                        json.dumps(parameters, default=str)
+                    )
+                ),
+            )
+            queries.append(query)
+        return {
+            "command": command,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "seconds": round(self.seconds, 3),
+            "statements": sum(entry["calls"] for entry in self.stats.values()),
+            "sql_ms": round(sum(entry["total_ms"] for entry in self.stats.values()), 3),
+            "queries": queries,
+        }
+
+    def format_report(self, report: dict, top: int = 15) -> str:
+        """Render a report as a plain text ranking of the `top` hottest statements."""
+        lines = [
+            f"{report['command']}: {report['statements']} statements, "
+            f"{report['sql_ms']:.1f} ms in SQL of {report['seconds']:.1f} s",
+            f"{'total ms':>10} {'calls':>6} {'mean ms':>9} {'max ms':>9} {'rows':>8}  "
+            "function / statement",
+        ]
+        for query in report["queries"][:top]:
+            lines.append(
+                f"{query['total_ms']:>10.1f} {query['calls']:>6} {query['mean_ms']:>9.2f} "
+                f"{query['max_ms']:>9.2f} {query['rows']:>8}  {query['function']}"
+            )
+            lines.append(f"{'':>47}{query['statement'][:160]}")
+            if "plan" in query:
+                if isinstance(query["plan"], list):
+                    plan_lines = query["plan"]
+                else:
+                    plan_lines = [
+                        f"{node['Node Type']}"
+                        + (f" on {node['Relation Name']}" if "Relation Name" in node else "")
+                        + f": "
+                        f"{node.get('Actual Total Time', 0):.1f} ms, "
+                        f"{node.get('Actual Rows', 0)} rows, "
+                        f"{node.get('Shared Hit Blocks', 0)} hit / "
+                        f"{node.get('Shared Read Blocks', 0)} read blocks"
+                        for node in plan_nodes(query["plan"])
+                    ]
+                lines.extend(f"{'':>49}{line}" for line in plan_lines)
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, directory: str, command: str) -> str:
+        """
+        Explain the slow statements and write `<command>-<timestamp>.json` with the full
+        report and a `.txt` ranking next to it.
+
+        Returns:
+            str: The path of the text report.
+        """
+        if self.explain_slow:
+            self.explain_slow_statements()
+        report = self.report(command)
+        os.makedirs(directory, exist_ok=True)
+        stamp = (self.started_at or datetime.datetime.now()).strftime("%Y%m%dT%H%M%S")
+        base = os.path.join(directory, f"{command}-{stamp}")
+        with open(f"{base}.json", "w", encoding="utf-8") as fp:
+            json.dump(report, fp, indent=4, default=str)
+        with open(f"{base}.txt", "w", encoding="utf-8") as fp:
+            fp.write(self.format_report(report))
+        return f"{base}.txt"
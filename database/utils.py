@@ -1,23 +1,52 @@
+import contextlib
+import csv
 import datetime
-import random
-from typing import Dict, List, Optional, Tuple
-
-from sqlalchemy import cast, create_engine, Date, distinct, extract, Float, func, text
-from sqlalchemy.dialects.postgresql import insert
+import io
+import itertools
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import (
+    and_,
+    cast,
+    Date,
+    DateTime,
+    distinct,
+    Float,
+    func,
+    literal_column,
+    select,
+    tablesample,
+    text,
+    true,
+)
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
 
+from database import backend, partitioning
+from database.backend import create_engine, insert
+from database.cache import cached, invalidate_results
 from database.models import (
     Base,
     Album,
     AlbumArtist,
     Artist,
+    DailySongStreamCount,
+    DailyStreamCount,
     Song,
     SongArtist,
     SongStreamed,
     StreamHistory,
+    SQLITE_STREAM_ROLLUP_TRIGGER_SQL,
+    STREAM_ROLLUP_TRIGGER_SQL,
 )
 
+ENTITY_MODELS = [Artist, Album, AlbumArtist, Song, SongArtist, SongStreamed]
+RANDOM_SONG_MODES = ("uniform", "play_count", "not_recent")
+TIME_BUCKETS = ("hour", "day", "week", "month", "year")
+
 
 class SessionManager:
     def __init__(self, engine):
@@ -32,9 +61,271 @@ class SessionManager:
         self.session.close()
 
 
-def create_database(database_url) -> None:
+def copy_merge_rows(
+    engine, data_lists, metrics=None
+) -> Tuple[Optional[Dict[str, int]], Optional[str]]:
+    """
+    Load all entity lists with COPY and merge them into the music schema in one transaction.
+
+    Each data list is COPYed into a temporary staging table shaped like its target and
+    then merged with `INSERT ... SELECT ... ON CONFLICT DO NOTHING`, in dependency order
+    (artists, albums, album artists, songs, song artists, streams). Everything commits
+    together, so a failure part way through leaves no partial data behind, and the whole
+    load costs one round trip per statement instead of one commit per model.
+
+    Parameters:
+        engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
+        data_lists (list): Lists of Artist, Album, AlbumArtist, Song, SongArtist and
+                           SongStreamed objects, in that order.
+        metrics (utils.metrics.RunMetrics, optional): Records a stage per model.
+
+    Returns:
+        tuple: The rows inserted per model name (same shape as
+               insert_rows_with_conflict_handling) and None, or None and an error message.
+    """
+    row_counts = {}
+
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            for model, data_list in zip(ENTITY_MODELS, data_lists):
+                if not data_list:
+                    row_counts[model.__name__] = 0
+                    continue
+
+                columns = [column.name for column in model.__table__.columns]
+                with load_stage(metrics, model) as timed:
+                    row_counts[model.__name__] = copy_merge_table(
+                        cursor,
+                        model,
+                        (
+                            [getattr(item, column) for column in columns]
+                            for item in data_list
+                        ),
+                    )
+                    timed.items = len(data_list)
+                    timed.rows = row_counts[model.__name__]
+        connection.commit()
+
+    except Exception as e:
+        connection.rollback()
+        return None, str(e)
+
+    finally:
+        connection.close()
+
+    return row_counts, None
+
+
+def copy_merge_table(cursor, model, rows: Iterable[tuple]) -> int:
+    """
+    COPY rows into a temporary staging table shaped like the model's table and merge
+    them with `INSERT ... SELECT ... ON CONFLICT DO NOTHING`. The staging table is
+    dropped at commit.
+
+    Args:
+        cursor: A psycopg2 cursor obtained from `engine.raw_connection()`.
+        model: The model whose table is loaded.
+        rows (Iterable[tuple]): Values in table column order.
+
+    Returns:
+        int: The rows inserted.
+    """
+    table = model.__table__
+    columns = [column.name for column in table.columns]
+    column_list = ", ".join(columns)
+    stage = f"{table.name}_stage"
+
+    cursor.execute(f"CREATE TEMP TABLE {stage} (LIKE {table.fullname}) ON COMMIT DROP")
+    copy_rows(cursor, stage, columns, rows)
+    cursor.execute(
+        f"INSERT INTO {table.fullname} ({column_list}) "
+        f"SELECT {column_list} FROM {stage} ON CONFLICT DO NOTHING"
+    )
+    return cursor.rowcount
+
+
+def copy_rows(cursor, table: str, columns: list[str], rows: Iterable[tuple]) -> None:
+    """
+    Load rows into a table with PostgreSQL COPY.
+
+    Args:
+        cursor: A psycopg2 cursor obtained from `engine.raw_connection()`.
+        table (str): The (optionally schema qualified) table to copy into.
+        columns (list[str]): Column names in the order the row tuples use.
+        rows (Iterable[tuple]): The rows to load.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+    )
+
+
+def copy_stream_history(
+    engine, rows: Iterable[Tuple[str, str]], batch_size: int = 100_000
+) -> Dict[str, int]:
+    """
+    Bulk load (song_id, played_at) rows into stream_history and streams.
+
+    Rows are COPYed in batches into a temporary staging table and merged into
+    `music.stream_history` with `ON CONFLICT DO NOTHING`, so re-importing an export
+    is harmless. Rows whose song already exists in `music.songs` are merged into
+    `music.streams` in the same transaction; the rest wait for the song metadata.
+    Databases without COPY insert each batch with `ON CONFLICT DO NOTHING` and
+    promote the known songs once at the end (see promote_stream_history).
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
+        rows (Iterable[Tuple[str, str]]): Song ID and played_at pairs. May be a generator.
+        batch_size (int, optional): Number of rows COPYed and committed per transaction.
+
+    Returns:
+        Dict[str, int]: The number of rows read and the number inserted per model.
+    """
+    row_counts = {"rows_read": 0, StreamHistory.__name__: 0, SongStreamed.__name__: 0}
+    rows = iter(rows)
+
+    if not backend.is_postgresql(engine):
+        with SessionManager(engine) as session:
+            while batch := list(itertools.islice(rows, batch_size)):
+                row_counts[StreamHistory.__name__] += session.connection().execute(
+                    insert(engine, StreamHistory).on_conflict_do_nothing(),
+                    [
+                        {"song_id": song_id, "played_at": played_at}
+                        for song_id, played_at in batch
+                    ],
+                ).rowcount
+                session.commit()
+                row_counts["rows_read"] += len(batch)
+        row_counts[SongStreamed.__name__] = promote_stream_history(engine)
+        return row_counts
+
+    connection = engine.raw_connection()
+    try:
+        while batch := list(itertools.islice(rows, batch_size)):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "CREATE TEMP TABLE stream_history_stage "
+                    "(LIKE music.stream_history) ON COMMIT DROP"
+                )
+                copy_rows(
+                    cursor, "stream_history_stage", ["song_id", "played_at"], batch
+                )
+                cursor.execute(
+                    "INSERT INTO music.stream_history (song_id, played_at) "
+                    "SELECT song_id, played_at FROM stream_history_stage "
+                    "ON CONFLICT DO NOTHING"
+                )
+                row_counts[StreamHistory.__name__] += cursor.rowcount
+                cursor.execute(
+                    "INSERT INTO music.streams (song_id, played_at) "
+                    "SELECT stage.song_id, stage.played_at FROM stream_history_stage stage "
+                    "JOIN music.songs ON songs.id = stage.song_id "
+                    "ON CONFLICT DO NOTHING"
+                )
+                row_counts[SongStreamed.__name__] += cursor.rowcount
+            connection.commit()
+            row_counts["rows_read"] += len(batch)
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    if row_counts[SongStreamed.__name__]:
+        invalidate_results()
+    return row_counts
+
+
+def create_database(
+    database_url, partition_streams: bool = False, months_ahead: int = 3
+) -> None:
+    """
+    Create the schema, tables, indexes and rollup trigger that do not exist yet.
+
+    Args:
+        database_url (str): The database URI.
+        partition_streams (bool, optional): On PostgreSQL, create a new streams table
+                                            partitioned by month of played_at (see
+                                            database.partitioning).
+        months_ahead (int, optional): Monthly partitions to create past the current one.
+    """
     engine = create_engine(database_url)
+    backend.create_schema(engine)
+    if partition_streams and backend.is_postgresql(engine):
+        tables = Base.metadata.sorted_tables
+        Base.metadata.create_all(
+            engine, tables=[table for table in tables if table is not SongStreamed.__table__]
+        )
+        partitioning.create_partitioned_streams(engine, months_ahead)
     Base.metadata.create_all(engine)
+    create_indexes(engine)
+    create_rollup_trigger(engine)
+
+
+def create_rollup_trigger(engine) -> None:
+    """
+    Install (or replace) the trigger that maintains the daily rollup tables on insert into streams.
+
+    Engines without triggers (DuckDB) skip this; run rebuild_rollups after loading.
+    """
+    statements = {
+        "postgresql": STREAM_ROLLUP_TRIGGER_SQL,
+        "sqlite": SQLITE_STREAM_ROLLUP_TRIGGER_SQL,
+    }.get(backend.dialect_name(engine), [])
+    with engine.begin() as connection:
+        for statement in statements:
+            connection.execute(text(statement))
+
+
+def create_indexes(engine) -> list[str]:
+    """
+    Create every index declared on the models that does not exist yet.
+
+    `Base.metadata.create_all` only creates indexes together with new tables; this
+    also adds indexes declared later to tables that already exist.
+
+    Returns:
+    The names of the declared indexes.
+    """
+    index_names = []
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+            index_names.append(index.name)
+    return index_names
+
+
+def day_bounds(day) -> Tuple[datetime.datetime, datetime.datetime]:
+    """
+    Return the half-open [start, end) timestamp range covering a calendar day.
+
+    Comparing `played_at` against the bounds, instead of casting it to a date, keeps
+    the predicate sargable so the played_at indexes can be used.
+
+    Args:
+        day (datetime.date | datetime.datetime): The day; any time part is ignored.
+    """
+    if isinstance(day, datetime.datetime):
+        day = day.date()
+    start = datetime.datetime.combine(day, datetime.time.min)
+    return start, start + datetime.timedelta(days=1)
+
+
+def year_bounds(year: int) -> Tuple[datetime.datetime, datetime.datetime]:
+    """
+    Return the half-open [start, end) timestamp range covering a calendar year.
+    """
+    return datetime.datetime(year, 1, 1), datetime.datetime(year + 1, 1, 1)
+
+
+def played_within(column, start, end):
+    """
+    Build the sargable predicate `start <= column < end`.
+    """
+    return and_(column >= start, column < end)
 
 
 def get_all_song_ids(engine) -> list:
@@ -82,6 +373,121 @@ def get_artist_ids_without_genres(engine) -> list:
 #     return [result[0] for result in results]
 
 
+def get_bucketed_stream_counts(
+    engine,
+    start,
+    end,
+    bucket: str = "day",
+    song_id: Optional[str] = None,
+    artist_id: Optional[str] = None,
+) -> List[Tuple[datetime.datetime, int]]:
+    """
+    Count streams per time bucket over a range in a single query, including empty buckets.
+
+    The buckets come from `generate_series` and are left joined to the grouped stream
+    counts, so a bucket without streams is returned with a count of 0 (SQLite has no
+    generate_series, so there the empty buckets are filled in Python). The first
+    bucket starts at `start` truncated to the bucket size (weeks start on Monday).
+    Hourly buckets are counted from the streams table; day and larger buckets are
+    summed from the daily rollup tables and therefore cover whole days.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
+        start (datetime.date | datetime.datetime): Start of the range, inclusive.
+        end (datetime.date | datetime.datetime): End of the range, exclusive.
+        bucket (str, optional): One of TIME_BUCKETS.
+        song_id (Optional[str], optional): Only count streams of this song.
+        artist_id (Optional[str], optional): Only count streams of this artist's songs.
+
+    Returns:
+        List[Tuple[datetime.datetime, int]]: The start of every bucket in the range and
+                                             its stream count, in order.
+
+    Raises:
+        ValueError: If `bucket` is not one of TIME_BUCKETS.
+    """
+    if bucket not in TIME_BUCKETS:
+        raise ValueError(f"Unknown bucket {bucket!r}, use one of {TIME_BUCKETS}")
+    if not isinstance(start, datetime.datetime):
+        start = datetime.datetime.combine(start, datetime.time.min)
+    if not isinstance(end, datetime.datetime):
+        end = datetime.datetime.combine(end, datetime.time.min)
+
+    sqlite = backend.is_sqlite(engine)
+    if sqlite:
+        first_bucket = backend.truncate_datetime(start, bucket)
+    else:
+        first_bucket = backend.truncate_to(engine, bucket, cast(start, DateTime))
+
+    if bucket == "hour":
+        model, song_column = SongStreamed, SongStreamed.song_id
+        bucket_column = backend.truncate_to(engine, bucket, SongStreamed.played_at)
+        counts = select(
+            bucket_column.label("bucket"), func.count().label("stream_count")
+        ).where(played_within(SongStreamed.played_at, first_bucket, end))
+    else:
+        model = DailySongStreamCount if song_id or artist_id else DailyStreamCount
+        song_column = getattr(model, "song_id", None)
+        bucket_column = backend.truncate_to(
+            engine, bucket, model.day if sqlite else cast(model.day, DateTime)
+        )
+        end_day = end.date() + datetime.timedelta(days=end.time() != datetime.time.min)
+        first_day = first_bucket.date() if sqlite else cast(first_bucket, Date)
+        counts = select(
+            bucket_column.label("bucket"),
+            func.sum(model.stream_count).label("stream_count"),
+        ).where(played_within(model.day, first_day, end_day))
+
+    if song_id:
+        counts = counts.where(song_column == song_id)
+    if artist_id:
+        counts = counts.where(
+            song_column.in_(
+                select(SongArtist.song_id).where(SongArtist.artist_id == artist_id)
+            )
+        )
+    counts = counts.group_by(bucket_column)
+
+    if sqlite:
+        with SessionManager(engine) as session:
+            found = {row[0]: int(row[1]) for row in session.execute(counts)}
+        return [
+            (bucket_start, found.get(bucket_start, 0))
+            for bucket_start in backend.bucket_starts(start, end, bucket)
+        ]
+
+    counts = counts.subquery()
+    series = func.generate_series(
+        first_bucket, cast(end, DateTime), literal_column(f"interval '1 {bucket}'")
+    ).table_valued("bucket").render_derived()
+
+    with SessionManager(engine) as session:
+        return [
+            (row[0], int(row[1]))
+            for row in session.execute(
+                select(series.c.bucket, func.coalesce(counts.c.stream_count, 0))
+                .outerjoin(counts, counts.c.bucket == series.c.bucket)
+                .where(series.c.bucket < end)
+                .order_by(series.c.bucket)
+            )
+        ]
+
+
+def get_daily_stream_counts(engine, days: list) -> Dict[datetime.date, int]:
+    """
+    Return the stream count of every day from the earliest to the latest of `days`.
+    """
+    days = [day.date() if isinstance(day, datetime.datetime) else day for day in days]
+    if not days:
+        return {}
+    return {
+        bucket.date(): count
+        for bucket, count in get_bucketed_stream_counts(
+            engine, min(days), max(days) + datetime.timedelta(days=1)
+        )
+    }
+
+
 def get_distinct_artists(engine) -> list:
     with SessionManager(engine) as session:
         return [i[0] for i in session.query(distinct(Artist.id)).all()]
@@ -100,32 +506,85 @@ def get_distinct_song_ids(engine) -> list[SongStreamed.song_id]:
         ]
 
 
+def get_unknown_song_ids(engine) -> list[StreamHistory.song_id]:
+    """
+    Retrieve the distinct song IDs in stream_history that have no row in the songs table.
+
+    Returns:
+    A list of song IDs whose metadata still has to be requested from Spotify.
+    """
+    with SessionManager(engine) as session:
+        return [
+            song_id[0]
+            for song_id in session.query(StreamHistory.song_id)
+            .outerjoin(Song, Song.id == StreamHistory.song_id)
+            .filter(Song.id.is_(None))
+            .distinct()
+            .all()
+        ]
+
+
+def get_known_entity_ids(engine) -> Dict[str, set]:
+    """
+    Retrieve the IDs of every artist, album, album artist pair and song in the database.
+
+    Returns:
+    A dictionary of sets keyed by "artists", "albums", "album_artists" and "songs".
+    Album artist pairs are encoded as "album_id:artist_id".
+    """
+    with SessionManager(engine) as session:
+        return {
+            "artists": {row[0] for row in session.query(Artist.id)},
+            "albums": {row[0] for row in session.query(Album.id)},
+            "album_artists": {
+                f"{row[0]}:{row[1]}"
+                for row in session.query(AlbumArtist.album_id, AlbumArtist.artist_id)
+            },
+            "songs": {row[0] for row in session.query(Song.id)},
+        }
+
+
+def get_latest_played_at(engine) -> Optional[datetime.datetime]:
+    """
+    Retrieve the timestamp of the most recent stream in the database.
+
+    Returns:
+    The latest played_at value, or None if the streams table is empty.
+    """
+    with SessionManager(engine) as session:
+        return session.query(func.max(SongStreamed.played_at)).scalar()
+
+
 def get_percentage_difference(engine):
+    today = datetime.date.today()
+    try:
+        last_year_today = today.replace(year=today.year - 1)
+    except ValueError:
+        # February 29th
+        last_year_today = today.replace(year=today.year - 1, day=28)
+
     with SessionManager(engine) as session:
-        # Step 1: Get the total number of songs listened to up to the current date for the current year
         # Step 1: Get the total number of songs listened to up to the current date for the current year
         songs_this_year = (
-            session.query(func.count(func.distinct(SongStreamed.song_id)))
+            session.query(func.count(func.distinct(DailySongStreamCount.song_id)))
             .filter(
-                SongStreamed.played_at >= func.date_trunc("year", func.current_date())
+                played_within(
+                    DailySongStreamCount.day, today.replace(month=1, day=1), today
+                )
             )
-            .filter(SongStreamed.played_at <= func.current_date())
             .scalar()
         )
 
         # Step 2: Get the total number of songs listened to up to the same date of the previous year
         songs_last_year = (
-            session.query(func.count(func.distinct(SongStreamed.song_id)))
+            session.query(func.count(func.distinct(DailySongStreamCount.song_id)))
             .filter(
-                SongStreamed.played_at
-                >= func.date_trunc(
-                    "year", func.current_date() - text("interval '1 year'")
+                played_within(
+                    DailySongStreamCount.day,
+                    last_year_today.replace(month=1, day=1),
+                    last_year_today,
                 )
             )
-            .filter(
-                SongStreamed.played_at
-                <= func.current_date() - text("interval '1 year'")
-            )
             .scalar()
         )
 
@@ -137,28 +596,146 @@ def get_percentage_difference(engine):
     return round(percentage_difference)
 
 
-def get_random_songs(engine, num_songs: int) -> dict:
+def get_play_counts(
+    engine, since: Optional[datetime.datetime] = None
+) -> Tuple[Dict[str, int], Optional[datetime.datetime], int]:
+    """
+    Count the streams of every song, or only the streams played after `since`.
+
+    The full counts are summed from the daily_song_streams rollup; the counts after
+    `since` are read from the streams table through the played_at index. The counts,
+    the latest played_at and the total number of streams are read in one REPEATABLE
+    READ transaction.
+
+    Passing the returned timestamp as the next `since` only picks up streams played
+    later. Rows loaded afterwards with older timestamps (import_history,
+    backfill_songs, replay) are not counted; they show up as a total that grew by
+    more than the streams counted, and the caller has to count everything again.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
+        since (Optional[datetime.datetime], optional): Only count streams played after this.
+
+    Returns:
+        tuple: The stream count per song ID, the latest played_at counted and the
+               total number of streams in the database.
+    """
+    with SessionManager(engine) as session:
+        if backend.is_postgresql(engine):
+            session.connection(
+                execution_options={"isolation_level": "REPEATABLE READ"}
+            )
+        if since is None:
+            latest = session.query(func.max(SongStreamed.played_at)).scalar()
+            counts = session.query(
+                DailySongStreamCount.song_id, func.sum(DailySongStreamCount.stream_count)
+            ).group_by(DailySongStreamCount.song_id)
+        else:
+            latest = (
+                session.query(func.max(SongStreamed.played_at))
+                .filter(SongStreamed.played_at > since)
+                .scalar()
+            ) or since
+            counts = (
+                session.query(SongStreamed.song_id, func.count())
+                .filter(SongStreamed.played_at > since)
+                .group_by(SongStreamed.song_id)
+            )
+        total = session.query(func.sum(DailyStreamCount.stream_count)).scalar() or 0
+        return {song_id: int(count) for song_id, count in counts}, latest, int(total)
+
+
+def get_random_songs(
+    engine,
+    num_songs: int,
+    mode: str = "uniform",
+    recency_cap_days: int = 365,
+    oversample: float = 4.0,
+) -> dict:
     """
     Retrieve a dictionary containing today's date and a list of randomly selected song IDs.
 
+    The sample is drawn by the database; song IDs are never loaded into Python. In
+    "uniform" mode a Bernoulli TABLESAMPLE sized from the planner's row estimate
+    (times `oversample`) is shuffled and cut to `num_songs`; when the estimate is
+    missing or the sample comes back short the whole table is shuffled instead. The
+    weighted modes draw without replacement with the Efraimidis-Spirakis method,
+    ordering songs by -ln(u) / weight over the daily_song_streams rollup. Engines
+    without TABLESAMPLE always shuffle the whole table in "uniform" mode.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
+        num_songs (int): Number of song IDs to return; fewer are returned when the
+                         catalog is smaller.
+        mode (str, optional): One of RANDOM_SONG_MODES.
+        recency_cap_days (int, optional): Largest weight given in "not_recent" mode.
+        oversample (float, optional): Sample size multiplier in "uniform" mode.
+
     Returns:
     A dictionary with the following keys:
     - "today": The formatted date representing today in the format "YYYY-MM-DD".
-    - "song_ids": A list of 100 randomly selected song IDs.
+    - "song_ids": A list of up to `num_songs` randomly selected song IDs.
 
-    Note:
-    - The song IDs are randomly selected from all available songs in the database.
+    Raises:
+        ValueError: If `mode` is not one of RANDOM_SONG_MODES.
     """
+    if mode not in RANDOM_SONG_MODES:
+        raise ValueError(f"Unknown random song mode {mode!r}, use one of {RANDOM_SONG_MODES}")
+
     today = datetime.datetime.today().date()
     formatted_date = today.strftime("%Y-%m-%d")
     with SessionManager(engine) as session:
-        all_songs = [(song[0]) for song in session.query(Song.id).all()]
+        if mode == "uniform":
+            estimate = backend.is_postgresql(engine) and session.execute(
+                text("SELECT reltuples FROM pg_class WHERE oid = 'music.songs'::regclass")
+            ).scalar()
+            percent = (
+                min(100.0, 100.0 * oversample * num_songs / estimate)
+                if estimate and estimate > 0
+                else 100.0
+            )
+            song_ids = []
+            if percent < 100.0:
+                sampled = tablesample(Song.__table__, func.bernoulli(percent))
+                song_ids = session.scalars(
+                    select(sampled.c.id).order_by(func.random()).limit(num_songs)
+                ).all()
+            if len(song_ids) < num_songs:
+                song_ids = session.scalars(
+                    select(Song.id).order_by(func.random()).limit(num_songs)
+                ).all()
+        else:
+            stats, weight = random_song_weight(engine, mode, recency_cap_days)
+            song_ids = session.scalars(
+                select(Song.id)
+                .outerjoin(stats, stats.c.song_id == Song.id)
+                .order_by(-func.ln(1 - backend.random_fraction(engine)) / weight)
+                .limit(num_songs)
+            ).all()
+
         return {
             "today": formatted_date,
-            "song_ids": random.sample(all_songs, num_songs),
+            "song_ids": list(song_ids),
         }
 
 
+def get_song_artists(engine, song_ids: Iterable[str]) -> List[Tuple[str, str, str]]:
+    """
+    Return the (song_id, artist_id, artist_name) rows of the given songs.
+    """
+    song_ids = list(song_ids)
+    rows = []
+    with SessionManager(engine) as session:
+        for start in range(0, len(song_ids), 10_000):
+            rows.extend(
+                tuple(row)
+                for row in session.query(SongArtist.song_id, Artist.id, Artist.name)
+                .join(Artist, Artist.id == SongArtist.artist_id)
+                .filter(SongArtist.song_id.in_(song_ids[start : start + 10_000]))
+            )
+    return rows
+
+
 def get_songs_by_date(engine, query_date: datetime) -> list[tuple]:
     """
     Retrieve a list of songs streamed on a specific date.
@@ -177,7 +754,7 @@ def get_songs_by_date(engine, query_date: datetime) -> list[tuple]:
         return [
             (song[0], song[1])
             for song in session.query(SongStreamed.song_id, SongStreamed.played_at)
-            .filter(cast(SongStreamed.played_at, Date) == query_date)
+            .filter(played_within(SongStreamed.played_at, *day_bounds(query_date)))
             .order_by(SongStreamed.played_at)
             .all()
         ]
@@ -193,16 +770,8 @@ def get_song_id_count(engine, target_song_id: str) -> int:
 
 
 def get_stream_counts_by_day(engine, week_dates: list) -> list[int]:
-    with SessionManager(engine) as session:
-        stream_counts = []
-        for date in week_dates:
-            count = (
-                session.query(func.count(SongStreamed.song_id))
-                .filter(func.date(SongStreamed.played_at) == date.date())
-                .scalar()
-            )
-            stream_counts.append(count)
-        return stream_counts
+    counts = get_daily_stream_counts(engine, week_dates)
+    return [counts[date.date()] for date in week_dates]
 
 
 def get_table_counts(engine) -> dict:
@@ -221,6 +790,7 @@ def get_table_counts(engine) -> dict:
         ]
 
 
+@cached(ttl=3600)
 def get_top_songs_and_artists(engine) -> dict:
     """
     Retrieve the top song list and top artist list based on the number of times they have been streamed.
@@ -269,46 +839,45 @@ def get_top_songs_by_year(engine, year: int) -> list[Song.id]:
                 .over(partition_by=SongStreamed.song_id, order_by=func.count().desc())
                 .label("rank"),
             )
-            .filter(extract("year", SongStreamed.played_at) == year)
+            .filter(played_within(SongStreamed.played_at, *year_bounds(year)))
             .group_by(SongStreamed.song_id)
             .subquery()
         )
 
-    top_songs_of_year = (
-        session.query(subquery.c.song_id)
-        .filter(subquery.c.rank <= 50)
-        .order_by(subquery.c.count_per_year.desc(), subquery.c.song_id)
-        .distinct(subquery.c.song_id, subquery.c.count_per_year)
-        .limit(50)
-        .all()
-    )
+        top_songs_of_year = (
+            session.query(subquery.c.song_id)
+            .filter(subquery.c.rank <= 50)
+            .order_by(subquery.c.count_per_year.desc(), subquery.c.song_id)
+            .distinct(subquery.c.song_id, subquery.c.count_per_year)
+            .limit(50)
+            .all()
+        )
 
     return [song_id[0] for song_id in top_songs_of_year]
 
 
 def get_weekly_summary(engine, week: dict) -> dict:
-    with SessionManager(engine) as session:
-        for day in week:
-            day["count"] = (
-                session.query(func.count(SongStreamed.song_id))
-                .filter(cast(SongStreamed.played_at, Date) == day["week_day"])
-                .all()[0][0]
-            )
-        return week
+    counts = get_daily_stream_counts(engine, [day["week_day"] for day in week])
+    for day in week:
+        week_day = day["week_day"]
+        if isinstance(week_day, datetime.datetime):
+            week_day = week_day.date()
+        day["count"] = counts[week_day]
+    return week
 
 
+@cached(ttl=3600)
 def get_yesterday_top_ten(engine) -> dict:
     yesterday = datetime.datetime.utcnow().date() - datetime.timedelta(days=1)
     with SessionManager(engine) as session:
         top_ten_songs = (
             session.query(
-                SongStreamed.song_id,
-                func.count(SongStreamed.song_id).label("play_count"),
+                DailySongStreamCount.song_id,
+                DailySongStreamCount.stream_count.label("play_count"),
             )
-            .filter(cast(SongStreamed.played_at, Date) == yesterday)
-            .group_by(SongStreamed.song_id)
-            .having(func.count(SongStreamed.song_id) > 1)
-            .order_by(func.count(SongStreamed.song_id).desc())
+            .filter(DailySongStreamCount.day == yesterday)
+            .filter(DailySongStreamCount.stream_count > 1)
+            .order_by(DailySongStreamCount.stream_count.desc())
             .limit(10)
             .all()
         )
@@ -321,7 +890,7 @@ def get_yesterday_top_ten(engine) -> dict:
 
 
 def insert_rows_with_conflict_handling(
-    engine, data_lists
+    engine, data_lists, metrics=None
 ) -> Tuple[Optional[Dict[str, int]], Optional[str]]:
     """
     Bulk insert data into the database tables while ignoring duplicates.
@@ -331,6 +900,8 @@ def insert_rows_with_conflict_handling(
     Parameters:
         engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
         data_lists (list): A list of data lists for each database table. Each data list should contain data objects of the corresponding table's model.
+        metrics (utils.metrics.RunMetrics, optional): Records a stage per model, with
+                                                      the rows sent and inserted.
 
     Returns:
         tuple or None: A tuple with two elements: the result of the operation (None for success) and an error message in case of any exceptions (or None if no error occurred).
@@ -345,35 +916,33 @@ def insert_rows_with_conflict_handling(
 
     Note:
         - The data_lists should contain data objects with attributes matching the model fields.
-        - The primary key constraint names for each model should be provided in the model_to_constraint dictionary within the function.
+        - The data_lists must be in ENTITY_MODELS order.
         - The function uses a SessionManager to handle the database session.
         - The data classes in the data_lists should have a custom 'as_dict()' method that returns a dictionary representation of the data object.
 
     """
-    model_to_constraint = {
-        Artist: "artists_pkey",
-        Album: "albums_pkey",
-        AlbumArtist: "album_artists_pkey",
-        Song: "songs_pkey",
-        SongArtist: "song_artists_pkey",
-        SongStreamed: "streams_pkey",
-    }
-
     row_counts = {}
 
     with SessionManager(engine) as session:
-        for model, data_list in zip(model_to_constraint, data_lists):
-            insert_stmt = insert(model).values([item.as_dict() for item in data_list])
-
-            primary_key = model_to_constraint[model]
+        for model, data_list in zip(ENTITY_MODELS, data_lists):
+            if not data_list:
+                row_counts[model.__name__] = 0
+                continue
 
-            on_conflict_stmt = insert_stmt.on_conflict_do_nothing(
-                constraint=primary_key
+            insert_stmt = insert(engine, model).values(
+                [item.as_dict() for item in data_list]
             )
 
+            # Without a conflict target any duplicate key is skipped, which for these
+            # tables is the primary key; SQLite has no named constraints to target.
+            on_conflict_stmt = insert_stmt.on_conflict_do_nothing()
+
             try:
-                result = session.execute(on_conflict_stmt)
-                session.commit()
+                with load_stage(metrics, model) as timed:
+                    result = session.execute(on_conflict_stmt)
+                    session.commit()
+                    timed.items = len(data_list)
+                    timed.rows = result.rowcount
 
                 row_counts[model.__name__] = result.rowcount
 
@@ -388,6 +957,136 @@ def insert_rows_with_conflict_handling(
     return row_counts, None
 
 
+def iter_streams_with_metadata(
+    engine,
+    after: Optional[datetime.datetime] = None,
+    chunk_size: int = 50_000,
+) -> Iterable[List[tuple]]:
+    """
+    Stream the streams table joined with its songs and albums in played_at order.
+
+    Rows are fetched through a server-side cursor and yielded in lists of at most
+    `chunk_size`, so memory stays bounded however long the history is.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
+        after (Optional[datetime.datetime], optional): Only rows played after this.
+        chunk_size (int, optional): Rows per yielded chunk.
+
+    Yields:
+        List[tuple]: (played_at, song_id, song_name, length, album_id, album_name,
+                     release_year) rows.
+    """
+    query = (
+        select(
+            SongStreamed.played_at,
+            Song.id,
+            Song.name,
+            Song.length,
+            Album.id,
+            Album.name,
+            Album.release_year,
+        )
+        .join(Song, Song.id == SongStreamed.song_id)
+        .join(Album, Album.id == Song.album_id)
+        .order_by(SongStreamed.played_at)
+    )
+    if after is not None:
+        query = query.where(SongStreamed.played_at > after)
+
+    with engine.connect() as connection:
+        result = connection.execution_options(
+            stream_results=True, yield_per=chunk_size
+        ).execute(query)
+        for partition in result.partitions():
+            yield [tuple(row) for row in partition]
+
+
+def load_entities(
+    engine, data_lists, load_engine: str = "insert", metrics=None
+) -> Tuple[Optional[Dict[str, int]], Optional[str]]:
+    """
+    Load parsed entity lists with the configured load engine.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
+        data_lists (list): Lists of Artist, Album, AlbumArtist, Song, SongArtist and
+                           SongStreamed objects, in that order.
+        load_engine (str, optional): "insert" for one INSERT and commit per model
+                                     (insert_rows_with_conflict_handling) or "copy" for
+                                     a single COPY-and-merge transaction (copy_merge_rows).
+                                     "copy" falls back to "insert" on engines other
+                                     than PostgreSQL.
+        metrics (utils.metrics.RunMetrics, optional): Records a `load_<table>` stage
+                                                      per model.
+
+    Returns:
+        tuple: The rows inserted per model name and an error message (or None).
+
+    Raises:
+        ValueError: If the load engine is unknown.
+    """
+    if load_engine not in LOAD_ENGINES:
+        raise ValueError(
+            f"Unknown load engine {load_engine!r}, choose from {sorted(LOAD_ENGINES)}"
+        )
+    if load_engine == "copy" and not backend.is_postgresql(engine):
+        load_engine = "insert"
+    row_counts, error = LOAD_ENGINES[load_engine](engine, data_lists, metrics)
+    if row_counts and row_counts.get(SongStreamed.__name__):
+        invalidate_results()
+    return row_counts, error
+
+
+def load_rows(engine, model, rows: List[tuple]) -> int:
+    """
+    Bulk load row tuples into a model's table in one transaction, skipping rows whose
+    key already exists.
+
+    PostgreSQL loads through COPY and a merge (copy_merge_table); other engines use
+    one executemany INSERT ... ON CONFLICT DO NOTHING. Unlike load_entities no entity
+    objects are built, which matters when replaying millions of rows.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
+        model: The model whose table is loaded.
+        rows (List[tuple]): Values in table column order.
+
+    Returns:
+        int: The rows inserted.
+    """
+    if not rows:
+        return 0
+    if backend.is_postgresql(engine):
+        connection = engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                inserted = copy_merge_table(cursor, model, rows)
+            connection.commit()
+        finally:
+            connection.close()
+    else:
+        columns = [column.name for column in model.__table__.columns]
+        with engine.begin() as connection:
+            inserted = connection.execute(
+                insert(engine, model).on_conflict_do_nothing(),
+                [dict(zip(columns, row)) for row in rows],
+            ).rowcount
+    if model is SongStreamed and inserted:
+        invalidate_results()
+    return inserted
+
+
+def load_stage(metrics, model):
+    """
+    Time the load of one model as a `load_<table>` stage of a utils.metrics.RunMetrics;
+    without metrics the block runs untimed.
+    """
+    if metrics is None:
+        return contextlib.nullcontext(types.SimpleNamespace())
+    return metrics.stage(f"load_{model.__tablename__}")
+
+
 def monthly_summary(engine, date: datetime) -> list[dict]:
     """
     Get the daily summary of song streams for a specific month.
@@ -402,117 +1101,266 @@ def monthly_summary(engine, date: datetime) -> list[dict]:
 
     Note:
     - The date parameter should include the month and year information, while the day information will be ignored.
-    - The summary includes only the days within the specified month.
+    - The summary includes every day of the month up to and including `date`; days
+      without streams have a count of 0.
+    """
+    if isinstance(date, datetime.datetime):
+        date = date.date()
+    return [
+        {"day": bucket.strftime("%d"), "count": count}
+        for bucket, count in get_bucketed_stream_counts(
+            engine, date.replace(day=1), date + datetime.timedelta(days=1)
+        )
+    ]
+
+
+def promote_stream_history(engine) -> int:
+    """
+    Copy stream_history rows whose song metadata is now known into the streams table.
+
+    Returns:
+    The number of rows inserted into the streams table.
     """
     with SessionManager(engine) as session:
-        return [
-            {"day": day[0].strftime("%d"), "count": day[1]}
-            for day in session.query(
-                cast(SongStreamed.played_at, Date),
-                func.count(cast(SongStreamed.played_at, Date)),
+        result = session.execute(
+            insert(engine, SongStreamed)
+            .from_select(
+                ["song_id", "played_at"],
+                # SQLite needs a WHERE clause to tell the upsert's ON from the join's.
+                select(StreamHistory.song_id, StreamHistory.played_at)
+                .join(Song, Song.id == StreamHistory.song_id)
+                .where(true()),
             )
-            .filter(
-                cast(SongStreamed.played_at, Date).between(date.replace(day=1), date)
+            .on_conflict_do_nothing()
+        )
+        session.commit()
+    if result.rowcount:
+        invalidate_results()
+    return result.rowcount
+
+
+def random_song_weight(engine, mode: str, recency_cap_days: int = 365):
+    """
+    Build the per-song sampling weight and the subquery it reads play statistics from.
+
+    "play_count" weights a song by its number of plays plus one, so unplayed songs can
+    still be picked. "not_recent" weights it by the days since it was last played
+    (capped at `recency_cap_days`, which is also the weight of never played songs).
+
+    Returns:
+        tuple: The stats subquery (song_id, plays, last_played) and the weight expression.
+    """
+    stats = (
+        select(
+            DailySongStreamCount.song_id,
+            func.sum(DailySongStreamCount.stream_count).label("plays"),
+            func.max(DailySongStreamCount.day).label("last_played"),
+        )
+        .group_by(DailySongStreamCount.song_id)
+        .subquery()
+    )
+    if mode == "play_count":
+        weight = func.coalesce(stats.c.plays, 0) + 1
+    else:
+        weight = (
+            backend.least(
+                engine,
+                func.coalesce(
+                    backend.days_since(engine, stats.c.last_played), recency_cap_days
+                ),
+                recency_cap_days,
             )
-            .group_by(cast(SongStreamed.played_at, Date))
-            .all()
-        ]
+            + 1
+        )
 
+    return stats, weight
 
-def summary_queries(engine) -> dict:
-    year = datetime.datetime.utcnow().year
-    year_begin = datetime.datetime(year, 1, 1)
-    year_end = datetime.datetime(year, 12, 31)
 
+def rebuild_rollups(engine) -> Dict[str, int]:
+    """
+    Recompute the daily rollup tables from the full streams table.
+
+    The rollups are maintained incrementally by a trigger on music.streams; this is
+    for populating them from existing history, or repairing them after rows were
+    deleted from streams. Both tables are rebuilt in a single transaction.
+
+    Returns:
+    The number of rows written per rollup table.
+    """
+    day = backend.to_date(engine, SongStreamed.played_at)
     with SessionManager(engine) as session:
-        return {
-            "table_counts": table_counts(engine),
-            "stream_count_per_day": (
-                session.query(
-                    cast(SongStreamed.played_at, Date),
-                    func.count(cast(SongStreamed.played_at, Date)),
-                )
-                .group_by(cast(SongStreamed.played_at, Date))
-                .order_by(func.count(cast(SongStreamed.played_at, Date)))
-                .all()
-            ),
-            "freq_by_day": (
-                session.query(
-                    cast(SongStreamed.played_at, Date),
-                    func.count(cast(SongStreamed.played_at, Date)),
+        session.query(DailyStreamCount).delete()
+        session.query(DailySongStreamCount).delete()
+        row_counts = {
+            DailyStreamCount.__name__: session.execute(
+                insert(engine, DailyStreamCount).from_select(
+                    ["day", "stream_count"],
+                    select(day, func.count()).group_by(day),
                 )
-                .group_by(cast(SongStreamed.played_at, Date))
-                .order_by(cast(SongStreamed.played_at, Date).desc())
-                .all()
-            ),
-            "play_today": (
-                session.query(func.count(SongStreamed.song_id))
-                .filter(
-                    cast(SongStreamed.played_at, Date)
-                    == datetime.datetime.utcnow().date()
-                )
-                .first()
-            ),
-            "top_artist_year": (
-                session.query(
-                    func.count(Artist.id).label("artist_count"),
-                    Artist.name.label("artist_name"),
-                )
-                .join(SongArtist, SongArtist.artist_id == Artist.id, isouter=True)
-                .join(
-                    SongStreamed,
-                    SongStreamed.song_id == SongArtist.song_id,
-                    isouter=True,
-                )
-                .filter(cast(SongStreamed.played_at, Date) >= "2022-12-31")
-                .group_by(Artist.id, Artist.name)
-                .order_by(func.count(Artist.id).desc())
-                .limit(1)
-                .first()
-            ),
-            "top_song_today": (
-                session.query(
-                    func.count(SongStreamed.song_id),
-                    Song.name,
-                    Artist.name,
-                )
-                .join(SongArtist, SongArtist.song_id == SongStreamed.song_id)
-                .join(Song, Song.id == SongStreamed.song_id)
-                .join(Artist, Artist.id == SongArtist.artist_id)
-                .filter(
-                    cast(SongStreamed.played_at, Date)
-                    == datetime.datetime.utcnow().date()
+            ).rowcount,
+            DailySongStreamCount.__name__: session.execute(
+                insert(engine, DailySongStreamCount).from_select(
+                    ["day", "song_id", "stream_count"],
+                    select(day, SongStreamed.song_id, func.count()).group_by(
+                        day, SongStreamed.song_id
+                    ),
                 )
-                .group_by(SongStreamed.song_id, Song.name, Artist.name)
-                .order_by(func.count(SongStreamed.song_id).desc())
-                .first()
-            ),
-            "top_song_year": (
-                session.query(
-                    func.count(SongStreamed.song_id),
-                    Song.name,
-                    Artist.name,
-                )
-                .join(Song, Song.id == SongStreamed.song_id)
-                .join(SongArtist, SongArtist.song_id == SongStreamed.song_id)
-                .join(Artist, Artist.id == SongArtist.artist_id)
-                .filter(cast(SongStreamed.played_at, Date) >= year_begin)
-                .group_by(SongStreamed.song_id, Song.name, Artist.name)
-                .order_by(func.count(SongStreamed.song_id).desc())
-                .first()
-            ),
-            "year_count": (
-                session.query(SongStreamed)
-                .filter(SongStreamed.played_at.between(year_begin, year_end))
-                .count()
-            ),
-            "days": (
-                session.query(func.sum(Song.length))
-                .join(SongStreamed, Song.id == SongStreamed.song_id, isouter=True)
-                .first()
-            ),
-            "percentage_from_last_year": get_percentage_difference(engine),
+            ).rowcount,
         }
+        session.commit()
+    invalidate_results()
+    return row_counts
+
+
+def run_queries(
+    engine, queries: Dict[str, Callable], max_workers: int = 1
+) -> Tuple[dict, Dict[str, float]]:
+    """
+    Run independent queries, optionally concurrently, each in its own session.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
+            Its connection pool should hold at least `max_workers` connections.
+        queries (Dict[str, Callable]): Functions taking a session and returning a result,
+                                       keyed by result name.
+        max_workers (int, optional): Number of queries in flight at once; 1 runs them
+                                     one after another.
+
+    Returns:
+        tuple: The results keyed like `queries` (in the same order) and the wall time of
+               each query in seconds.
+    """
+
+    def timed_query(name: str):
+        start = time.perf_counter()
+        with SessionManager(engine) as session:
+            result = queries[name](session)
+        return result, time.perf_counter() - start
+
+    if max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            outcomes = dict(zip(queries, executor.map(timed_query, queries)))
+    else:
+        outcomes = {name: timed_query(name) for name in queries}
+
+    return (
+        {name: outcome[0] for name, outcome in outcomes.items()},
+        {name: outcome[1] for name, outcome in outcomes.items()},
+    )
+
+
+def run_summary_queries(
+    engine, max_workers: int = 1
+) -> Tuple[dict, Dict[str, float]]:
+    """
+    Run the summary queries and time each one.
+
+    The queries are independent, so with `max_workers` > 1 they are sent concurrently
+    over the engine's connection pool and the summary takes about as long as the
+    slowest query instead of the sum of all of them. The queries always run; use
+    summary_queries for results cached until new streams are loaded.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
+        max_workers (int, optional): Number of queries in flight at once.
+
+    Returns:
+        tuple: The dictionary consumed by summary_main and the seconds spent per query.
+    """
+    year = datetime.datetime.utcnow().year
+    year_begin = datetime.date(year, 1, 1)
+    today = datetime.datetime.utcnow().date()
+
+    queries = {
+        "table_counts": lambda session: table_counts(engine),
+        "stream_count_per_day": lambda session: (
+            session.query(DailyStreamCount.day, DailyStreamCount.stream_count)
+            .order_by(DailyStreamCount.stream_count)
+            .all()
+        ),
+        "freq_by_day": lambda session: (
+            session.query(DailyStreamCount.day, DailyStreamCount.stream_count)
+            .order_by(DailyStreamCount.day.desc())
+            .all()
+        ),
+        "play_today": lambda session: tuple(
+            count
+            for _, count in get_bucketed_stream_counts(
+                engine, today, today + datetime.timedelta(days=1)
+            )
+        ),
+        "top_artist_year": lambda session: (
+            session.query(
+                func.sum(DailySongStreamCount.stream_count).label("artist_count"),
+                Artist.name.label("artist_name"),
+            )
+            .join(SongArtist, SongArtist.artist_id == Artist.id)
+            .join(
+                DailySongStreamCount,
+                DailySongStreamCount.song_id == SongArtist.song_id,
+            )
+            .filter(DailySongStreamCount.day >= year_begin)
+            .group_by(Artist.id, Artist.name)
+            .order_by(func.sum(DailySongStreamCount.stream_count).desc())
+            .limit(1)
+            .first()
+        ),
+        "top_song_today": lambda session: (
+            session.query(
+                func.sum(DailySongStreamCount.stream_count),
+                Song.name,
+                Artist.name,
+            )
+            .join(SongArtist, SongArtist.song_id == DailySongStreamCount.song_id)
+            .join(Song, Song.id == DailySongStreamCount.song_id)
+            .join(Artist, Artist.id == SongArtist.artist_id)
+            .filter(DailySongStreamCount.day == today)
+            .group_by(DailySongStreamCount.song_id, Song.name, Artist.name)
+            .order_by(func.sum(DailySongStreamCount.stream_count).desc())
+            .first()
+        ),
+        "top_song_year": lambda session: (
+            session.query(
+                func.sum(DailySongStreamCount.stream_count),
+                Song.name,
+                Artist.name,
+            )
+            .join(Song, Song.id == DailySongStreamCount.song_id)
+            .join(SongArtist, SongArtist.song_id == DailySongStreamCount.song_id)
+            .join(Artist, Artist.id == SongArtist.artist_id)
+            .filter(DailySongStreamCount.day >= year_begin)
+            .group_by(DailySongStreamCount.song_id, Song.name, Artist.name)
+            .order_by(func.sum(DailySongStreamCount.stream_count).desc())
+            .first()
+        ),
+        "year_count": lambda session: sum(
+            count
+            for _, count in get_bucketed_stream_counts(
+                engine, *year_bounds(year), bucket="year"
+            )
+        ),
+        "days": lambda session: (
+            session.query(
+                func.sum(Song.length * DailySongStreamCount.stream_count)
+            )
+            .join(DailySongStreamCount, Song.id == DailySongStreamCount.song_id)
+            .first()
+        ),
+        "percentage_from_last_year": lambda session: get_percentage_difference(
+            engine
+        ),
+    }
+
+    return run_queries(engine, queries, max_workers)
+
+
+@cached()
+def summary_queries(engine, max_workers: int = 1) -> dict:
+    """
+    Run the summary queries (see run_summary_queries) and return only their results,
+    which are cached until new streams are loaded.
+    """
+    return run_summary_queries(engine, max_workers)[0]
 
 
 def table_counts(engine) -> dict:
@@ -523,6 +1371,7 @@ def table_counts(engine) -> dict:
         ]
 
 
+@cached(ttl=3600)
 def top_streamed_song_ids(engine) -> list:
     """
     Get a playlist of the most streamed songs.
@@ -548,3 +1397,9 @@ def top_streamed_song_ids(engine) -> list:
 def update_song_length(engine, id: str, length: int) -> dict:
     with SessionManager(engine) as session:
         (session.query(Song).filter(Song.id == id).update({Song.length: length}))
+
+
+LOAD_ENGINES = {
+    "copy": copy_merge_rows,
+    "insert": insert_rows_with_conflict_handling,
+}
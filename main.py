@@ -1,26 +1,173 @@
 import argparse
+import collections
+import datetime
+import functools
+import glob
+import importlib
+import itertools
 import json
-
-from sqlalchemy import create_engine, exc as SQLAlchemyError
+import signal
+import threading
+import time
 
 from config import Config
-from database.utils import (
-    create_database,
-    get_random_songs,
-    get_song_id_count,
-    get_yesterday_top_ten,
-    insert_rows_with_conflict_handling,
-    summary_queries,
-)
-from utils.lib import (
-    create_new_playlist,
-    get_spotify_client,
-    is_spotify_instance,
-    parse_current_song,
-    parse_recent_tracks,
-    prompt_for_playlist_info,
-    summary_main,
-)
+from database.cache import configure_result_cache, get_result_cache
+
+# Modules each command needs, imported only when that command is dispatched so a cron
+# `etl` run does not pay for spotipy, numpy or matplotlib it never uses.
+# benchmarks/startup_time.py checks the import time of every entry against a budget,
+# and that each entry matches the imports of the command's function.
+COMMAND_MODULES = {
+    "backfill_songs": [
+        "database.backend",
+        "database.utils",
+        "utils.backfill",
+        "utils.spotify",
+    ],
+    "create_new_spotify_playlist": ["utils.spotify"],
+    "create_partitions": ["database.backend", "database.partitioning"],
+    "current_song": [
+        "database.backend",
+        "database.utils",
+        "utils.parsing",
+        "utils.spotify",
+    ],
+    "daemon": [
+        "database.analytics",
+        "database.backend",
+        "database.partitioning",
+        "database.utils",
+        "sqlalchemy.exc",
+        "utils.archive",
+        "utils.entity_cache",
+        "utils.metrics",
+        "utils.parsing",
+        "utils.playlist_sync",
+        "utils.scheduler",
+        "utils.spotify",
+        "utils.summary",
+    ],
+    "daily_playlist": [],
+    "db_setup": ["database.utils", "sqlalchemy.exc"],
+    "etl": [
+        "database.backend",
+        "database.utils",
+        "sqlalchemy.exc",
+        "utils.archive",
+        "utils.entity_cache",
+        "utils.metrics",
+        "utils.parsing",
+        "utils.spotify",
+    ],
+    "etl_metrics": ["utils.metrics"],
+    "export_history": ["database.backend", "utils.export"],
+    "import_history": ["database.backend", "database.utils", "utils.parsing"],
+    "partition_streams": ["database.backend", "database.partitioning"],
+    "random_playlist": [
+        "database.backend",
+        "database.utils",
+        "utils.playlist_sync",
+        "utils.spotify",
+    ],
+    "rebuild_rollups": ["database.backend", "database.utils"],
+    "replay": ["database.backend", "utils.archive"],
+    "summary": [
+        "database.analytics",
+        "database.backend",
+        "database.utils",
+        "utils.summary",
+    ],
+    "sync_analytics": ["database.analytics", "database.backend"],
+    "verify_indexes": ["database.backend", "database.profiling"],
+    "verify_partitions": ["database.backend", "database.partitioning"],
+    "watch_current_song": [
+        "database.backend",
+        "utils.now_playing",
+        "utils.parsing",
+        "utils.spotify",
+    ],
+    "wordclouds": ["database.backend", "database.utils", "utils.word_cloud"],
+    "yesterday": [
+        "database.backend",
+        "database.utils",
+        "utils.playlist_sync",
+        "utils.spotify",
+    ],
+}
+
+
+def load_command(name: str) -> None:
+    """
+    Import the modules a command needs.
+
+    Args:
+        name (str): The value passed to --function.
+    """
+    for module_name in COMMAND_MODULES[name]:
+        importlib.import_module(module_name)
+
+
+def backfill_songs(config: Config) -> None:
+    """
+    Request metadata for every song in stream_history that is missing from the songs table.
+
+    This implements steps 4-6 of the personal data flowchart: the unknown song IDs are
+    found with an anti-join, fetched from the Spotify API 50 at a time by a bounded,
+    rate limited thread pool, and the resulting artists, albums and songs are loaded
+    batch by batch. Finally the stream_history rows of the now known songs are copied
+    into the streams table. The command is resumable; re-running it only requests the
+    IDs that are still unknown.
+
+    Args:
+        config (Config): An instance of the Config class containing Spotify credentials,
+                         database URI, and logging configurations.
+
+    Returns:
+        None
+
+    Raises:
+        Exception: If an unexpected error occurs during the backfill.
+    """
+    from database.backend import create_engine
+    from database.utils import get_unknown_song_ids, promote_stream_history
+    from utils.backfill import backfill_song_metadata
+    from utils.spotify import get_spotify_client, is_spotify_instance
+
+    try:
+        engine = create_engine(config.db_config["db_uri"])
+        spotify_credentials = dict(config.config["spotify"])
+        sp = get_spotify_client(spotify_credentials)
+        if not is_spotify_instance(sp):
+            raise ValueError(f"Error occured while creating Spotify client: {sp}")
+
+        song_ids = get_unknown_song_ids(engine)
+        config.file_logger.info("Backfilling metadata for %s song IDs", len(song_ids))
+
+        start = time.perf_counter()
+        totals = backfill_song_metadata(
+            engine,
+            sp,
+            song_ids,
+            max_workers=config.config.getint("backfill", "max_workers", fallback=4),
+            calls_per_second=config.config.getfloat(
+                "backfill", "calls_per_second", fallback=5.0
+            ),
+            skip_file=config.config.get("file_paths", "backfill_skipped", fallback=None),
+            load_engine=config.config.get("etl", "load_engine", fallback="insert"),
+            log=config.file_logger.error,
+        )
+        totals["SongStreamed"] = promote_stream_history(engine)
+        elapsed = time.perf_counter() - start
+
+        for name, count in totals.items():
+            config.file_logger.info("%s: %s", name, count)
+        config.file_logger.info(
+            "Backfilled %s song IDs in %.2fs", len(song_ids), elapsed
+        )
+
+    except Exception as e:
+        config.file_logger.critical("Backfill failed with error: %s", e)
+        raise
 
 
 def create_new_spotify_playlist(config: Config) -> None:
@@ -42,6 +189,13 @@ def create_new_spotify_playlist(config: Config) -> None:
         and requires a valid Spotify developer account and credentials.
 
     """
+    from utils.spotify import (
+        create_new_playlist,
+        get_spotify_client,
+        is_spotify_instance,
+        prompt_for_playlist_info,
+    )
+
     try:
         spotify_credentials = dict(config.config["spotify"])
         sp = get_spotify_client(spotify_credentials)
@@ -64,12 +218,51 @@ def create_new_spotify_playlist(config: Config) -> None:
         raise Exception("Error while creating playlist.") from e
 
 
-def current_song(config: Config) -> None:
+def create_partitions(config: Config, engine=None, sp=None) -> None:
+    """
+    Create the monthly partitions of music.streams for the next `[partitioning]
+    months_ahead` months (default 3).
+
+    Plays from months without a partition land in the default partition; this also
+    moves them into partitions of their own. Does nothing unless streams is
+    partitioned (see db_setup and partition_streams), so the daemon can schedule it
+    unconditionally.
+
+    Args:
+        config (Config): An instance of the Config class containing the database URI
+                         and logging configurations.
+        engine (sqlalchemy.engine.Engine, optional): Engine to reuse; created from the
+                         config when omitted.
+        sp (spotipy.Spotify, optional): Unused; accepted so all scheduled commands share
+                         one signature.
+
+    Returns:
+        None
+    """
+    from database.backend import create_engine
+    from database.partitioning import ensure_partitions, is_partitioned
+
+    engine = engine or create_engine(config.db_config["db_uri"])
+    if not is_partitioned(engine):
+        config.file_logger.debug("music.streams is not partitioned")
+        return
+    created = ensure_partitions(
+        engine, config.config.getint("partitioning", "months_ahead", fallback=3)
+    )
+    if created:
+        config.file_logger.info("Created partitions: %s", ", ".join(created))
+
+
+def current_song(config: Config, engine=None, sp=None) -> None:
     """
     Get the currently playing song from the Spotify API and print its information.
 
     Parameters:
         config (Config()): The configuration object containing database and API credentials.
+        engine (sqlalchemy.engine.Engine, optional): Engine to reuse; created from the
+                         config when omitted.
+        sp (spotipy.Spotify, optional): Spotify client to reuse; created from the config
+                         when omitted.
 
     Raises:
         Exception: If there is an error while fetching or processing the song data.
@@ -77,10 +270,15 @@ def current_song(config: Config) -> None:
     Returns:
         None
     """
+    from database.backend import create_engine
+    from database.utils import get_song_id_count
+    from utils.parsing import parse_current_song
+    from utils.spotify import get_spotify_client, is_spotify_instance
+
     try:
-        engine = create_engine(config.db_config["db_uri"])
+        engine = engine or create_engine(config.db_config["db_uri"])
         spotify_credentials = dict(config.config["spotify"])
-        sp = get_spotify_client(spotify_credentials)
+        sp = sp or get_spotify_client(spotify_credentials)
         if is_spotify_instance(sp):
             song_data = sp.currently_playing()
 
@@ -100,12 +298,95 @@ def current_song(config: Config) -> None:
         raise Exception("Error while fetching or processing song data.") from e
 
 
+def daemon(config: Config) -> None:
+    """
+    Run the scheduled commands from one long-lived process instead of one cron process each.
+
+    A single pooled database engine and a single Spotify client are created up front
+    and shared by every job, so each run only pays for its actual work. Intervals in
+    seconds are read from the `[schedule]` section (`create_partitions`,
+    `current_song`, `etl`, `random_playlist`, `summary`, `sync_analytics`,
+    `yesterday`; 0 disables a job)
+    and each interval is randomised by up to `[daemon] jitter` seconds. A job that is
+    still running when it falls due again is skipped. SIGINT and SIGTERM stop the daemon after the
+    running jobs finish.
+
+    Args:
+        config (Config): An instance of the Config class containing database URI,
+                         Spotify credentials, schedule, and logging configurations.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: If no job is enabled or the Spotify client cannot be created.
+    """
+    from database.backend import create_engine
+    from utils.scheduler import Scheduler
+    from utils.spotify import get_spotify_client, is_spotify_instance
+
+    default_intervals = {
+        "create_partitions": 86400,
+        "current_song": 0,
+        "etl": 900,
+        "random_playlist": 86400,
+        "summary": 0,
+        "sync_analytics": 0,
+        "yesterday": 86400,
+    }
+    commands = {
+        "create_partitions": create_partitions,
+        "current_song": current_song,
+        "etl": etl,
+        "random_playlist": random_song_playlist,
+        "summary": summary,
+        "sync_analytics": sync_analytics,
+        "yesterday": yesterday_top_ten,
+    }
+
+    max_workers = config.config.getint("daemon", "max_workers", fallback=4)
+    jitter = config.config.getfloat("daemon", "jitter", fallback=10.0)
+    engine = create_engine(
+        config.db_config["db_uri"],
+        pool_size=config.config.getint("summary", "max_workers", fallback=4),
+        pool_pre_ping=True,
+    )
+    sp = get_spotify_client(dict(config.config["spotify"]))
+    if not is_spotify_instance(sp):
+        raise ValueError(f"Error occured while creating Spotify client: {sp}")
+
+    scheduler = Scheduler(config.file_logger, max_workers)
+    for name, command in commands.items():
+        interval = config.config.getfloat(
+            "schedule", name, fallback=default_intervals[name]
+        )
+        if interval > 0:
+            scheduler.add_job(
+                name, functools.partial(command, config, engine, sp), interval, jitter
+            )
+            config.file_logger.info("Scheduled %s every %ss", name, interval)
+
+    if not scheduler.jobs:
+        raise ValueError("No jobs enabled in the [schedule] config section.")
+
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+    config.file_logger.info("Daemon started")
+    scheduler.run()
+    engine.dispose()
+    config.file_logger.info("Result cache: %s", get_result_cache().stats())
+    config.file_logger.info("Daemon stopped")
+
+
 def db_setup(config: Config) -> None:
     """
     Set up the database based on the provided configuration.
 
     This function attempts to create the necessary database tables using SQLAlchemy,
-    based on the database URI provided in the config object.
+    based on the database URI provided in the config object. With `[partitioning]
+    enabled = true` a new PostgreSQL database gets music.streams partitioned by month
+    of played_at, with partitions up to `[partitioning] months_ahead` months ahead;
+    convert an existing database with partition_streams.
 
     Args:
         config (Config): An instance of the Config class containing the database URI
@@ -122,9 +403,17 @@ def db_setup(config: Config) -> None:
         This function uses SQLAlchemy to interact with the database. Make sure to
         provide a valid and accessible database URI in the config object.
     """
+    from sqlalchemy.exc import SQLAlchemyError
+
+    from database.utils import create_database
+
     try:
         config.file_logger.info("Attempting database creation")
-        create_database(config.db_config["db_uri"])
+        create_database(
+            config.db_config["db_uri"],
+            config.config.getboolean("partitioning", "enabled", fallback=False),
+            config.config.getint("partitioning", "months_ahead", fallback=3),
+        )
 
     except SQLAlchemyError as e:
         config.file_logger.error(f"An error occurred while creating the database: {e}")
@@ -133,19 +422,37 @@ def db_setup(config: Config) -> None:
         config.file_logger.error(f"An unexpected error occurred: {e}")
 
 
-def etl(config: Config) -> None:
+def etl(config: Config, engine=None, sp=None) -> None:
     """
     Extract, transform, and load (ETL) Spotify recently played tracks data into the database.
 
     This function extracts the recently played tracks data from the user's Spotify account
-    using the provided Spotify credentials from the config object. The data is then transformed
-    and saved into a JSON file specified by the file paths in the config object. Finally,
-    the transformed data is loaded into the database using SQLAlchemy's conflict handling
-    mechanism.
+    using the provided Spotify credentials from the config object. Only tracks played after
+    the last ingested `played_at` (kept in the `etl_state` file, or read from the database
+    on the first run) are requested, and the run returns early when nothing new was played.
+    The response is transformed in memory, loaded into the database using SQLAlchemy's
+    conflict handling mechanism and the high-water mark is advanced.
+
+    The raw response is kept in the `recent_songs` file according to `[etl] raw_payload`:
+    "async" (default) writes it on a background thread so the write is not part of the
+    ingest latency, "sync" writes it before transforming and "off" skips it. Every
+    response is also appended, in the background, to the compressed archive at
+    `[file_paths] payload_archive` (see utils/archive.py and the `replay` command)
+    unless that is set to "off".
+
+    Every stage is timed with its item counts, bytes and inserted rows (see
+    utils/metrics.py). The run is logged as `metrics` JSON lines, written to the
+    Prometheus textfile at `[file_paths] etl_metrics_textfile` when set, and appended
+    to the history at `[file_paths] etl_metrics_history`, which keeps the last
+    `[etl] metrics_history_runs` runs (500) for the `etl_metrics` command.
 
     Args:
         config (Config): An instance of the Config class containing Spotify credentials,
                          file paths, database URI, and logging configurations.
+        engine (sqlalchemy.engine.Engine, optional): Engine to reuse; created from the
+                         config when omitted.
+        sp (spotipy.Spotify, optional): Spotify client to reuse; created from the config
+                         when omitted.
 
     Returns:
         None
@@ -162,6 +469,27 @@ def etl(config: Config) -> None:
         - The function uses SQLAlchemy to interact with the database. Ensure the provided
           database URI in the config object is valid and accessible.
     """
+    from sqlalchemy.exc import SQLAlchemyError
+
+    from database.backend import create_engine
+    from database.utils import get_latest_played_at, load_entities
+    from utils.entity_cache import KnownEntityCache
+    from utils.parsing import (
+        filter_known_entities,
+        parse_recent_items,
+        played_at_to_ms,
+        read_etl_state,
+        write_etl_state,
+        submit_background_write,
+        write_raw_payload,
+        write_raw_payload_async,
+    )
+    from utils.archive import PayloadArchive
+    from utils.metrics import RunMetrics
+    from utils.spotify import get_spotify_client
+
+    metrics = RunMetrics("etl")
+    status = "error"
     try:
         spotify_credentials = dict(config.config["spotify"])
         file_paths = dict(config.config["file_paths"])
@@ -172,43 +500,310 @@ def etl(config: Config) -> None:
         if not file_paths:
             raise ValueError("File paths not found in config.")
 
-        engine = create_engine(config.db_config["db_uri"])
+        raw_payload = config.config.get("etl", "raw_payload", fallback="async")
+        if raw_payload not in ("async", "sync", "off"):
+            raise ValueError(
+                f"Unknown [etl] raw_payload {raw_payload!r}, use async, sync or off"
+            )
 
-        sp = get_spotify_client(spotify_credentials)
-        recent_tracks = sp.current_user_recently_played()
-
-        if recent_tracks and "items" in recent_tracks:
-            with open(file_paths["recent_songs"], "w", encoding="utf-8") as fp:
-                json.dump(recent_tracks["items"], fp)
-
-            data_tuple = parse_recent_tracks(file_paths["recent_songs"])
-            if data_tuple is not None:
-                try:
-                    row_counts, error = insert_rows_with_conflict_handling(
-                        engine, data_tuple[0]
-                    )
-                    if error:
-                        config.file_logger.error(error)
-                    else:
-                        for model_name, count in row_counts.items():
-                            if count > 0:
-                                config.file_logger.info(
-                                    "%s: %s rows inserted", model_name, count
-                                )
-                except SQLAlchemyError as db_error:
-                    config.file_logger.critical("Database error: %s", db_error)
-                    raise
-            else:
-                config.file_logger.warning("No data to process")
+        engine = engine or create_engine(config.db_config["db_uri"])
+        state_file = file_paths.get("etl_state", "/tmp/spotify_history_etl_state.json")
+        with metrics.stage("read_state"):
+            etl_state = read_etl_state(state_file)
+            after = etl_state.get("last_played_at_ms")
+            if after is None:
+                latest_played_at = get_latest_played_at(engine)
+                after = played_at_to_ms(latest_played_at) if latest_played_at else None
+
+        sp = sp or get_spotify_client(spotify_credentials)
+        with metrics.stage("spotify_fetch") as stage:
+            recent_tracks = sp.current_user_recently_played(limit=50, after=after)
+            items = recent_tracks["items"] if recent_tracks else []
+            while recent_tracks and recent_tracks.get("next"):
+                recent_tracks = sp.next(recent_tracks)
+                items.extend(recent_tracks["items"] if recent_tracks else [])
+            stage.items = len(items)
+
+        if not items:
+            config.file_logger.info("No new tracks played since %s", after)
+            status = "no_new_tracks"
+            return
+
+        def log_failed_write(future) -> None:
+            if future.exception() is not None:
+                config.file_logger.error(
+                    "Writing the raw payload failed: %s", future.exception()
+                )
+
+        if raw_payload == "sync":
+            with metrics.stage("write_json") as stage:
+                stage.bytes = write_raw_payload(file_paths["recent_songs"], items)
+                stage.items = len(items)
+        elif raw_payload == "async":
+            write_raw_payload_async(file_paths["recent_songs"], items).add_done_callback(
+                log_failed_write
+            )
+        archive = PayloadArchive.from_config(config)
+        if archive is not None:
+            submit_background_write(archive.append, items).add_done_callback(
+                log_failed_write
+            )
+
+        with metrics.stage("parse") as stage:
+            data_tuple = parse_recent_items(items)
+            stage.items = len(data_tuple[0][-1]) if data_tuple[0] is not None else 0
+        if data_tuple[0] is not None:
+            with metrics.stage("filter_known") as stage:
+                known_entities = KnownEntityCache.from_config(config)
+                known_entities.warm(engine)
+                new_entities = filter_known_entities(data_tuple[0], known_entities.ids)
+                stage.items = sum(len(data_list) for data_list in new_entities)
+            try:
+                row_counts, error = load_entities(
+                    engine,
+                    new_entities,
+                    config.config.get("etl", "load_engine", fallback="insert"),
+                    metrics,
+                )
+                if error:
+                    known_entities.clear()
+                    config.file_logger.error(error)
+                else:
+                    with metrics.stage("save_state"):
+                        known_entities.add_entities(new_entities)
+                        known_entities.save()
+                        etl_state["last_played_at_ms"] = max(
+                            played_at_to_ms(item["played_at"]) for item in items
+                        )
+                        write_etl_state(state_file, etl_state)
+                    status = "ok"
+                    for model_name, count in row_counts.items():
+                        if count > 0:
+                            config.file_logger.info(
+                                "%s: %s rows inserted", model_name, count
+                            )
+            except SQLAlchemyError as db_error:
+                config.file_logger.critical("Database error: %s", db_error)
+                raise
         else:
-            config.file_logger.warning("No recent tracks found")
+            # items is not empty here, so a missing entity list means a malformed
+            # payload; the high-water mark stays put and the next run fetches it again.
+            config.file_logger.error(
+                "Parsing the recently played items failed, missing key %s",
+                data_tuple[1],
+            )
+            status = "error"
 
     except Exception as e:
         config.file_logger.critical("ETL process failed with error: %s", e)
         raise
 
+    finally:
+        metrics.finish(status)
+        metrics.publish(
+            config.file_logger,
+            config.config.get("file_paths", "etl_metrics_textfile", fallback=None),
+            config.config.get(
+                "file_paths",
+                "etl_metrics_history",
+                fallback="/tmp/spotify_history_etl_metrics.jsonl",
+            ),
+            config.config.getint("etl", "metrics_history_runs", fallback=500),
+        )
+
+
+def etl_metrics(config: Config) -> None:
+    """
+    Print how each ETL stage's recent runs compare with earlier ones.
 
-def random_song_playlist(config: Config) -> None:
+    Reads the run history written by `etl` (`[file_paths] etl_metrics_history`) and
+    prints, per stage, the median seconds of the last `[etl] metrics_trend_runs` runs
+    (10), the median of all earlier runs, their ratio and the median rows inserted.
+
+    Args:
+        config (Config): An instance of the Config class.
+    """
+    from utils.metrics import read_history, stage_trends
+
+    runs = read_history(
+        config.config.get(
+            "file_paths",
+            "etl_metrics_history",
+            fallback="/tmp/spotify_history_etl_metrics.jsonl",
+        )
+    )
+    if not runs:
+        config.file_logger.warning("No ETL runs recorded yet")
+        return
+
+    trends = stage_trends(
+        runs, config.config.getint("etl", "metrics_trend_runs", fallback=10)
+    )
+    statuses = collections.Counter(run["status"] for run in runs)
+    print(f"{len(runs)} runs since {runs[0]['started_at']}: {dict(statuses)}")
+    print(
+        f"{'stage':<24} {'runs':>6} {'recent s':>10} {'earlier s':>10} "
+        f"{'ratio':>7} {'rows':>8}"
+    )
+    for name, trend in trends.items():
+        earlier = trend["earlier_p50_seconds"]
+        ratio = trend["ratio"]
+        earlier_text = f"{earlier:.3f}" if earlier is not None else "-"
+        ratio_text = f"{ratio:.2f}x" if ratio is not None else "-"
+        print(
+            f"{name:<24} {trend['runs']:>6} {trend['recent_p50_seconds']:>10.3f} "
+            f"{earlier_text:>10} {ratio_text:>7} {trend['recent_p50_rows']:>8g}"
+        )
+
+
+def export_history(config: Config) -> None:
+    """
+    Write the listening history to a columnar snapshot for offline analytics.
+
+    The streams joined with their songs, albums and artists are written to
+    `[export] directory` as dictionary encoded column files that numpy can memory map
+    (see utils.export). Rows are read in chunks of `[export] chunk_size`, and each run
+    only appends the streams played after the previous export; `[export] full = true`
+    rewrites the snapshot from scratch.
+
+    Args:
+        config (Config): An instance of the Config class containing the database URI,
+                         export settings, and logging configurations.
+
+    Returns:
+        None
+    """
+    from database.backend import create_engine
+    from utils.export import export_streams
+
+    try:
+        engine = create_engine(config.db_config["db_uri"])
+        directory = config.config.get(
+            "export", "directory", fallback="/tmp/spotify_history_export"
+        )
+        start = time.perf_counter()
+        appended = export_streams(
+            engine,
+            directory,
+            chunk_size=config.config.getint("export", "chunk_size", fallback=50_000),
+            full=config.config.getboolean("export", "full", fallback=False),
+            log=config.file_logger.info,
+        )
+        config.file_logger.info(
+            "Appended %s streams and %s song artists to %s in %.2fs",
+            appended["streams"],
+            appended["song_artists"],
+            directory,
+            time.perf_counter() - start,
+        )
+    except Exception as e:
+        config.file_logger.critical("History export failed with error: %s", e)
+        raise
+
+
+def import_history(config: Config) -> None:
+    """
+    Bulk import Spotify extended streaming history exports into the database.
+
+    The export files matched by the `history_exports` glob in the file_paths config
+    are parsed incrementally and loaded into the stream_history table (and the
+    streams table for songs that are already known) through PostgreSQL COPY, so
+    multi-GB exports never have to fit in memory.
+
+    Args:
+        config (Config): An instance of the Config class containing file paths,
+                         database URI, and logging configurations.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: If the history_exports path is missing or matches no files.
+        Exception: If an unexpected error occurs during the import.
+    """
+    from database.backend import create_engine
+    from database.utils import copy_stream_history
+    from utils.parsing import parse_history_export
+
+    try:
+        pattern = config.config.get("file_paths", "history_exports", fallback=None)
+        if not pattern:
+            raise ValueError("history_exports path not found in config.")
+
+        export_files = sorted(glob.glob(pattern))
+        if not export_files:
+            raise ValueError(f"No history export files match {pattern}")
+
+        engine = create_engine(config.db_config["db_uri"])
+        batch_size = config.config.getint("import", "batch_size", fallback=100_000)
+        min_ms_played = config.config.getint("import", "min_ms_played", fallback=30000)
+
+        config.file_logger.info("Importing %s history export files", len(export_files))
+        start = time.perf_counter()
+        row_counts = copy_stream_history(
+            engine,
+            itertools.chain.from_iterable(
+                parse_history_export(file_name, min_ms_played)
+                for file_name in export_files
+            ),
+            batch_size,
+        )
+        elapsed = time.perf_counter() - start
+
+        for model_name, count in row_counts.items():
+            config.file_logger.info("%s: %s rows", model_name, count)
+        config.file_logger.info(
+            "Imported %s rows in %.2fs (%.0f rows/sec)",
+            row_counts["rows_read"],
+            elapsed,
+            row_counts["rows_read"] / elapsed if elapsed else 0,
+        )
+
+    except Exception as e:
+        config.file_logger.critical("History import failed with error: %s", e)
+        raise
+
+
+def partition_streams(config: Config) -> None:
+    """
+    Convert music.streams into a table partitioned by month of played_at, online.
+
+    The rows are copied into a new partitioned table one month per transaction while
+    a trigger copies every new stream as well, so the ETL can keep running; the
+    tables then swap names in one short transaction (see
+    database.partitioning.migrate_streams). The old table is dropped once all of its
+    rows are found in the new one, unless `[partitioning] keep_unpartitioned` is true.
+
+    Args:
+        config (Config): An instance of the Config class containing the database URI
+                         and logging configurations.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: If the database is not PostgreSQL or streams is already partitioned.
+    """
+    from database.backend import create_engine
+    from database.partitioning import migrate_streams
+
+    try:
+        engine = create_engine(config.db_config["db_uri"])
+        result = migrate_streams(
+            engine,
+            config.config.getint("partitioning", "months_ahead", fallback=3),
+            config.config.getboolean(
+                "partitioning", "keep_unpartitioned", fallback=False
+            ),
+            log=config.file_logger.info,
+        )
+        config.file_logger.info("Partitioned music.streams: %s", result)
+    except Exception as e:
+        config.file_logger.critical("Partitioning streams failed with error: %s", e)
+        raise
+
+
+def random_song_playlist(config: Config, engine=None, sp=None) -> None:
     """
     Update a Spotify playlist with random songs.
 
@@ -219,6 +814,10 @@ def random_song_playlist(config: Config) -> None:
     Args:
         config (Config): An instance of the Config class containing database URI,
                          Spotify credentials, and logging configurations.
+        engine (sqlalchemy.engine.Engine, optional): Engine to reuse; created from the
+                         config when omitted.
+        sp (spotipy.Spotify, optional): Spotify client to reuse; created from the config
+                         when omitted.
 
     Returns:
         None
@@ -231,47 +830,505 @@ def random_song_playlist(config: Config) -> None:
           the Spotify Web API and the database.
         - The number of random song IDs to select is defined by the constant `NUM_SONG_IDS`.
           Adjust this value based on your preference.
+        - The songs are sampled by the database. `[random_playlist] mode` picks uniform
+          sampling ("uniform", the default), weighting by play count ("play_count") or
+          favouring songs not played recently ("not_recent", capped at
+          `recency_cap_days`).
+        - The playlist is synced with utils.playlist_sync, which only sends the changes
+          and caches the playlist snapshot in `[file_paths] playlist_snapshots`.
         - The function logs the status of each step, including successful updates and any errors.
     """
+    from database.backend import create_engine
+    from database.utils import get_random_songs
+    from utils.playlist_sync import SnapshotCache, sync_playlist
+    from utils.spotify import get_spotify_client
+
     NUM_SONG_IDS = 100
     try:
-        engine = create_engine(config.db_config["db_uri"])
+        engine = engine or create_engine(config.db_config["db_uri"])
         spotify_credentials = dict(config.config["spotify"])
-        sp = get_spotify_client(spotify_credentials)
+        sp = sp or get_spotify_client(spotify_credentials)
 
-        random_song_ids = get_random_songs(engine, NUM_SONG_IDS)
+        random_song_ids = get_random_songs(
+            engine,
+            NUM_SONG_IDS,
+            mode=config.config.get("random_playlist", "mode", fallback="uniform"),
+            recency_cap_days=config.config.getint(
+                "random_playlist", "recency_cap_days", fallback=365
+            ),
+        )
 
         config.file_logger.info(
-            "Updating details for Spotify playlist: %s",
+            "Refresing %s new tracks for playlist: %s",
+            NUM_SONG_IDS,
             spotify_credentials["random_playlist"],
         )
-        sp.playlist_change_details(
+        result = sync_playlist(
+            sp,
             spotify_credentials["random_playlist"],
+            random_song_ids["song_ids"],
             description=f"Here is {NUM_SONG_IDS} random songs. Last updated {random_song_ids['today']}",
+            cache=SnapshotCache.from_config(config),
         )
         config.file_logger.info(
-            "Refresing %s new tracks for playlist: %s",
-            NUM_SONG_IDS,
+            "Update successful for Spotify playlist: %s (%s)",
             spotify_credentials["random_playlist"],
+            result,
         )
-        sp.playlist_replace_items(
-            spotify_credentials["random_playlist"], random_song_ids["song_ids"]
+    except Exception as e:
+        config.file_logger.error(e)
+
+
+def rebuild_rollup_tables(config: Config) -> None:
+    """
+    Rebuild the daily rollup tables from the full streams history.
+
+    The rollups are kept current by a trigger on the streams table as the ETL loads
+    new rows; run this once after upgrading an existing database (after db_setup
+    installed the tables and trigger) or to repair the rollups.
+
+    Args:
+        config (Config): An instance of the Config class containing the database URI
+                         and logging configurations.
+
+    Returns:
+        None
+    """
+    from database.backend import create_engine
+    from database.utils import rebuild_rollups
+
+    try:
+        engine = create_engine(config.db_config["db_uri"])
+        for model_name, count in rebuild_rollups(engine).items():
+            config.file_logger.info("%s: %s rows rebuilt", model_name, count)
+    except Exception as e:
+        config.file_logger.critical("Rollup rebuild failed with error: %s", e)
+        raise
+
+
+def replay(config: Config) -> None:
+    """
+    Re-parse the archived recently played responses and load them into the database.
+
+    The segments of the payload archive with plays between `[replay] since` and
+    `[replay] until` (ISO dates or timestamps in UTC; both optional) are parsed in
+    `[replay] workers` processes (default: one per CPU) and bulk loaded, through COPY
+    on PostgreSQL. Rows the database already has are skipped, so after a schema
+    change or a parser fix run `db_setup` against an empty database and replay the
+    whole archive into it.
+
+    Args:
+        config (Config): An instance of the Config class containing file paths,
+                         database URI, and logging configurations.
+
+    Raises:
+        ValueError: If the payload archive is turned off.
+        Exception: If an unexpected error occurs during the replay.
+    """
+    from database.backend import create_engine
+    from utils.archive import PayloadArchive, replay as replay_archive
+
+    def parse_time(option: str):
+        value = config.config.get("replay", option, fallback=None)
+        return datetime.datetime.fromisoformat(value) if value else None
+
+    try:
+        archive = PayloadArchive.from_config(config)
+        if archive is None:
+            raise ValueError("The payload archive is turned off.")
+
+        engine = create_engine(config.db_config["db_uri"])
+        workers = config.config.getint("replay", "workers", fallback=0) or None
+        start = time.perf_counter()
+        row_counts = replay_archive(
+            engine,
+            archive,
+            parse_time("since"),
+            parse_time("until"),
+            workers,
+            log=config.file_logger.info,
         )
         config.file_logger.info(
-            "Update successful for Spotify playlist: %s",
-            spotify_credentials["random_playlist"],
+            "Replayed %s segments, %s rows parsed, in %.2fs: %s",
+            row_counts["segments"],
+            row_counts["rows_parsed"],
+            time.perf_counter() - start,
+            row_counts,
         )
+
     except Exception as e:
-        config.file_logger.error(e)
+        config.file_logger.critical("Replay failed with error: %s", e)
+        raise
 
 
-def summary(config: Config) -> None:
-    engine = create_engine(config.db_config["db_uri"])
-    summary_results = summary_queries(engine)
+def summary(config: Config, engine=None, sp=None) -> None:
+    """
+    Print a summary of the listening history.
+
+    The independent summary queries are sent concurrently over a connection pool
+    sized by `[summary] max_workers`, and the time spent in each query is logged so
+    the slowest one is easy to spot. Results come from the result cache until new
+    streams are loaded (see database.cache); a cache hit logs no query timings. When `[analytics] uri` is set the
+    queries run against that analytics copy instead (see sync_analytics).
+
+    Args:
+        config (Config): An instance of the Config class containing the database URI
+                         and logging configurations.
+        engine (sqlalchemy.engine.Engine, optional): Engine to reuse; created from the
+                         config when omitted.
+        sp (spotipy.Spotify, optional): Unused; accepted so all scheduled commands share
+                         one signature.
+
+    Returns:
+        None
+    """
+    from database.backend import create_engine
+    from database.utils import run_summary_queries
+    from utils.summary import summary_main
+
+    max_workers = config.config.getint("summary", "max_workers", fallback=4)
+    analytics_uri = config.config.get("analytics", "uri", fallback=None)
+    if analytics_uri:
+        from database.analytics import get_analytics_engine
+
+        engine = get_analytics_engine(analytics_uri)
+    engine = engine or create_engine(
+        config.db_config["db_uri"], pool_size=max_workers
+    )
+
+    timings = {}
+
+    def run_queries() -> dict:
+        results, query_timings = run_summary_queries(engine, max_workers)
+        timings.update(query_timings)
+        return results
+
+    # Keyed like database.utils.summary_queries, so both share cached results; only
+    # the timings of queries that actually ran are logged.
+    start = time.perf_counter()
+    hit, summary_results = get_result_cache().get_or_compute(
+        "summary_queries", engine, (max_workers,), {}, run_queries
+    )
+    if hit:
+        config.file_logger.info(
+            "Summary results served from the result cache in %.1f ms",
+            (time.perf_counter() - start) * 1000,
+        )
+    else:
+        config.file_logger.info(
+            "Summary queries took %.1f ms with %s workers",
+            (time.perf_counter() - start) * 1000,
+            max_workers,
+        )
+    for query_name, seconds in sorted(
+        timings.items(), key=lambda item: item[1], reverse=True
+    ):
+        config.file_logger.info("Summary query %s: %.1f ms", query_name, seconds * 1000)
+
+    cache_stats = get_result_cache().stats()
+    config.file_logger.info(
+        "Result cache (%s): %s hits, %s misses",
+        cache_stats["backend"],
+        cache_stats["hits"],
+        cache_stats["misses"],
+    )
+
     summary_main(summary_results)
 
 
-def yesterday_top_ten(config: Config) -> None:
+def sync_analytics(config: Config, engine=None, sp=None) -> None:
+    """
+    Refresh the analytics copy named by `[analytics] uri` from the primary database.
+
+    Only new or changed catalog rows and the days whose stream count changed are
+    copied, in chunks of `[analytics] chunk_size` rows (see database.analytics), so
+    the sync can run after every ETL.
+
+    Args:
+        config (Config): An instance of the Config class containing the database URI
+                         and logging configurations.
+        engine (sqlalchemy.engine.Engine, optional): Engine of the primary database to
+                         reuse; created from the config when omitted.
+        sp (spotipy.Spotify, optional): Unused; accepted so all scheduled commands share
+                         one signature.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: If `[analytics] uri` is not set.
+    """
+    from database.analytics import get_analytics_engine, sync_analytics as sync_copy
+    from database.backend import create_engine
+
+    analytics_uri = config.config.get("analytics", "uri", fallback=None)
+    if not analytics_uri:
+        raise ValueError("analytics uri not found in config.")
+    chunk_size = config.config.getint("analytics", "chunk_size", fallback=50_000)
+
+    engine = engine or create_engine(config.db_config["db_uri"])
+    start = time.perf_counter()
+    row_counts = sync_copy(engine, get_analytics_engine(analytics_uri), chunk_size)
+    config.file_logger.info(
+        "Analytics copy synced in %.2fs: %s", time.perf_counter() - start, row_counts
+    )
+
+
+def verify_indexes(config: Config) -> None:
+    """
+    Print how each date or song filtered query reads its tables and fail if any cannot use an index.
+
+    Args:
+        config (Config): An instance of the Config class containing the database URI
+                         and logging configurations.
+
+    Returns:
+        None
+
+    Raises:
+        SystemExit: With status 1 if a query still needs a sequential scan.
+    """
+    from database.backend import create_engine
+    from database.profiling import verify_index_usage
+
+    engine = create_engine(config.db_config["db_uri"])
+    report = verify_index_usage(engine)
+
+    print(f"{'Function':<28} {'Table':<20} {'Access':<18} Index")
+    for row in report:
+        print(
+            f"{row['function']:<28} {row['relation']:<20} {row['node_type']:<18} "
+            f"{row['index'] or '-'}{'' if row['ok'] else '  <-- no index used'}"
+        )
+
+    failures = [row for row in report if not row["ok"]]
+    if failures:
+        config.file_logger.error("%s table scans cannot use an index", len(failures))
+        raise SystemExit(1)
+
+
+def verify_partitions(config: Config) -> None:
+    """
+    Print how many partitions of music.streams each date filtered query reads and fail
+    if any reads partitions outside its date range.
+
+    Args:
+        config (Config): An instance of the Config class containing the database URI
+                         and logging configurations.
+
+    Returns:
+        None
+
+    Raises:
+        SystemExit: With status 1 if a query is not pruned to its date range.
+        ValueError: If music.streams is not partitioned.
+    """
+    from database.backend import create_engine
+    from database.partitioning import verify_partition_pruning
+
+    engine = create_engine(config.db_config["db_uri"])
+    report = verify_partition_pruning(engine)
+
+    print(f"{'Function':<28} {'Scanned':>7} {'Expected':>8} {'Total':>5}  Range")
+    for row in report:
+        lower, upper = row["range"]
+        print(
+            f"{row['function']:<28} {row['scanned']:>7} {row['expected']:>8} "
+            f"{row['total']:>5}  "
+            f"{f'{lower:%Y-%m-%d} - {upper:%Y-%m-%d}' if lower else 'rollups only'}"
+            f"{'' if row['ok'] else '  <-- not pruned'}"
+        )
+
+    failures = [row for row in report if not row["ok"]]
+    if failures:
+        config.file_logger.error(
+            "%s queries read partitions outside their date range", len(failures)
+        )
+        raise SystemExit(1)
+
+
+def watch_current_song(config: Config, engine=None, sp=None) -> None:
+    """
+    Poll the currently playing song and print one JSON line each time the track changes.
+
+    Stream counts come from an in-memory PlayCountIndex seeded once from the database,
+    so an update needs neither a database query nor a file write. The index fetches
+    the streams added since its last refresh whenever the ETL state file changes,
+    and at least every `[watch] refresh_interval` seconds (default 300) to pick up
+    streams loaded by import_history, backfill_songs or replay. The
+    poll interval adapts to the playing track (see next_poll_interval) and is bounded
+    by `[watch] min_interval`, `max_interval` and `idle_interval`. SIGINT and SIGTERM
+    stop the watcher.
+
+    Args:
+        config (Config): An instance of the Config class containing database URI,
+                         Spotify credentials, file paths, and logging configurations.
+        engine (sqlalchemy.engine.Engine, optional): Engine to reuse; created from the
+                         config when omitted.
+        sp (spotipy.Spotify, optional): Spotify client to reuse; created from the config
+                         when omitted.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: If the Spotify client cannot be created.
+    """
+    from database.backend import create_engine
+    from utils.now_playing import FileWatcher, PlayCountIndex, next_poll_interval
+    from utils.parsing import parse_current_song
+    from utils.spotify import get_spotify_client, is_spotify_instance
+
+    min_interval = config.config.getfloat("watch", "min_interval", fallback=1.0)
+    max_interval = config.config.getfloat("watch", "max_interval", fallback=10.0)
+    idle_interval = config.config.getfloat("watch", "idle_interval", fallback=60.0)
+    refresh_interval = config.config.getfloat(
+        "watch", "refresh_interval", fallback=300.0
+    )
+
+    engine = engine or create_engine(config.db_config["db_uri"])
+    sp = sp or get_spotify_client(dict(config.config["spotify"]))
+    if not is_spotify_instance(sp):
+        raise ValueError(f"Error occured while creating Spotify client: {sp}")
+
+    play_counts = PlayCountIndex(engine)
+    config.file_logger.info("Play count index seeded with %s songs", play_counts.seed())
+    etl_state = FileWatcher(
+        config.config.get(
+            "file_paths", "etl_state", fallback="/tmp/spotify_history_etl_state.json"
+        )
+    )
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *args: stop_event.set())
+
+    last_song_id = None
+    interval = min_interval
+    refreshed_at = time.monotonic()
+    while not stop_event.is_set():
+        try:
+            song_data = sp.currently_playing()
+        except Exception as e:
+            config.file_logger.error("currently_playing failed: %s", e)
+            song_data = None
+
+        if etl_state.changed() or time.monotonic() - refreshed_at >= refresh_interval:
+            refreshed_at = time.monotonic()
+            config.file_logger.info(
+                "Play count index refreshed with %s new streams", play_counts.refresh()
+            )
+
+        song_id = ((song_data or {}).get("item") or {}).get("id")
+        if song_id and song_id != last_song_id:
+            current, error = parse_current_song(song_data)
+            if error:
+                config.file_logger.error(error)
+            else:
+                print(
+                    json.dumps(
+                        {
+                            "StreamCount": play_counts.get(song_id),
+                            "CurrentSong": current.as_dict(),
+                        }
+                    ),
+                    flush=True,
+                )
+        last_song_id = song_id
+
+        interval = next_poll_interval(
+            song_data, interval, min_interval, max_interval, idle_interval
+        )
+        stop_event.wait(interval)
+
+
+def wordclouds(config: Config) -> None:
+    """
+    Render the top artists and top songs word clouds from the streams in the database.
+
+    The frequencies come from get_top_songs_and_artists (limited to `[wordcloud]
+    max_words` each) and both clouds are rendered at the same time in separate worker
+    processes on the Agg backend. Images are cached by a hash of the frequencies,
+    mask, font and size, so a cloud whose inputs have not changed is not rendered
+    again. The mask size is bounded by `max_size` pixels and multi panel figures are
+    saved at `dpi`. The output path, render time and peak RSS of each cloud are
+    logged; `trace_memory` also reports the peak traced by tracemalloc, which slows
+    the render down.
+
+    Args:
+        config (Config): An instance of the Config class containing the database URI,
+                         word cloud settings, and logging configurations.
+
+    Returns:
+        None
+    """
+    from database.backend import create_engine
+    from database.utils import get_top_songs_and_artists
+    from utils.word_cloud import render_word_clouds
+
+    section = "wordcloud"
+    max_words = config.config.getint(section, "max_words", fallback=200)
+    engine = create_engine(config.db_config["db_uri"])
+    top_lists = get_top_songs_and_artists(engine)
+
+    jobs = []
+    for name, list_key, mask_key in (
+        ("top_artists", "top_artist_list", "artist_mask"),
+        ("top_songs", "top_song_list", "song_mask"),
+    ):
+        frequencies = {}
+        for word, count in top_lists[list_key]:
+            if word:
+                frequencies[word] = frequencies.get(word, 0) + count
+        if not frequencies:
+            config.file_logger.warning("No streams to build the %s word cloud", name)
+            continue
+        jobs.append(
+            {
+                "name": name,
+                "frequencies": dict(
+                    sorted(frequencies.items(), key=lambda item: item[1], reverse=True)[
+                        :max_words
+                    ]
+                ),
+                "output_dir": config.config.get(
+                    section, "output_dir", fallback="/tmp/spotify_history_wordclouds"
+                ),
+                "font_path": config.config.get(section, "font_path", fallback=None),
+                "mask_image": config.config.get(section, mask_key, fallback=None),
+                "multi_flag": config.config.getboolean(section, "multi", fallback=False),
+                "dpi": config.config.getint(section, "dpi", fallback=300),
+                "max_size": config.config.getint(section, "max_size", fallback=2000),
+                "trace_memory": config.config.getboolean(
+                    section, "trace_memory", fallback=False
+                ),
+            }
+        )
+
+    for result in render_word_clouds(
+        jobs, config.config.getint(section, "max_workers", fallback=2)
+    ):
+        if result["cached"]:
+            config.file_logger.info(
+                "Word cloud %s unchanged: %s", result["name"], result["path"]
+            )
+        else:
+            config.file_logger.info(
+                "Word cloud %s rendered in %.2fs, peak RSS %.1f MiB%s: %s",
+                result["name"],
+                result["seconds"],
+                result["max_rss_kb"] / 1024,
+                (
+                    f", peak traced {result['peak_traced_bytes'] / 2**20:.1f} MiB"
+                    if result["peak_traced_bytes"] is not None
+                    else ""
+                ),
+                result["path"],
+            )
+        print(result["path"])
+
+
+def yesterday_top_ten(config: Config, engine=None, sp=None) -> None:
     """
     Update a Spotify playlist with top tracks from yesterday.
 
@@ -282,6 +1339,10 @@ def yesterday_top_ten(config: Config) -> None:
 
     Args:
         config (Config): A configuration object containing database and Spotify settings.
+        engine (sqlalchemy.engine.Engine, optional): Engine to reuse; created from the
+                         config when omitted.
+        sp (spotipy.Spotify, optional): Spotify client to reuse; created from the config
+                         when omitted.
 
     Raises:
         This function does not explicitly raise any exceptions. However, it can catch
@@ -290,34 +1351,38 @@ def yesterday_top_ten(config: Config) -> None:
     Returns:
         None: This function doesn't return any value. It performs the task of updating
         the specified Spotify playlist with top tracks from yesterday's data.
+
+    Note:
+        Only the changed tracks and description are sent (see utils.playlist_sync).
     """
+    from database.backend import create_engine
+    from database.utils import get_yesterday_top_ten
+    from utils.playlist_sync import SnapshotCache, sync_playlist
+    from utils.spotify import get_spotify_client
+
     try:
-        engine = create_engine(config.db_config["db_uri"])
+        engine = engine or create_engine(config.db_config["db_uri"])
         spotify_metadata = dict(config.config["spotify"])
-        sp = get_spotify_client(spotify_metadata)
+        sp = sp or get_spotify_client(spotify_metadata)
 
         yesterday_top_ten = get_yesterday_top_ten(engine)
 
         config.file_logger.info(
-            "Updating details for Spotify playlist: %s",
+            "Refresing top tracks from yesterday for playlist: %s",
             spotify_metadata["yesterday_top_10_id"],
         )
-        sp.playlist_change_details(
+        result = sync_playlist(
+            sp,
             spotify_metadata["yesterday_top_10_id"],
+            yesterday_top_ten["song_ids"],
             description=yesterday_top_ten["desc"],
+            cache=SnapshotCache.from_config(config),
         )
 
         config.file_logger.info(
-            "Refresing top tracks from yesterday for playlist: %s",
-            spotify_metadata["yesterday_top_10_id"],
-        )
-        sp.playlist_replace_items(
-            spotify_metadata["yesterday_top_10_id"], yesterday_top_ten["song_ids"]
-        )
-
-        config.file_logger.info(
-            "Update successful for Spotify playlist: %s",
+            "Update successful for Spotify playlist: %s (%s)",
             spotify_metadata["yesterday_top_10_id"],
+            result,
         )
     except Exception as e:
         config.file_logger.error(e)
@@ -363,49 +1428,116 @@ def main() -> None:
     )
     parser.add_argument(
         "--function",
-        choices=[
-            "create_new_spotify_playlist",
-            "current_song",
-            "daily_playlist",
-            "db_setup",
-            "etl",
-            "random_playlist",
-            "summary",
-            "yesterday",
-        ],
+        choices=sorted(COMMAND_MODULES),
         required=True,
         help="Specify the function to call. Choose from the following options:\n"
+        "- backfill_songs: Request metadata for songs only known from history exports.\n"
         "- create_new_spotify_playlist: Create a new Spotify playlist.\n"
+        "- create_partitions: Create the upcoming monthly partitions of streams.\n"
         "- current_song: Retrieve information about the currently playing song.\n"
+        "- daemon: Run the scheduled commands from one long-lived process.\n"
         "- daily_playlist: Generate a daily playlist based on specific criteria.\n"
         "- db_setup: Set up the database for the application.\n"
         "- etl: Perform ETL (Extract, Transform, Load) operations.\n"
+        "- etl_metrics: Compare recent ETL stage timings with earlier runs.\n"
+        "- export_history: Write the listening history to columnar files.\n"
+        "- import_history: Bulk import Spotify extended streaming history exports.\n"
+        "- partition_streams: Convert streams to monthly partitions, online.\n"
         "- random_playlist: Generate a random playlist.\n"
+        "- rebuild_rollups: Rebuild the daily rollup tables from all streams.\n"
+        "- replay: Reload a time range of the archived Spotify responses.\n"
         "- summary: Display a summary of relevant data.\n"
+        "- sync_analytics: Refresh the analytics copy used by summary.\n"
+        "- verify_indexes: Check that the date filtered queries use indexes.\n"
+        "- verify_partitions: Check that the date filtered queries prune partitions.\n"
+        "- watch_current_song: Print the current song each time the track changes.\n"
+        "- wordclouds: Render the top artists and top songs word clouds.\n"
         "- yesterday: Perform actions related to the previous day's data.",
     )
 
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record every SQL statement with its duration and calling function, "
+        "EXPLAIN the slow ones and write a report to [profiling] report_dir. Also "
+        "enabled by [profiling] enabled.",
+    )
+
     args = parser.parse_args()
+    load_command(args.function)
+    configure_result_cache(config)
 
-    match args.function:
-        case "create_new_spotify_playlist":
-            create_new_spotify_playlist(config)
-        case "current_song":
-            current_song(config)
-        case "db_setup":
-            db_setup(config)
-        case "etl":
-            etl(config)
-        case "random_playlist":
-            random_song_playlist(config)
-        case "summary":
-            summary(config)
-        case "yesterday":
-            yesterday_top_ten(config)
-        case _:
-            print(
-                "Invalid function name. Use 'etl' for the ETL process or 'current_song' for the current song function."
-            )
+    profiler = None
+    if args.profile or config.config.getboolean("profiling", "enabled", fallback=False):
+        from database.profiling import QueryProfiler
+
+        profiler = QueryProfiler.from_config(config).start()
+
+    try:
+        match args.function:
+            case "backfill_songs":
+                backfill_songs(config)
+            case "create_new_spotify_playlist":
+                create_new_spotify_playlist(config)
+            case "create_partitions":
+                create_partitions(config)
+            case "current_song":
+                current_song(config)
+            case "daemon":
+                daemon(config)
+            case "db_setup":
+                db_setup(config)
+            case "etl":
+                etl(config)
+            case "etl_metrics":
+                etl_metrics(config)
+            case "export_history":
+                export_history(config)
+            case "import_history":
+                import_history(config)
+            case "partition_streams":
+                partition_streams(config)
+            case "random_playlist":
+                random_song_playlist(config)
+            case "rebuild_rollups":
+                rebuild_rollup_tables(config)
+            case "replay":
+                replay(config)
+            case "summary":
+                summary(config)
+            case "sync_analytics":
+                sync_analytics(config)
+            case "verify_indexes":
+                verify_indexes(config)
+            case "verify_partitions":
+                verify_partitions(config)
+            case "watch_current_song":
+                watch_current_song(config)
+            case "wordclouds":
+                wordclouds(config)
+            case "yesterday":
+                yesterday_top_ten(config)
+            case _:
+                print(
+                    "Invalid function name. Use 'etl' for the ETL process or 'current_song' for the current song function."
+                )
+
+    finally:
+        if profiler is not None:
+            # A failing report must not replace the command's own exception.
+            try:
+                profiler.stop()
+                report_path = profiler.write_report(
+                    config.config.get(
+                        "profiling",
+                        "report_dir",
+                        fallback="/tmp/spotify_history_profiles",
+                    ),
+                    args.function,
+                )
+                config.file_logger.info("SQL profile written to %s", report_path)
+            except Exception as e:
+                config.file_logger.error("Writing the SQL profile failed: %s", e)
 
 
 if __name__ == "__main__":
@@ -25,10 +25,18 @@ run_python_script() {
     deactivate_venv
 }
 
+daemon() {
+    run_python_script "daemon"
+}
+
 current_song() {
     run_python_script "current_song"
 }
 
+watch_current_song() {
+    run_python_script "watch_current_song"
+}
+
 run_etl() {
     run_python_script "etl"
 }
@@ -51,9 +59,15 @@ if [ -z "$1" ]; then
 fi
 
 case "$1" in
+"daemon")
+    daemon
+    ;;
 "current_song")
     current_song
     ;;
+"watch_current_song")
+    watch_current_song
+    ;;
 "etl")
     run_etl
     ;;
@@ -0,0 +1,406 @@
+"""
+Append-only archive of the raw recently played responses, and replay from it.
+
+Every response the ETL fetches is appended to the archive as one JSON line
+({"fetched_at", "items"}), compressed as its own zstd frame (with the optional
+zstandard package) or gzip member. Concatenated frames and members are valid
+streams, so a segment only ever grows by appending, and a torn write at the end of
+a segment is skipped on read. Complete records past the indexed length (the append
+crashed before updating the index) are indexed by the next append, which only
+truncates a tail that does not decode. Segments roll over at `segment_bytes`:
+
+    archive/
+        recent-20240101T000000-00000.jsonl.zst  one segment, sealed once full
+        recent-20240301T120000-00001.jsonl.gz
+        index.json                              per segment: codec, records, items,
+                                                bytes and first/last played_at
+
+The index lets replay pick only the segments overlapping a time range. Replay
+parses those segments in worker processes, straight to row tuples, and bulk loads
+the merged, de-duplicated rows, so the music schema can be rebuilt after a schema
+change or a parser fix.
+"""
+import datetime
+import fcntl
+import gzip
+import json
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from database.models import SongStreamed
+from utils.parsing import ENTITY_CLASSES, play_row, track_entity_rows
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is used instead
+    zstandard = None
+
+ENTITY_MODELS = list(ENTITY_CLASSES.values())
+EXTENSIONS = {"zstd": ".jsonl.zst", "gzip": ".jsonl.gz"}
+INDEX_FILE = "index.json"
+LOAD_CHUNK_SIZE = 50_000
+
+
+def default_codec() -> str:
+    return "zstd" if zstandard is not None else "gzip"
+
+
+def compress(data: bytes, codec: str, level: Optional[int] = None) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("The zstd codec needs the zstandard package")
+        return zstandard.ZstdCompressor(level=level or 9).compress(data)
+    return gzip.compress(data, compresslevel=level or 6)
+
+
+def iter_frames(data: bytes, codec: str) -> Iterator[bytes]:
+    """
+    Decompress concatenated zstd frames or gzip members one at a time, stopping at a
+    truncated or corrupt tail.
+    """
+    for _, chunk in iter_sized_frames(data, codec):
+        yield chunk
+
+
+def iter_sized_frames(data: bytes, codec: str) -> Iterator[Tuple[int, bytes]]:
+    """Like iter_frames, but yield each frame's compressed size with its content."""
+    if codec == "zstd" and zstandard is None:
+        raise RuntimeError("Reading zstd segments needs the zstandard package")
+    errors = (zlib.error, EOFError) + ((zstandard.ZstdError,) if zstandard else ())
+    while data:
+        if codec == "zstd":
+            decompressor = zstandard.ZstdDecompressor().decompressobj()
+        else:
+            decompressor = zlib.decompressobj(wbits=31)  # gzip framing
+        try:
+            chunk = decompressor.decompress(data)
+        except errors:
+            return
+        if not decompressor.eof:
+            return
+        yield len(data) - len(decompressor.unused_data), chunk
+        data = decompressor.unused_data
+
+
+def normalize_played_at(played_at: str) -> str:
+    """Return a played_at timestamp as naive UTC ISO text, which sorts by time."""
+    value = datetime.datetime.fromisoformat(played_at.replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value.isoformat(timespec="microseconds")
+
+
+def add_record(segment: dict, size: int, played_at: List[str]) -> None:
+    """Count a record of `size` bytes with the given plays in a segment's entry."""
+    segment["records"] += 1
+    segment["items"] += len(played_at)
+    segment["bytes"] += size
+    if played_at:
+        segment["first_played_at"] = min(
+            filter(None, (segment["first_played_at"], min(played_at)))
+        )
+        segment["last_played_at"] = max(
+            filter(None, (segment["last_played_at"], max(played_at)))
+        )
+
+
+class PayloadArchive:
+    """
+    Segmented, compressed, append-only store of recently played responses.
+
+    Appends from several processes are serialized with a lock file.
+
+    Args:
+        directory (str): Directory holding the segments and the index.
+        codec (Optional[str], optional): "zstd" or "gzip"; defaults to zstd when the
+                                         zstandard package is installed.
+        segment_bytes (int, optional): Size at which a new segment is started.
+        level (Optional[int], optional): Compression level.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        codec: Optional[str] = None,
+        segment_bytes: int = 64 << 20,
+        level: Optional[int] = None,
+    ):
+        self.directory = directory
+        self.codec = codec or default_codec()
+        if self.codec not in EXTENSIONS:
+            raise ValueError(f"Unknown archive codec {self.codec!r}, use zstd or gzip")
+        self.segment_bytes = segment_bytes
+        self.level = level
+
+    @classmethod
+    def from_config(cls, config) -> Optional["PayloadArchive"]:
+        """
+        Build the archive from `[file_paths] payload_archive` and the `[archive]`
+        section (`codec`, `segment_mb`, `level`); None when the archive is set to "off".
+        """
+        directory = config.config.get(
+            "file_paths", "payload_archive", fallback="/tmp/spotify_history_archive"
+        )
+        if directory == "off":
+            return None
+        codec = config.config.get("archive", "codec", fallback="auto")
+        level = config.config.get("archive", "level", fallback=None)
+        return cls(
+            directory,
+            None if codec == "auto" else codec,
+            int(config.config.getfloat("archive", "segment_mb", fallback=64) * 2**20),
+            int(level) if level else None,
+        )
+
+    def read_index(self) -> List[dict]:
+        path = os.path.join(self.directory, INDEX_FILE)
+        try:
+            with open(path, "r", encoding="utf-8") as fp:
+                return json.load(fp)["segments"]
+        except FileNotFoundError:
+            return []
+
+    def _write_index(self, segments: List[dict]) -> None:
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as fp:
+            json.dump({"version": 1, "segments": segments}, fp, indent=1)
+        os.replace(f"{path}.tmp", path)
+
+    def append(
+        self, items: List[dict], fetched_at: Optional[datetime.datetime] = None
+    ) -> dict:
+        """
+        Append one response's play history items.
+
+        Returns:
+            dict: The index entry of the segment written to.
+        """
+        fetched_at = fetched_at or datetime.datetime.now(datetime.timezone.utc)
+        line = json.dumps(
+            {"fetched_at": fetched_at.isoformat(), "items": items},
+            separators=(",", ":"),
+        )
+        frame = compress(line.encode("utf-8") + b"\n", self.codec, self.level)
+        played_at = [normalize_played_at(item["played_at"]) for item in items]
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            segments = self.read_index()
+            segment = segments[-1] if segments else None
+            if segment is not None:
+                self._recover_tail(segment)
+            if (
+                segment is None
+                or segment["codec"] != self.codec
+                or segment["bytes"] + len(frame) > self.segment_bytes
+            ):
+                stamp = fetched_at.strftime("%Y%m%dT%H%M%S")
+                name = f"recent-{stamp}-{len(segments):05d}"
+                segment = {
+                    "file": name + EXTENSIONS[self.codec],
+                    "codec": self.codec,
+                    "records": 0,
+                    "items": 0,
+                    "bytes": 0,
+                    "first_played_at": None,
+                    "last_played_at": None,
+                }
+                segments.append(segment)
+
+            path = os.path.join(self.directory, segment["file"])
+            with open(path, "ab") as fp:
+                fp.write(frame)
+                fp.flush()
+                os.fsync(fp.fileno())
+
+            add_record(segment, len(frame), played_at)
+            self._write_index(segments)
+        return segment
+
+    def _recover_tail(self, segment: dict) -> None:
+        """
+        Index the complete records written past the segment's indexed length by an
+        append that crashed before updating the index, and truncate what is left:
+        a torn frame that does not decode.
+        """
+        path = os.path.join(self.directory, segment["file"])
+        try:
+            with open(path, "rb") as fp:
+                fp.seek(segment["bytes"])
+                tail = fp.read()
+        except FileNotFoundError:
+            return
+        if not tail:
+            return
+        for size, chunk in iter_sized_frames(tail, segment["codec"]):
+            played_at = [
+                normalize_played_at(item["played_at"])
+                for line in chunk.splitlines()
+                if line
+                for item in json.loads(line)["items"]
+            ]
+            add_record(segment, size, played_at)
+        with open(path, "ab") as fp:
+            fp.truncate(segment["bytes"])
+
+    def segments_between(
+        self,
+        since: Optional[datetime.datetime] = None,
+        until: Optional[datetime.datetime] = None,
+    ) -> List[dict]:
+        """Index entries of the segments with plays in [since, until)."""
+        since_text = since.isoformat(timespec="microseconds") if since else None
+        until_text = until.isoformat(timespec="microseconds") if until else None
+        return [
+            segment
+            for segment in self.read_index()
+            if segment["items"]
+            and (since_text is None or segment["last_played_at"] >= since_text)
+            and (until_text is None or segment["first_played_at"] < until_text)
+        ]
+
+
+def read_segment(path: str, codec: str) -> Iterator[dict]:
+    """Yield the records of a segment file."""
+    with open(path, "rb") as fp:
+        data = fp.read()
+    for chunk in iter_frames(data, codec):
+        for line in chunk.splitlines():
+            if line:
+                yield json.loads(line)
+
+
+def parse_segment(
+    path: str,
+    codec: str,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+) -> Dict[str, List[tuple]]:
+    """
+    Parse the plays of one segment in [since, until) into de-duplicated row tuples.
+
+    Runs in a worker process, so it takes and returns only picklable values, and maps
+    the items with utils.parsing's track_entity_rows and play_row without building
+    entity objects.
+
+    Returns:
+        Dict[str, List[tuple]]: Row tuples in table column order per model name.
+    """
+    rows: Dict[str, dict] = {kind: {} for kind in ENTITY_CLASSES}
+    shapes = {
+        kind: (
+            [column.name for column in model.__table__.columns],
+            [column.name for column in model.__table__.primary_key.columns],
+        )
+        for kind, model in ENTITY_CLASSES.items()
+    }
+
+    def add(kind: str, row: dict) -> None:
+        columns, keys = shapes[kind]
+        key = tuple(row[column] for column in keys)
+        if key not in rows[kind]:
+            rows[kind][key] = tuple(row[column] for column in columns)
+
+    for record in read_segment(path, codec):
+        for item in record["items"]:
+            try:
+                played_at = normalize_played_at(item["played_at"])
+                if (since is not None and played_at < since) or (
+                    until is not None and played_at >= until
+                ):
+                    continue
+                for kind, row in track_entity_rows(item["track"]):
+                    add(kind, row)
+                add("streams", dict(play_row(item), played_at=played_at))
+            except KeyError as e:
+                raise ValueError(f"{path}: missing key {e}") from e
+    return {
+        ENTITY_CLASSES[kind].__name__: list(by_key.values())
+        for kind, by_key in rows.items()
+    }
+
+
+def replay(
+    engine,
+    archive: PayloadArchive,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    workers: Optional[int] = None,
+    log=print,
+) -> Dict[str, int]:
+    """
+    Re-parse the archived responses with plays in [since, until) and load them.
+
+    Segments are parsed in a pool of `workers` processes; the parent merges their
+    rows, drops duplicates across segments and bulk loads them with load_rows
+    (COPY on PostgreSQL), catalog tables first. Rows already in the database are
+    skipped, so a replay into a populated database only adds what is missing.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The database to load into.
+        archive (PayloadArchive): The archive to read.
+        since (Optional[datetime.datetime], optional): First played_at (UTC) to replay.
+        until (Optional[datetime.datetime], optional): played_at (UTC) to stop before.
+        workers (Optional[int], optional): Worker processes; defaults to the CPU count.
+        log (Callable, optional): Receives progress messages.
+
+    Returns:
+        Dict[str, int]: Rows inserted per model name, plus "segments" and
+                        "rows_parsed".
+    """
+    from database.utils import load_rows
+
+    segments = archive.segments_between(since, until)
+    since_text = since.isoformat(timespec="microseconds") if since else None
+    until_text = until.isoformat(timespec="microseconds") if until else None
+    merged: Dict[str, dict] = {model.__name__: {} for model in ENTITY_MODELS}
+    key_positions = {
+        model.__name__: [
+            index
+            for index, column in enumerate(model.__table__.columns)
+            if column.primary_key
+        ]
+        for model in ENTITY_MODELS
+    }
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                parse_segment,
+                os.path.join(archive.directory, segment["file"]),
+                segment["codec"],
+                since_text,
+                until_text,
+            ): segment["file"]
+            for segment in segments
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            for name, rows in future.result().items():
+                positions = key_positions[name]
+                by_key = merged[name]
+                for row in rows:
+                    key = tuple(row[position] for position in positions)
+                    if key not in by_key:
+                        by_key[key] = row
+            log(f"Parsed {futures[future]} ({done}/{len(segments)})")
+
+    row_counts = {
+        "segments": len(segments),
+        "rows_parsed": sum(len(rows) for rows in merged.values()),
+    }
+    for model in ENTITY_MODELS:
+        rows = list(merged.pop(model.__name__).values())
+        if model is SongStreamed:
+            played_at = [column.name for column in model.__table__.columns].index(
+                "played_at"
+            )
+            rows.sort(key=lambda row: row[played_at])
+        row_counts[model.__name__] = sum(
+            load_rows(engine, model, rows[start : start + LOAD_CHUNK_SIZE])
+            for start in range(0, len(rows), LOAD_CHUNK_SIZE)
+        )
+        log(f"{model.__name__}: {row_counts[model.__name__]}/{len(rows)} rows inserted")
+    return row_counts
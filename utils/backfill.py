@@ -0,0 +1,151 @@
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+import spotipy
+
+from database.utils import load_entities
+from utils.parsing import chunk_list, parse_tracks
+from utils.spotify import RateLimiter
+
+TRACKS_PER_REQUEST = 50
+
+
+def load_skipped_ids(file_name: Optional[str]) -> set:
+    """
+    Load the song IDs Spotify previously returned no metadata for.
+
+    Args:
+        file_name (Optional[str]): Path to the JSON skip list, or None.
+
+    Returns:
+        set: The skipped song IDs; empty if the file does not exist.
+    """
+    if not file_name or not os.path.exists(file_name):
+        return set()
+    with open(file_name, "r", encoding="utf-8") as fp:
+        return set(json.load(fp))
+
+
+def save_skipped_ids(file_name: Optional[str], song_ids: set) -> None:
+    if not file_name:
+        return
+    with open(file_name, "w", encoding="utf-8") as fp:
+        json.dump(sorted(song_ids), fp)
+
+
+def fetch_tracks(
+    sp: spotipy.Spotify, song_ids: List[str], rate_limiter: RateLimiter
+) -> List[Optional[dict]]:
+    """
+    Request the metadata of up to 50 tracks in a single Spotify API call.
+
+    Args:
+        sp (spotipy.Spotify): An authenticated Spotify client.
+        song_ids (List[str]): At most 50 track IDs.
+        rate_limiter (RateLimiter): Limiter shared by all worker threads.
+
+    Returns:
+        List[Optional[dict]]: Track objects in request order; None for unavailable IDs.
+    """
+    rate_limiter.acquire()
+    return sp.tracks(song_ids)["tracks"]
+
+
+def backfill_song_metadata(
+    engine,
+    sp: spotipy.Spotify,
+    song_ids: List[str],
+    max_workers: int = 4,
+    calls_per_second: float = 5.0,
+    skip_file: Optional[str] = None,
+    load_engine: str = "insert",
+    log: Callable[..., None] = lambda *args: None,
+) -> Dict[str, int]:
+    """
+    Fetch metadata for unknown songs and load their artists, albums and songs.
+
+    The IDs are split into batches of 50 (the /tracks endpoint maximum) and fetched
+    by a bounded thread pool whose calls are spaced out by a shared RateLimiter; 429
+    responses are retried by spotipy using the Retry-After header. At most two
+    batches per worker are queued at a time, and each is loaded with `load_engine`
+    and committed as soon as it arrives. IDs Spotify has no metadata for are saved to
+    `skip_file` after every batch, so they are not requested again.
+
+    On an exception or Ctrl-C the queued requests are cancelled and only the ones
+    already running are waited for, so an interrupted run loses at most the batches
+    in flight. The next run resumes with the IDs that are still unknown.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
+        sp (spotipy.Spotify): An authenticated Spotify client (or a fake one for tests).
+        song_ids (List[str]): The song IDs to backfill.
+        max_workers (int, optional): Number of concurrent API requests.
+        calls_per_second (float, optional): Global API call rate across all workers.
+        skip_file (Optional[str], optional): Path of the JSON list of unavailable IDs.
+        load_engine (str, optional): "insert" or "copy", see load_entities.
+        log (Callable, optional): Logger method receiving printf-style arguments.
+
+    Returns:
+        Dict[str, int]: Rows inserted per model plus "batches", "failed_batches" and
+                        "unavailable" counts.
+    """
+    skipped = load_skipped_ids(skip_file)
+    batches = iter(
+        chunk_list(
+            [song_id for song_id in song_ids if song_id not in skipped],
+            TRACKS_PER_REQUEST,
+        )
+    )
+    rate_limiter = RateLimiter(calls_per_second, burst=max_workers)
+    totals = {"batches": 0, "failed_batches": 0, "unavailable": 0}
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = {}
+
+    def submit_next() -> None:
+        batch = next(batches, None)
+        if batch is not None:
+            futures[executor.submit(fetch_tracks, sp, batch, rate_limiter)] = batch
+
+    try:
+        for _ in range(2 * max_workers):
+            submit_next()
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = futures.pop(future)
+                submit_next()
+                try:
+                    tracks = future.result()
+                except Exception as e:
+                    totals["failed_batches"] += 1
+                    log("Track request failed for %s IDs: %s", len(batch), e)
+                    continue
+
+                unavailable = {
+                    song_id for song_id, track in zip(batch, tracks) if track is None
+                }
+                if unavailable:
+                    skipped |= unavailable
+                    totals["unavailable"] += len(unavailable)
+                    save_skipped_ids(skip_file, skipped)
+
+                row_counts, error = load_entities(
+                    engine,
+                    parse_tracks([track for track in tracks if track]),
+                    load_engine,
+                )
+                if error:
+                    totals["failed_batches"] += 1
+                    log("Insert failed for %s IDs: %s", len(batch), error)
+                    continue
+
+                totals["batches"] += 1
+                for model_name, count in row_counts.items():
+                    totals[model_name] = totals.get(model_name, 0) + count
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+    return totals
@@ -0,0 +1,146 @@
+import json
+import os
+from typing import Dict, Optional
+
+from database.utils import get_known_entity_ids
+
+KINDS = ("artists", "albums", "album_artists", "songs")
+
+
+class KnownEntityCache:
+    """
+    Persistent set of the artist, album, album artist and song IDs already stored in the database.
+
+    The IDs are held in memory as sets and persisted either to a local JSON file or to
+    Redis sets, so the ETL can drop rows the database already has before sending them.
+    A store that has never been written is warmed from the database on first use.
+
+    Args:
+        path (Optional[str]): JSON file used by the file backend.
+        redis_client (Optional[redis.Redis]): Client used by the Redis backend; takes
+                                              precedence over `path` when given.
+        key_prefix (str, optional): Prefix of the Redis keys.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        redis_client=None,
+        key_prefix: str = "spotify_history:known",
+    ):
+        self.path = path
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+        self.ids: Dict[str, set] = {kind: set() for kind in KINDS}
+        self._pending: Dict[str, set] = {kind: set() for kind in KINDS}
+        self.loaded = self._load()
+
+    @classmethod
+    def from_config(cls, config) -> "KnownEntityCache":
+        """
+        Build the cache from the `[cache]` section (`backend = file|redis`, `redis_url`)
+        and the `known_entities` entry of the `[file_paths]` section.
+        """
+        backend = config.config.get("cache", "backend", fallback="file")
+        if backend == "redis":
+            import redis
+
+            return cls(
+                redis_client=redis.Redis.from_url(
+                    config.config.get(
+                        "cache", "redis_url", fallback="redis://localhost:6379/0"
+                    ),
+                    decode_responses=True,
+                )
+            )
+        return cls(
+            path=config.config.get(
+                "file_paths",
+                "known_entities",
+                fallback="/tmp/spotify_history_known_entities.json",
+            )
+        )
+
+    def _key(self, kind: str) -> str:
+        return f"{self.key_prefix}:{kind}"
+
+    def _load(self) -> bool:
+        if self.redis is not None:
+            if not self.redis.exists(self._key("warmed")):
+                return False
+            for kind in KINDS:
+                self.ids[kind] = set(self.redis.smembers(self._key(kind)))
+            return True
+
+        if not self.path or not os.path.exists(self.path):
+            return False
+        with open(self.path, "r", encoding="utf-8") as fp:
+            data = json.load(fp)
+        for kind in KINDS:
+            self.ids[kind] = set(data.get(kind, []))
+        return True
+
+    def warm(self, engine, force: bool = False) -> None:
+        """
+        Load the known IDs from the database if the store is empty (or `force` is set).
+
+        Args:
+            engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
+            force (bool, optional): Rebuild the cache even if it was already loaded.
+        """
+        if self.loaded and not force:
+            return
+        self.ids = get_known_entity_ids(engine)
+        self._pending = {kind: set(ids) for kind, ids in self.ids.items()}
+        if self.redis is not None:
+            self.redis.delete(*(self._key(kind) for kind in KINDS))
+        self.save()
+        self.loaded = True
+
+    def add(self, kind: str, ids) -> None:
+        new_ids = set(ids) - self.ids[kind]
+        self.ids[kind] |= new_ids
+        self._pending[kind] |= new_ids
+
+    def add_entities(self, data_tuple) -> None:
+        """
+        Record the entities of a successfully committed data tuple as known.
+
+        Args:
+            data_tuple (Tuple): Lists of Artists, Albums, AlbumArtists, Songs,
+                                SongArtists and SongStreamed.
+        """
+        artists, albums, album_artists, songs = data_tuple[:4]
+        self.add("artists", (artist.id for artist in artists))
+        self.add("albums", (album.id for album in albums))
+        self.add(
+            "album_artists",
+            (f"{row.album_id}:{row.artist_id}" for row in album_artists),
+        )
+        self.add("songs", (song.id for song in songs))
+
+    def save(self) -> None:
+        """Persist the IDs added since the last save."""
+        if self.redis is not None:
+            pipeline = self.redis.pipeline()
+            for kind, ids in self._pending.items():
+                if ids:
+                    pipeline.sadd(self._key(kind), *ids)
+            pipeline.set(self._key("warmed"), 1)
+            pipeline.execute()
+        elif self.path:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as fp:
+                json.dump({kind: sorted(ids) for kind, ids in self.ids.items()}, fp)
+            os.replace(tmp_path, self.path)
+        self._pending = {kind: set() for kind in KINDS}
+
+    def clear(self) -> None:
+        """Forget every known ID so the next run warms the cache from the database again."""
+        self.ids = {kind: set() for kind in KINDS}
+        self._pending = {kind: set() for kind in KINDS}
+        self.loaded = False
+        if self.redis is not None:
+            self.redis.delete(*(self._key(kind) for kind in (*KINDS, "warmed")))
+        elif self.path and os.path.exists(self.path):
+            os.remove(self.path)
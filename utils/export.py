@@ -0,0 +1,210 @@
+"""
+Columnar snapshot of the listening history for notebooks and batch jobs.
+
+An export directory holds one raw little-endian file per column plus JSON
+dictionaries and a manifest:
+
+    streams.played_at.bin    datetime64[us]  one value per stream, in played_at order
+    streams.song.bin         int32           song code
+    streams.album.bin        int32           album code
+    streams.length_ms.bin    int32           song length
+    song_artists.song.bin    int32           song code     (one row per song/artist pair)
+    song_artists.artist.bin  int32           artist code
+    songs.json, albums.json, artists.json    code -> ID and name dictionaries
+    manifest.json            row counts, dtypes and the last exported played_at
+
+IDs are dictionary encoded: a code is the position of the ID in its dictionary and
+codes never change, so appending only adds entries. Every column can be opened
+without copying through `numpy.memmap` (see load_export). The manifest is written
+last, so an interrupted export is rolled back to the previous manifest on the next
+run.
+"""
+import datetime
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from database.utils import get_song_artists, iter_streams_with_metadata
+
+MANIFEST_VERSION = 1
+TABLES = {
+    "streams": {
+        "played_at": "datetime64[us]",
+        "song": "<i4",
+        "album": "<i4",
+        "length_ms": "<i4",
+    },
+    "song_artists": {"song": "<i4", "artist": "<i4"},
+}
+DICTIONARIES = {
+    "songs": ("id", "name"),
+    "albums": ("id", "name", "release_year"),
+    "artists": ("id", "name"),
+}
+
+
+class Dictionary:
+    """Append-only mapping of IDs to dense integer codes, with extra attributes per ID."""
+
+    def __init__(self, fields: tuple, data: Optional[dict] = None):
+        self.fields = fields
+        self.data = data or {field: [] for field in fields}
+        self.codes = {value: code for code, value in enumerate(self.data["id"])}
+
+    def encode(self, *values) -> int:
+        code = self.codes.get(values[0])
+        if code is None:
+            code = self.codes[values[0]] = len(self.data["id"])
+            for field, value in zip(self.fields, values):
+                self.data[field].append(value)
+        return code
+
+    def __len__(self) -> int:
+        return len(self.data["id"])
+
+
+def column_path(directory: str, table: str, column: str) -> str:
+    return os.path.join(directory, f"{table}.{column}.bin")
+
+
+def read_manifest(directory: str) -> dict:
+    path = os.path.join(directory, "manifest.json")
+    if not os.path.exists(path):
+        return {
+            "version": MANIFEST_VERSION,
+            "rows": {table: 0 for table in TABLES},
+            "last_played_at": None,
+            "columns": TABLES,
+        }
+    with open(path, "r", encoding="utf-8") as fp:
+        return json.load(fp)
+
+
+def write_json(path: str, data) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fp:
+        json.dump(data, fp)
+    os.replace(tmp_path, path)
+
+
+def truncate_columns(directory: str, manifest: dict) -> None:
+    """Cut every column file back to the row count in the manifest."""
+    for table, columns in TABLES.items():
+        for column, dtype in columns.items():
+            path = column_path(directory, table, column)
+            size = manifest["rows"][table] * np.dtype(dtype).itemsize
+            with open(path, "ab") as fp:
+                fp.truncate(size)
+
+
+def export_streams(
+    engine,
+    directory: str,
+    chunk_size: int = 50_000,
+    full: bool = False,
+    log=lambda *args: None,
+) -> Dict[str, int]:
+    """
+    Write or extend the columnar export of the streams joined with songs, albums and artists.
+
+    Only streams played after the manifest's `last_played_at` are read, in chunks of
+    `chunk_size` rows through a server-side cursor; each chunk is encoded and
+    appended to the column files before the next one is fetched.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
+        directory (str): The export directory; created if missing.
+        chunk_size (int, optional): Rows fetched and written at a time.
+        full (bool, optional): Discard the existing export and write it again.
+        log (Callable, optional): Logger method receiving printf-style arguments.
+
+    Returns:
+        Dict[str, int]: Rows appended per table.
+    """
+    os.makedirs(directory, exist_ok=True)
+    if full and os.path.exists(os.path.join(directory, "manifest.json")):
+        os.remove(os.path.join(directory, "manifest.json"))
+
+    manifest = read_manifest(directory)
+    dictionaries = {}
+    for name, fields in DICTIONARIES.items():
+        path = os.path.join(directory, f"{name}.json")
+        data = None
+        if manifest["last_played_at"] is not None and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as fp:
+                data = json.load(fp)
+        dictionaries[name] = Dictionary(fields, data)
+    truncate_columns(directory, manifest)
+
+    after = manifest["last_played_at"]
+    after = datetime.datetime.fromisoformat(after) if after else None
+    appended = {table: 0 for table in TABLES}
+    songs, albums, artists = (dictionaries[name] for name in DICTIONARIES)
+
+    for chunk in iter_streams_with_metadata(engine, after, chunk_size):
+        known_songs = len(songs)
+        columns: Dict[str, List] = {column: [] for column in TABLES["streams"]}
+        for played_at, song_id, song_name, length, album_id, album_name, year in chunk:
+            columns["played_at"].append(played_at)
+            columns["song"].append(songs.encode(song_id, song_name))
+            columns["album"].append(albums.encode(album_id, album_name, year))
+            columns["length_ms"].append(length or 0)
+
+        new_song_ids = songs.data["id"][known_songs:]
+        pairs = {"song": [], "artist": []}
+        for song_id, artist_id, artist_name in get_song_artists(engine, new_song_ids):
+            pairs["song"].append(songs.codes[song_id])
+            pairs["artist"].append(artists.encode(artist_id, artist_name))
+
+        for table, table_columns in (("streams", columns), ("song_artists", pairs)):
+            for column, values in table_columns.items():
+                with open(column_path(directory, table, column), "ab") as fp:
+                    fp.write(np.asarray(values, dtype=TABLES[table][column]).tobytes())
+            appended[table] += len(table_columns["song"])
+
+        manifest["last_played_at"] = chunk[-1][0].isoformat()
+        log("Exported %s streams up to %s", len(chunk), manifest["last_played_at"])
+
+    if any(appended.values()):
+        for name, dictionary in dictionaries.items():
+            write_json(os.path.join(directory, f"{name}.json"), dictionary.data)
+        for table, count in appended.items():
+            manifest["rows"][table] += count
+        manifest["exported_at"] = datetime.datetime.utcnow().isoformat()
+        write_json(os.path.join(directory, "manifest.json"), manifest)
+    return appended
+
+
+def load_export(directory: str) -> dict:
+    """
+    Open an export without copying it into memory.
+
+    Returns:
+        dict: {"streams": {column: np.memmap}, "song_artists": {...},
+               "songs"/"albums"/"artists": {field: list}, "manifest": dict}
+    """
+    manifest = read_manifest(directory)
+    export = {"manifest": manifest}
+    for table, columns in manifest["columns"].items():
+        rows = manifest["rows"][table]
+        export[table] = {
+            column: (
+                np.memmap(
+                    column_path(directory, table, column),
+                    dtype=dtype,
+                    mode="r",
+                    shape=(rows,),
+                )
+                if rows
+                else np.empty(0, dtype=dtype)
+            )
+            for column, dtype in columns.items()
+        }
+    for name in DICTIONARIES:
+        path = os.path.join(directory, f"{name}.json")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as fp:
+                export[name] = json.load(fp)
+    return export
@@ -0,0 +1,427 @@
+"""
+A local stand-in for the Spotify Web API.
+
+The server answers the endpoints this project uses with deterministic fake data,
+so pipelines that talk to Spotify can be exercised without credentials or network
+access: tracks, playlists (read, add, remove, reorder, replace, change details),
+the currently playing track and the recently played history. It can also inject
+latency with jitter, 429 rate limiting and random 5xx errors to mimic the real API
+under load (see benchmarks/spotify_client.py).
+
+Run it standalone with `python -m utils.fake_spotify --port 8765`, or start it from
+code and point a client at it with `get_fake_spotify_client(server.url)`.
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import spotipy
+
+from utils.spotify import ResilientSpotify
+
+
+def fake_track(track_id: str) -> dict:
+    """
+    Build a deterministic Spotify track object for a track ID.
+
+    Args:
+        track_id (str): The Spotify track ID.
+
+    Returns:
+        dict: A track object shaped like the one returned by GET /v1/tracks.
+    """
+    digest = int(hashlib.md5(track_id.encode("utf-8")).hexdigest(), 16)
+    album_id = f"album{digest % 5000:05d}"
+    artist_ids = [f"artist{(digest >> (8 * i)) % 2000:04d}" for i in range(1 + digest % 3)]
+
+    return {
+        "id": track_id,
+        "name": f"Song {track_id}",
+        "duration_ms": 120000 + digest % 240000,
+        "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"},
+        "album": {
+            "id": album_id,
+            "name": f"Album {album_id}",
+            "release_date": f"{1970 + digest % 54}-01-01",
+        },
+        "artists": [
+            {"id": artist_id, "name": f"Artist {artist_id}"} for artist_id in artist_ids
+        ],
+    }
+
+
+class FakeSpotifyServer:
+    """
+    Threaded HTTP server emulating the parts of the Spotify Web API used by this project.
+
+    Args:
+        host (str, optional): Interface to bind to.
+        port (int, optional): Port to bind to; 0 picks a free port.
+        latency (float, optional): Seconds to sleep before answering each request.
+        rate_limit (float, optional): Requests per second allowed before answering
+                                      429 with a Retry-After header. None disables it.
+        unknown_ids (set, optional): Track IDs answered with null, like removed tracks.
+        latency_jitter (float, optional): Up to this many extra seconds of latency,
+                                          drawn per request.
+        error_rate (float, optional): Share of requests answered with a random 500,
+                                      502 or 503. Half of the failed writes are
+                                      applied before answering 502 or 504, like a
+                                      gateway timing out on a request Spotify
+                                      completed.
+        seed (Optional[int], optional): Seed for the jitter and errors.
+
+    Attributes:
+        playlists (dict): Playlist ID to {"snapshot_id", "description", "tracks"};
+                          unknown playlists are created empty on first use.
+        now_playing (Optional[str]): Track ID answered by currently-playing; None
+                                     answers 204 No Content.
+        recently_played (list): (track ID, played_at ISO string) pairs, newest first.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        rate_limit: Optional[float] = None,
+        unknown_ids: Optional[set] = None,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.unknown_ids = unknown_ids or set()
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.playlists: Dict[str, dict] = {}
+        self.now_playing: Optional[str] = None
+        self.recently_played: List[tuple] = []
+        self.request_count = 0
+        self.throttled_count = 0
+        self.error_count = 0
+        self.applied_error_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/"
+
+    def start(self) -> "FakeSpotifyServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _throttled(self) -> bool:
+        with self._lock:
+            self.request_count += 1
+            if self.rate_limit is None:
+                return False
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start, self._window_count = now, 0
+            self._window_count += 1
+            if self._window_count > self.rate_limit:
+                self.throttled_count += 1
+                return True
+            return False
+
+    def _failed(self, method: str) -> Tuple[Optional[int], bool]:
+        """
+        Return the error status to answer (None for success) and whether the request
+        is applied before the error is answered.
+        """
+        with self._lock:
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.error_count += 1
+                if method != "GET" and self._random.random() < 0.5:
+                    self.applied_error_count += 1
+                    return self._random.choice((502, 504)), True
+                return self._random.choice((500, 502, 503)), False
+        return None, False
+
+    def _delay(self) -> float:
+        with self._lock:
+            return self.latency + self._random.uniform(0, self.latency_jitter)
+
+    def add_plays(self, track_ids: List[str], start: Optional[datetime.datetime] = None):
+        """
+        Append plays to the recently played history, one every three minutes from
+        `start` (default: after the newest play, or an hour ago).
+        """
+        if start is None:
+            start = (
+                datetime.datetime.fromisoformat(self.recently_played[0][1][:-1])
+                if self.recently_played
+                else datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+            ) + datetime.timedelta(minutes=3)
+        for offset, track_id in enumerate(track_ids):
+            played_at = start + datetime.timedelta(minutes=3 * offset)
+            self.recently_played.insert(
+                0, (track_id, played_at.isoformat(timespec="milliseconds") + "Z")
+            )
+
+    def _playlist(self, playlist_id: str) -> dict:
+        return self.playlists.setdefault(
+            playlist_id, {"snapshot_id": "0", "description": "", "tracks": []}
+        )
+
+    def _new_snapshot(self, playlist: dict) -> dict:
+        playlist["snapshot_id"] = str(int(playlist["snapshot_id"]) + 1)
+        return {"snapshot_id": playlist["snapshot_id"]}
+
+    def _page(self, path: str, query: dict, items: list, default_limit: int) -> dict:
+        limit = int(query.get("limit", [default_limit])[0])
+        offset = int(query.get("offset", [0])[0])
+        following = offset + limit < len(items)
+        next_query = {key: values[0] for key, values in query.items()}
+        next_query.update(limit=limit, offset=offset + limit)
+        return {
+            "items": items[offset : offset + limit],
+            "total": len(items),
+            "limit": limit,
+            "offset": offset,
+            "next": f"{self.url}{path[4:]}?{urlencode(next_query)}" if following else None,
+        }
+
+    def route_playlist(
+        self, method: str, path: str, query: dict, body: Optional[dict]
+    ):
+        """Answer /v1/playlists/{id} and /v1/playlists/{id}/tracks."""
+        parts = path.split("/")
+        with self._lock:
+            playlist = self._playlist(parts[3])
+            tracks = playlist["tracks"]
+            if len(parts) == 4:
+                if method == "GET":
+                    return 200, {
+                        "id": parts[3],
+                        "snapshot_id": playlist["snapshot_id"],
+                        "description": playlist["description"],
+                        "tracks": {"total": len(tracks)},
+                    }
+                if method == "PUT":
+                    playlist["description"] = body.get("description", "")
+                    return 200, {}
+            elif method == "GET":
+                items = [{"track": fake_track(track_id)} for track_id in tracks]
+                return 200, self._page(path, query, items, 100)
+            elif method == "POST":
+                uris = body if isinstance(body, list) else body.get("uris", [])
+                if len(uris) > 100:
+                    return 400, {"error": {"status": 400, "message": "Too many ids"}}
+                position = int(query.get("position", [len(tracks)])[0])
+                tracks[position:position] = [uri.rsplit(":", 1)[-1] for uri in uris]
+                return 201, self._new_snapshot(playlist)
+            elif method == "DELETE":
+                removed = {item["uri"].rsplit(":", 1)[-1] for item in body["tracks"]}
+                if len(removed) > 100:
+                    return 400, {"error": {"status": 400, "message": "Too many ids"}}
+                tracks[:] = [track_id for track_id in tracks if track_id not in removed]
+                return 200, self._new_snapshot(playlist)
+            elif method == "PUT" and "uris" in body:
+                if len(body["uris"]) > 100:
+                    return 400, {"error": {"status": 400, "message": "Too many ids"}}
+                tracks[:] = [uri.rsplit(":", 1)[-1] for uri in body["uris"]]
+                return 200, self._new_snapshot(playlist)
+            elif method == "PUT":
+                start = body["range_start"]
+                length = body.get("range_length", 1)
+                insert_before = body["insert_before"]
+                block = tracks[start : start + length]
+                del tracks[start : start + length]
+                if insert_before > start:
+                    insert_before -= length
+                tracks[insert_before:insert_before] = block
+                return 200, self._new_snapshot(playlist)
+        return 405, {"error": {"status": 405, "message": "Method not allowed"}}
+
+    def route(self, method: str, path: str, query: dict, body: Optional[dict]):
+        """
+        Answer a request.
+
+        Returns:
+            tuple: The HTTP status code and the JSON-serializable response body;
+                   a None body answers 204 No Content.
+        """
+        path = path.rstrip("/")
+        if path.startswith("/v1/playlists/"):
+            return self.route_playlist(method, path, query, body)
+        if method == "GET" and path == "/v1/me/player/currently-playing":
+            if self.now_playing is None:
+                return 204, None
+            track = fake_track(self.now_playing)
+            return 200, {
+                "is_playing": True,
+                "progress_ms": track["duration_ms"] // 2,
+                "item": track,
+            }
+        if method == "GET" and path == "/v1/me/player/recently-played":
+            after = int(query.get("after", [0])[0])
+            limit = int(query.get("limit", [50])[0])
+            plays = [
+                (track_id, played_at)
+                for track_id, played_at in self.recently_played
+                if datetime.datetime.fromisoformat(played_at[:-1])
+                .replace(tzinfo=datetime.timezone.utc)
+                .timestamp()
+                * 1000
+                > after
+            ]
+            # Like Spotify, `after` pages forward from the oldest play.
+            plays = plays[-limit:] if after else plays[:limit]
+            return 200, {
+                "items": [
+                    {"track": fake_track(track_id), "played_at": played_at}
+                    for track_id, played_at in plays
+                ],
+                "next": None,
+                "limit": limit,
+            }
+        if method == "GET" and path == "/v1/tracks":
+            ids = query.get("ids", [""])[0].split(",")
+            return 200, {
+                "tracks": [
+                    None if track_id in self.unknown_ids else fake_track(track_id)
+                    for track_id in ids
+                    if track_id
+                ]
+            }
+        if method == "GET" and path.startswith("/v1/tracks/"):
+            track_id = path.rsplit("/", 1)[-1]
+            if track_id in self.unknown_ids:
+                return 404, {"error": {"status": 404, "message": "Not found"}}
+            return 200, fake_track(track_id)
+        return 404, {"error": {"status": 404, "message": f"No fake for {path}"}}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self, method: str) -> None:
+                delay = server._delay()
+                if delay:
+                    time.sleep(delay)
+                if server._throttled():
+                    self.send_response(429)
+                    self.send_header("Retry-After", "1")
+                    self.send_header("Content-Type", "application/json")
+                    self.end_headers()
+                    self.wfile.write(
+                        b'{"error": {"status": 429, "message": "API rate limit exceeded"}}'
+                    )
+                    return
+
+                parsed = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                error_status, applied = server._failed(method)
+                if error_status and applied:
+                    server.route(method, parsed.path, parse_qs(parsed.query), body)
+                if error_status:
+                    self.send_response(error_status)
+                    self.send_header("Content-Type", "application/json")
+                    self.end_headers()
+                    self.wfile.write(b'{"error": {"status": 500, "message": "Fake"}}')
+                    return
+
+                status, payload = server.route(
+                    method, parsed.path, parse_qs(parsed.query), body
+                )
+                if payload is None:
+                    self.send_response(status)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                encoded = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                self._respond("POST")
+
+            def do_PUT(self):
+                self._respond("PUT")
+
+            def do_DELETE(self):
+                self._respond("DELETE")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def get_fake_spotify_client(
+    url: str, resilient: bool = False, **kwargs
+) -> spotipy.Spotify:
+    """
+    Create a Spotify client that talks to a FakeSpotifyServer instead of api.spotify.com.
+
+    Args:
+        url (str): The server's API prefix, e.g. `FakeSpotifyServer.url`.
+        resilient (bool, optional): Build the ResilientSpotify that get_spotify_client
+                                    returns instead of a plain spotipy client.
+        **kwargs: Extra keyword arguments passed to the client.
+
+    Returns:
+        spotipy.Spotify: A client authenticated with a dummy token.
+    """
+    client_class = ResilientSpotify if resilient else spotipy.Spotify
+    sp = client_class(auth="fake-token", **kwargs)
+    sp.prefix = url
+    return sp
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local fake Spotify Web API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with FakeSpotifyServer(
+        args.host,
+        args.port,
+        args.latency,
+        args.rate_limit,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+    ) as fake:
+        print(f"Fake Spotify API listening on {fake.url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
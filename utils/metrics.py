@@ -0,0 +1,263 @@
+"""
+Per-stage timing and throughput metrics for pipeline runs.
+
+A RunMetrics records how long each stage of one run took together with the items,
+bytes and rows it handled, and publishes the run three ways:
+
+    log lines   one `metrics {...}` JSON line per stage and per run on the logger
+    textfile    a Prometheus textfile-collector file describing the last run
+    history     a JSON Lines file keeping the last `max_runs` runs, for trends
+
+    metrics = RunMetrics("etl")
+    with metrics.stage("spotify_fetch") as stage:
+        items = fetch()
+        stage.items = len(items)
+    metrics.finish("ok")
+    metrics.publish(logger, textfile_path, history_path)
+"""
+import contextlib
+import datetime
+import json
+import os
+import statistics
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional
+
+METRIC_PREFIX = "spotify_history"
+
+
+@dataclass
+class Stage:
+    """One timed stage; the caller fills in what it handled."""
+
+    name: str
+    seconds: float = 0.0
+    items: Optional[int] = None
+    bytes: Optional[int] = None
+    rows: Optional[int] = None
+
+    def as_dict(self) -> dict:
+        return {key: value for key, value in asdict(self).items() if value is not None}
+
+
+class RunMetrics:
+    """
+    Stage timings of one run of a pipeline.
+
+    Args:
+        pipeline (str): Name of the pipeline, e.g. "etl"; used in metric names.
+    """
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.stages: List[Stage] = []
+        self.status = "running"
+        self.seconds = 0.0
+        self._started = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[Stage]:
+        """Time the block; the stage is recorded even when the block raises."""
+        stage = Stage(name)
+        started = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.seconds = time.perf_counter() - started
+            self.stages.append(stage)
+
+    def finish(self, status: str) -> None:
+        """Close the run with a status such as "ok", "no_new_tracks" or "error"."""
+        self.status = status
+        self.seconds = time.perf_counter() - self._started
+
+    def as_dict(self) -> dict:
+        return {
+            "pipeline": self.pipeline,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "status": self.status,
+            "seconds": round(self.seconds, 6),
+            "stages": [
+                dict(stage.as_dict(), seconds=round(stage.seconds, 6))
+                for stage in self.stages
+            ],
+        }
+
+    def log(self, logger) -> None:
+        run = self.as_dict()
+        for stage in run["stages"]:
+            logger.info(
+                "metrics %s",
+                json.dumps(dict(stage, pipeline=self.pipeline, type="stage")),
+            )
+        logger.info(
+            "metrics %s",
+            json.dumps(
+                {
+                    "pipeline": self.pipeline,
+                    "type": "run",
+                    "status": run["status"],
+                    "seconds": run["seconds"],
+                    "rows": sum(stage.rows or 0 for stage in self.stages),
+                }
+            ),
+        )
+
+    def prometheus_text(self) -> str:
+        """Render the run in the Prometheus text exposition format."""
+        name = f"{METRIC_PREFIX}_{self.pipeline}"
+        lines = []
+
+        def gauge(metric: str, help_text: str, samples: List[tuple]) -> None:
+            if not samples:
+                return
+            lines.append(f"# HELP {name}_{metric} {help_text}")
+            lines.append(f"# TYPE {name}_{metric} gauge")
+            for labels, value in samples:
+                label_text = ",".join(
+                    f'{key}="{escape_label(str(label))}"' for key, label in labels.items()
+                )
+                lines.append(
+                    f"{name}_{metric}{{{label_text}}} {value}"
+                    if label_text
+                    else f"{name}_{metric} {value}"
+                )
+
+        gauge(
+            "last_run_timestamp_seconds",
+            "Unix time the last run started.",
+            [({}, round(self.started_at.timestamp(), 3))],
+        )
+        gauge(
+            "last_run_duration_seconds",
+            "Wall time of the last run.",
+            [({}, round(self.seconds, 6))],
+        )
+        gauge(
+            "last_run_success",
+            "1 when the last run did not fail.",
+            [({"status": self.status}, int(self.status != "error"))],
+        )
+        for field_name, metric, help_text in (
+            ("seconds", "stage_duration_seconds", "Wall time of each stage"),
+            ("items", "stage_items", "Items each stage handled"),
+            ("bytes", "stage_bytes", "Bytes each stage wrote or read"),
+            ("rows", "stage_rows", "Rows each stage inserted"),
+        ):
+            gauge(
+                metric,
+                f"{help_text} in the last run.",
+                [
+                    ({"stage": stage.name}, round(getattr(stage, field_name), 6))
+                    for stage in self.stages
+                    if getattr(stage, field_name) is not None
+                ],
+            )
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """Atomically replace the textfile the node exporter collects."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fp:
+            fp.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def append_history(self, path: str, max_runs: int = 500) -> None:
+        """
+        Append the run to a JSON Lines history, keeping only the last `max_runs` runs.
+
+        The file is trimmed once it holds a tenth more runs than allowed, so most runs
+        only append one line.
+        """
+        with open(path, "a", encoding="utf-8") as fp:
+            fp.write(json.dumps(self.as_dict()) + "\n")
+        with open(path, "r", encoding="utf-8") as fp:
+            lines = fp.readlines()
+        if len(lines) > max_runs + max(1, max_runs // 10):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as fp:
+                fp.writelines(lines[-max_runs:])
+            os.replace(tmp_path, path)
+
+    def publish(
+        self,
+        logger,
+        textfile: Optional[str] = None,
+        history: Optional[str] = None,
+        max_runs: int = 500,
+    ) -> None:
+        """
+        Log the run and write whichever of the textfile and history are configured.
+        Metrics are best effort: a write failure is logged, never raised.
+        """
+        self.log(logger)
+        try:
+            if textfile:
+                self.write_prometheus(textfile)
+            if history:
+                self.append_history(history, max_runs)
+        except OSError as e:
+            logger.error("Could not write %s metrics: %s", self.pipeline, e)
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def read_history(path: str) -> List[dict]:
+    """Return the runs of a history file, oldest first; skips unreadable lines."""
+    runs = []
+    try:
+        with open(path, "r", encoding="utf-8") as fp:
+            for line in fp:
+                try:
+                    runs.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return runs
+
+
+def stage_trends(runs: List[dict], recent: int = 10) -> Dict[str, dict]:
+    """
+    Compare each stage's recent runs with all earlier ones.
+
+    Args:
+        runs (List[dict]): Runs from read_history, oldest first.
+        recent (int, optional): How many of the latest runs count as recent.
+
+    Returns:
+        Dict[str, dict]: Per stage (plus "total" for whole runs): the number of runs,
+                         the median seconds of the recent and earlier runs, the median
+                         rows of the recent runs and the recent/earlier seconds ratio.
+    """
+    samples: Dict[str, List[tuple]] = {}
+    for run in runs:
+        samples.setdefault("total", []).append(
+            (run["seconds"], sum(stage.get("rows", 0) for stage in run["stages"]))
+        )
+        for stage in run["stages"]:
+            samples.setdefault(stage["name"], []).append(
+                (stage["seconds"], stage.get("rows", 0))
+            )
+
+    trends = {}
+    for name, values in samples.items():
+        latest, earlier = values[-recent:], values[:-recent]
+        recent_seconds = statistics.median(seconds for seconds, _ in latest)
+        earlier_seconds = (
+            statistics.median(seconds for seconds, _ in earlier) if earlier else None
+        )
+        trends[name] = {
+            "runs": len(values),
+            "recent_p50_seconds": recent_seconds,
+            "earlier_p50_seconds": earlier_seconds,
+            "recent_p50_rows": statistics.median(rows for _, rows in latest),
+            "ratio": (
+                recent_seconds / earlier_seconds if earlier_seconds else None
+            ),
+        }
+    return trends
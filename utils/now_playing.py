@@ -0,0 +1,129 @@
+import os
+import threading
+from typing import Dict, Optional
+
+from database.utils import get_play_counts
+
+
+class PlayCountIndex:
+    """
+    In-memory map of song ID to stream count for answering "how often have I played this?".
+
+    The map is seeded once from the database and then only the streams added after
+    the last seen `played_at` are fetched, so lookups never touch the database. Each
+    refresh also compares the database's total stream count with the index's; when
+    rows with older timestamps were loaded in the meantime (import_history,
+    backfill_songs, replay) the totals differ and the index is seeded again.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The SQLAlchemy engine used to connect to the database.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.counts: Dict[str, int] = {}
+        self.latest_played_at = None
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def seed(self) -> int:
+        """
+        Load the stream count of every song.
+
+        Returns:
+            int: The number of songs in the index.
+        """
+        counts, latest_played_at, total = get_play_counts(self.engine)
+        with self._lock:
+            self.counts = counts
+            self.latest_played_at = latest_played_at
+            self.total = total
+        return len(counts)
+
+    def refresh(self) -> int:
+        """
+        Add the streams loaded since the last seed or refresh, e.g. after an ETL run,
+        or seed the index again if streams older than the last seen one were loaded.
+
+        Returns:
+            int: The number of new streams counted.
+        """
+        before = self.total
+        if self.latest_played_at is None:
+            self.seed()
+            return self.total - before
+
+        counts, latest_played_at, total = get_play_counts(
+            self.engine, self.latest_played_at
+        )
+        if before + sum(counts.values()) != total:
+            self.seed()
+            return self.total - before
+
+        with self._lock:
+            for song_id, count in counts.items():
+                self.counts[song_id] = self.counts.get(song_id, 0) + count
+            self.latest_played_at = latest_played_at
+            self.total = total
+        return sum(counts.values())
+
+    def get(self, song_id: str) -> int:
+        return self.counts.get(song_id, 0)
+
+
+class FileWatcher:
+    """
+    Report when a file was modified since the last check, from its mtime alone.
+
+    Args:
+        path (Optional[str]): The file to watch; None never reports a change.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.mtime = self._mtime()
+
+    def _mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime if self.path else None
+        except OSError:
+            return None
+
+    def changed(self) -> bool:
+        mtime = self._mtime()
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        return True
+
+
+def next_poll_interval(
+    song_data: Optional[dict],
+    previous: float,
+    min_interval: float = 1.0,
+    max_interval: float = 10.0,
+    idle_interval: float = 60.0,
+) -> float:
+    """
+    Choose how long to wait before asking Spotify for the current song again.
+
+    While a track plays, the next poll is timed for just after it should end, but at
+    most `max_interval` away so skips are noticed quickly. While nothing plays the
+    interval doubles on every poll up to `idle_interval`.
+
+    Args:
+        song_data (Optional[dict]): The last currently_playing response.
+        previous (float): The interval used before this poll.
+        min_interval (float, optional): Shortest wait in seconds.
+        max_interval (float, optional): Longest wait while a track plays.
+        idle_interval (float, optional): Longest wait while nothing plays.
+
+    Returns:
+        float: Seconds to wait.
+    """
+    item = (song_data or {}).get("item")
+    if not item or not song_data.get("is_playing"):
+        return min(idle_interval, max(min_interval, previous * 2))
+
+    remaining_ms = item.get("duration_ms", 0) - (song_data.get("progress_ms") or 0)
+    return min(max_interval, max(min_interval, remaining_ms / 1000 + 0.5))
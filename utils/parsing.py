@@ -0,0 +1,534 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import IO, Iterator, List, Optional, Tuple, Union
+
+from database.models import (
+    Album,
+    AlbumArtist,
+    Artist,
+    Song,
+    SongArtist,
+    SongStreamed,
+    CurrentSong,
+)
+
+ENTITY_CLASSES = {
+    "artists": Artist,
+    "albums": Album,
+    "album_artists": AlbumArtist,
+    "songs": Song,
+    "song_artists": SongArtist,
+    "streams": SongStreamed,
+}
+
+"""Data Extraction Modules"""
+
+
+def chunk_list(lst: list, chunk_size: int = 50):
+    return [lst[i : i + chunk_size] for i in range(0, len(lst), chunk_size)]
+
+
+def iter_json_array(fp: IO[str], chunk_size: int = 1 << 20) -> Iterator[object]:
+    """
+    Yield the elements of a top-level JSON array one at a time.
+
+    The file is read in chunks of `chunk_size` characters and each element is
+    decoded as soon as it is complete, so memory use is bounded by the chunk size
+    and the largest single element rather than by the size of the file.
+
+    Args:
+        fp (IO[str]): A text file object positioned at the start of a JSON array.
+        chunk_size (int, optional): Number of characters to read per chunk.
+
+    Yields:
+        object: Each decoded element of the array.
+
+    Raises:
+        ValueError: If the document is not a JSON array or ends prematurely.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, started = "", 0, False
+
+    while True:
+        chunk = fp.read(chunk_size)
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                break
+            if end == len(buffer) and chunk and not isinstance(element, (dict, list)):
+                break  # a scalar at the end of the buffer may still be truncated
+            yield element
+            pos = end
+
+        if not chunk:
+            raise ValueError("Unexpected end of JSON array")
+
+
+def parse_history_export(
+    file_name: str, min_ms_played: int = 30000
+) -> Iterator[Tuple[str, str]]:
+    """
+    Stream (song_id, played_at) rows out of a Spotify extended streaming history export.
+
+    Each export file (`Streaming_History_Audio_*.json`) is a JSON array of play
+    records. Records without a track URI (podcasts, audiobooks) and plays shorter
+    than `min_ms_played` are skipped, matching what the recently played endpoint
+    counts as a stream.
+
+    Args:
+        file_name (str): Path to an extended streaming history JSON file.
+        min_ms_played (int, optional): Minimum play duration in milliseconds.
+
+    Yields:
+        Tuple[str, str]: The song ID and the ISO 8601 timestamp of the play, in
+        the column order of the stream_history table.
+    """
+    with open(file_name, "r", encoding="utf-8") as fp:
+        for record in iter_json_array(fp):
+            track_uri = record.get("spotify_track_uri")
+            if not track_uri or record.get("ms_played", 0) < min_ms_played:
+                continue
+            yield track_uri.rsplit(":", 1)[-1], record["ts"]
+
+
+def add_track_entities(entities: defaultdict, track: dict) -> None:
+    """
+    Append the Song, Album, Artist, AlbumArtist and SongArtist rows for a track object.
+
+    Args:
+        entities (defaultdict): A defaultdict(list) keyed by entity type ("songs",
+                                "albums", "artists", "album_artists", "song_artists").
+        track (dict): A Spotify track object as returned by the Web API.
+
+    Raises:
+        KeyError: If a required key is missing in the track object.
+    """
+    for kind, row in track_entity_rows(track):
+        entities[kind].append(ENTITY_CLASSES[kind](**row))
+
+
+def track_entity_rows(track: dict) -> Iterator[Tuple[str, dict]]:
+    """
+    Yield the (entity type, column values) pairs of the rows a track object maps to.
+
+    This is the mapping add_track_entities builds entities from; code that only needs
+    the values (e.g. utils.archive replaying millions of plays) uses it directly.
+
+    Raises:
+        KeyError: If a required key is missing in the track object.
+    """
+    album_section = track["album"]
+    album_id = album_section["id"]
+    song_id = track["id"]
+
+    yield "songs", {
+        "id": song_id,
+        "name": track["name"],
+        "album_id": album_id,
+        "length": track["duration_ms"],
+    }
+    yield "albums", {
+        "id": album_id,
+        "name": album_section["name"],
+        "release_year": album_section["release_date"][:4],
+    }
+
+    for artist in track["artists"]:
+        artist_id = artist["id"]
+        yield "artists", {"id": artist_id, "name": artist["name"]}
+        yield "album_artists", {"album_id": album_id, "artist_id": artist_id}
+        yield "song_artists", {"song_id": song_id, "artist_id": artist_id}
+
+
+def play_row(item: dict) -> dict:
+    """Column values of the stream row for a play history item."""
+    return {"song_id": item["track"]["id"], "played_at": item["played_at"]}
+
+
+def parse_tracks(
+    tracks: List[dict],
+) -> Tuple[
+    List[Artist],
+    List[Album],
+    List[AlbumArtist],
+    List[Song],
+    List[SongArtist],
+    List[SongStreamed],
+]:
+    """
+    Parse Spotify track objects (e.g. from the /tracks endpoint) into database entities.
+
+    Args:
+        tracks (List[dict]): Spotify track objects.
+
+    Returns:
+        Tuple: Lists of Artists, Albums, AlbumArtists, Songs, SongArtists and an empty
+               list of SongStreamed, in the order insert_rows_with_conflict_handling expects.
+
+    Raises:
+        KeyError: If a required key is missing in a track object.
+    """
+    entities = defaultdict(list)
+    for track in tracks:
+        add_track_entities(entities, track)
+
+    return (
+        entities["artists"],
+        entities["albums"],
+        entities["album_artists"],
+        entities["songs"],
+        entities["song_artists"],
+        entities["streams"],
+    )
+
+
+def parse_recent_tracks(
+    file_name: str,
+) -> Tuple[
+    Union[
+        Tuple[
+            List[Artist],
+            List[Album],
+            List[AlbumArtist],
+            List[Song],
+            List[SongArtist],
+            List[SongStreamed],
+        ],
+        str,
+    ]
+]:
+    """
+    Parse the recent tracks data from a JSON file.
+
+    Args:
+        file_name (str): The name of the JSON file containing recent tracks data.
+
+    Returns:
+        Tuple: A tuple containing the parsed data as lists of Artists, Albums, AlbumArtists,
+               Songs, SongArtists, and SongStreamed. If an error occurs during parsing,
+               a tuple containing (None, error_message) is returned.
+
+    Raises:
+        FileNotFoundError: If the specified file_name is not found.
+        KeyError: If a required key is missing in the JSON data.
+    """
+    try:
+        with open(file_name, "r", encoding="utf-8") as fp:
+            data = json.load(fp)
+
+    except FileNotFoundError as e:
+        return None, str(e)
+
+    return parse_recent_items(data)
+
+
+def parse_recent_items(
+    items: List[dict],
+) -> Tuple[
+    Union[
+        Tuple[
+            List[Artist],
+            List[Album],
+            List[AlbumArtist],
+            List[Song],
+            List[SongArtist],
+            List[SongStreamed],
+        ],
+        str,
+    ]
+]:
+    """
+    Parse play history items, as returned by the recently played endpoint, in memory.
+
+    Args:
+        items (List[dict]): The "items" of current_user_recently_played pages.
+
+    Returns:
+        Tuple: The same as parse_recent_tracks: the entity lists and None, or None and
+               an error message when an item misses a required key.
+    """
+    try:
+        recent_entities = defaultdict(list)
+
+        for item in items:
+            add_track_entities(recent_entities, item["track"])
+            recent_entities["streams"].append(SongStreamed(**play_row(item)))
+
+        return (
+            recent_entities["artists"],
+            recent_entities["albums"],
+            recent_entities["album_artists"],
+            recent_entities["songs"],
+            recent_entities["song_artists"],
+            recent_entities["streams"],
+        ), None
+
+    except KeyError as e:
+        return None, str(e)
+
+
+def filter_known_entities(
+    data_tuple: Tuple[
+        List[Artist],
+        List[Album],
+        List[AlbumArtist],
+        List[Song],
+        List[SongArtist],
+        List[SongStreamed],
+    ],
+    known: Optional[dict] = None,
+) -> Tuple[
+    List[Artist],
+    List[Album],
+    List[AlbumArtist],
+    List[Song],
+    List[SongArtist],
+    List[SongStreamed],
+]:
+    """
+    Drop duplicate rows within a parsed batch and rows the database already has.
+
+    Args:
+        data_tuple (Tuple): Lists of Artists, Albums, AlbumArtists, Songs, SongArtists
+                            and SongStreamed as returned by parse_recent_tracks.
+        known (Optional[dict]): Sets of known IDs keyed by "artists", "albums",
+                                "album_artists" ("album_id:artist_id") and "songs",
+                                e.g. KnownEntityCache.ids.
+
+    Returns:
+        Tuple: The same six lists without duplicates or known entities. SongArtists of
+               known songs are dropped as well, since they are stored with the song.
+    """
+    known = known or {}
+    known_artists = known.get("artists", set())
+    known_albums = known.get("albums", set())
+    known_album_artists = known.get("album_artists", set())
+    known_songs = known.get("songs", set())
+
+    def unique(rows, key, skip):
+        seen = {}
+        for row in rows:
+            row_key = key(row)
+            if row_key not in seen and not skip(row, row_key):
+                seen[row_key] = row
+        return list(seen.values())
+
+    artists, albums, album_artists, songs, song_artists, streams = data_tuple
+    return (
+        unique(artists, lambda row: row.id, lambda row, key: key in known_artists),
+        unique(albums, lambda row: row.id, lambda row, key: key in known_albums),
+        unique(
+            album_artists,
+            lambda row: f"{row.album_id}:{row.artist_id}",
+            lambda row, key: key in known_album_artists,
+        ),
+        unique(songs, lambda row: row.id, lambda row, key: key in known_songs),
+        unique(
+            song_artists,
+            lambda row: (row.song_id, row.artist_id),
+            lambda row, key: row.song_id in known_songs,
+        ),
+        unique(streams, lambda row: (row.song_id, row.played_at), lambda row, key: False),
+    )
+
+
+def parse_current_song(song_data: dict) -> Union[CurrentSong, str]:
+    """
+    Parse the current song data received from Spotify.
+
+    Args:
+        song_data (dict): A dictionary containing the current song data.
+
+    Returns:
+        Union[CurrentSong, str]: If the parsing is successful, returns an instance
+        of the CurrentSong class containing parsed data. Otherwise, returns an
+        error message as a string.
+    """
+    try:
+        song = song_data["item"]
+        artist = song["artists"][0]
+        album = song["album"]
+
+        current_song = CurrentSong(
+            song_id=song["id"],
+            song_name=song["name"],
+            song_url=song["external_urls"]["spotify"],
+            song_artist_id=artist["id"],
+            song_artist_name=artist["name"],
+            song_album_id=album["id"],
+            song_album=album["name"],
+        )
+
+        return current_song, None
+
+    except KeyError as e:
+        error_message = f"KeyError: {e}"
+        return None, error_message
+    except (TypeError, IndexError) as e:
+        error_message = f"TypeError or IndexError: {e}"
+        return None, error_message
+
+
+def played_at_to_ms(played_at: Union[str, datetime]) -> int:
+    """
+    Convert a played_at value to a Unix timestamp in milliseconds.
+
+    Args:
+        played_at (Union[str, datetime]): An ISO 8601 string from the Spotify API or a
+                                          datetime from the streams table. Values without
+                                          a timezone are treated as UTC.
+
+    Returns:
+        int: Milliseconds since the epoch, as used by the API's `after` cursor.
+    """
+    if isinstance(played_at, str):
+        played_at = datetime.fromisoformat(played_at)
+    if played_at.tzinfo is None:
+        played_at = played_at.replace(tzinfo=timezone.utc)
+    return int(played_at.timestamp() * 1000)
+
+
+"""I/O Modules"""
+
+
+def read_etl_state(file_name: str) -> dict:
+    """
+    Read the persisted ETL state (e.g. the `last_played_at_ms` high-water mark).
+
+    Args:
+        file_name (str): Path of the JSON state file.
+
+    Returns:
+        dict: The stored state, or an empty dict if the file does not exist or is unreadable.
+    """
+    try:
+        with open(file_name, "r", encoding="utf-8") as fp:
+            return json.load(fp)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def write_etl_state(file_name: str, state: dict) -> None:
+    """
+    Atomically persist the ETL state to a JSON file.
+
+    Args:
+        file_name (str): Path of the JSON state file.
+        state (dict): The state to store.
+    """
+    tmp_file_name = f"{file_name}.tmp"
+    with open(tmp_file_name, "w", encoding="utf-8") as fp:
+        json.dump(state, fp)
+    os.replace(tmp_file_name, file_name)
+
+
+_payload_writer: Optional[ThreadPoolExecutor] = None
+_payload_writer_lock = threading.Lock()
+
+
+def write_raw_payload(file_name: str, payload) -> int:
+    """
+    Atomically write an API payload to a JSON file.
+
+    Returns:
+        int: The bytes written.
+    """
+    tmp_file_name = f"{file_name}.tmp"
+    with open(tmp_file_name, "w", encoding="utf-8") as fp:
+        json.dump(payload, fp)
+        size = fp.tell()
+    os.replace(tmp_file_name, file_name)
+    return size
+
+
+def write_raw_payload_async(file_name: str, payload) -> Future:
+    """
+    Write an API payload to a JSON file on the background writer thread.
+
+    The payload must not be changed after it is handed over.
+
+    Returns:
+        Future: Resolves to the bytes written, or raises the write's error.
+    """
+    return submit_background_write(write_raw_payload, file_name, payload)
+
+
+def submit_background_write(func, *args) -> Future:
+    """
+    Run a write off the caller's critical path.
+
+    Writes are queued on one worker thread, so they run in submission order, and the
+    interpreter waits for queued writes before it exits.
+
+    Returns:
+        Future: Resolves to the function's result.
+    """
+    global _payload_writer
+    with _payload_writer_lock:
+        if _payload_writer is None:
+            _payload_writer = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="background-write"
+            )
+    return _payload_writer.submit(func, *args)
+
+
+def write_song_data(
+    data_tuple: Tuple[
+        list[Artist],
+        list[Album],
+        list[AlbumArtist],
+        list[Song],
+        list[SongArtist],
+        list[SongStreamed],
+    ]
+) -> None:
+    """
+    Write song data to a JSON file in /tmp/ directory.
+
+    Args:
+        data_tuple (Tuple): A tuple containing song data for recent artists,
+        recent albums, recent album artists, recent songs, recent song artists,
+        and recent streams.
+
+    Raises:
+        Exception: If there is an error during writing the data to the file.
+    """
+    try:
+        data = {
+            "recent_artists": [artist.as_dict() for artist in data_tuple[0]],
+            "recent_albums": [album.as_dict() for album in data_tuple[1]],
+            "recent_album_artists": [album.as_dict() for album in data_tuple[2]],
+            "recent_songs": [song.as_dict() for song in data_tuple[3]],
+            "recent_song_artists": [song.as_dict() for song in data_tuple[4]],
+            "recent_streams": [stream.as_dict() for stream in data_tuple[5]],
+        }
+
+        # Write the data dictionary to the JSON file
+        file_name = f"/tmp/{int(time.time())}_recently_played_data.json"
+        with open(file_name, "w", encoding="utf-8") as fp:
+            json.dump(data, fp, indent=4)
+    except Exception as e:
+        raise Exception(f"Error writing song data to file: {str(e)}")
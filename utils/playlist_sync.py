@@ -0,0 +1,313 @@
+"""
+Bring a Spotify playlist to a wanted track list with as few API calls as possible.
+
+The current track list is read once and cached together with the playlist's
+`snapshot_id`; while the snapshot is unchanged the next sync only asks Spotify for
+the snapshot ID. The changes are then planned two ways and the plan needing fewer
+calls is sent:
+
+    incremental  remove the tracks that are no longer wanted, move the kept tracks
+                 that are out of order (everything outside the longest run already
+                 in the wanted order stays put), insert the new tracks
+    replace      replace the first 100 tracks and append the rest
+
+Every call carries at most 100 tracks, the Web API's limit, and a playlist that
+already matches gets no write at all.
+"""
+import bisect
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import spotipy
+
+CHUNK_SIZE = 100
+
+
+class SnapshotCache:
+    """
+    Last known snapshot ID and track IDs per playlist.
+
+    Args:
+        path (Optional[str]): JSON file the snapshots persist to; in memory only when
+                              None.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.snapshots: Dict[str, dict] = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as fp:
+                    self.snapshots = json.load(fp)
+            except (OSError, ValueError):
+                self.snapshots = {}
+
+    @classmethod
+    def from_config(cls, config) -> "SnapshotCache":
+        """Build the cache from the `playlist_snapshots` entry of `[file_paths]`."""
+        return cls(
+            config.config.get(
+                "file_paths",
+                "playlist_snapshots",
+                fallback="/tmp/spotify_history_playlist_snapshots.json",
+            )
+        )
+
+    def get(self, playlist_id: str) -> Optional[dict]:
+        return self.snapshots.get(playlist_id)
+
+    def set(self, playlist_id: str, snapshot: dict) -> None:
+        self.snapshots[playlist_id] = snapshot
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fp:
+            json.dump(self.snapshots, fp)
+        os.replace(tmp_path, self.path)
+
+
+def chunks(items: Sequence, size: int = CHUNK_SIZE) -> List[Sequence]:
+    return [items[start : start + size] for start in range(0, len(items), size)]
+
+
+def longest_increasing_subsequence(values: Sequence[int]) -> List[int]:
+    """
+    Return the indices of one longest strictly increasing subsequence, in O(n log n).
+    """
+    tails: List[int] = []  # value at the end of the best run of each length
+    tail_indices: List[int] = []
+    previous = [-1] * len(values)
+    for index, value in enumerate(values):
+        length = bisect.bisect_left(tails, value)
+        if length == len(tails):
+            tails.append(value)
+            tail_indices.append(index)
+        else:
+            tails[length] = value
+            tail_indices[length] = index
+        previous[index] = tail_indices[length - 1] if length else -1
+
+    result = []
+    index = tail_indices[-1] if tail_indices else -1
+    while index != -1:
+        result.append(index)
+        index = previous[index]
+    return result[::-1]
+
+
+def replace_operations(wanted: Sequence[str]) -> List[tuple]:
+    operations = [("replace", list(wanted[:CHUNK_SIZE]))]
+    operations.extend(
+        ("add", list(chunk), None) for chunk in chunks(wanted[CHUNK_SIZE:])
+    )
+    return operations
+
+
+def incremental_operations(
+    current: Sequence[str], wanted: Sequence[str]
+) -> Optional[List[tuple]]:
+    """
+    Plan the remove, move and insert calls turning `current` into `wanted`.
+
+    Operations are ("remove", track_ids), ("reorder", range_start, insert_before,
+    range_length) and ("add", track_ids, position), with positions valid at the time
+    each operation runs.
+
+    Returns:
+        Optional[List[tuple]]: The operations, or None when a list repeats a track,
+                               which this plan cannot express.
+    """
+    wanted_set = set(wanted)
+    if len(wanted_set) != len(wanted) or len(set(current)) != len(current):
+        return None
+
+    removed = sorted({track for track in current if track not in wanted_set})
+    operations = [("remove", list(chunk)) for chunk in chunks(removed)]
+    playlist = [track for track in current if track in wanted_set]
+
+    # Kept tracks on the longest subsequence already in wanted order stay where they
+    # are; every other kept track is moved once, right behind the kept track that
+    # precedes it in `wanted`. Doing that in wanted order leaves all kept tracks in
+    # wanted order.
+    wanted_position = {track: position for position, track in enumerate(wanted)}
+    fixed = {
+        playlist[index]
+        for index in longest_increasing_subsequence(
+            [wanted_position[track] for track in playlist]
+        )
+    }
+    kept = set(playlist)
+    placed = set(fixed)
+    previous_kept = None
+    position = 0
+    while position < len(wanted):
+        track = wanted[position]
+        if track not in kept:
+            position += 1
+            continue
+        if track in placed:
+            previous_kept = track
+            position += 1
+            continue
+
+        # Move the longest block that is adjacent both in `wanted` and in the playlist.
+        start = playlist.index(track)
+        length = 1
+        while (
+            position + length < len(wanted)
+            and start + length < len(playlist)
+            and playlist[start + length] == wanted[position + length]
+            and wanted[position + length] not in placed
+        ):
+            length += 1
+        insert_before = playlist.index(previous_kept) + 1 if previous_kept else 0
+        if insert_before != start:
+            operations.append(("reorder", start, insert_before, length))
+            block = playlist[start : start + length]
+            del playlist[start : start + length]
+            if insert_before > start:
+                insert_before -= length
+            playlist[insert_before:insert_before] = block
+        placed.update(wanted[position : position + length])
+        previous_kept = wanted[position + length - 1]
+        position += length
+
+    # The playlist now holds the kept tracks in wanted order; insert the runs of new ones.
+    position = 0
+    while position < len(wanted):
+        if position < len(playlist) and playlist[position] == wanted[position]:
+            position += 1
+            continue
+        end = position
+        while end < len(wanted) and wanted[end] not in kept:
+            end += 1
+        for offset, chunk in enumerate(chunks(wanted[position:end])):
+            operations.append(("add", list(chunk), position + offset * CHUNK_SIZE))
+        playlist[position:position] = wanted[position:end]
+        position = end
+    return operations
+
+
+def plan_playlist_sync(
+    current: Sequence[str], wanted: Sequence[str]
+) -> Tuple[str, List[tuple]]:
+    """
+    Choose the plan with the fewest API calls.
+
+    Returns:
+        tuple: "unchanged", "incremental" or "replace" and the operations to send.
+    """
+    if list(current) == list(wanted):
+        return "unchanged", []
+    incremental = incremental_operations(current, wanted)
+    replace = replace_operations(wanted)
+    if incremental is not None and len(incremental) <= len(replace):
+        return "incremental", incremental
+    return "replace", replace
+
+
+def fetch_playlist_tracks(sp: spotipy.Spotify, playlist_id: str) -> List[Optional[str]]:
+    """Read the track IDs of a playlist, 100 per request; local files read as None."""
+    track_ids = []
+    page = sp.playlist_items(
+        playlist_id, fields="items(track(id)),next", limit=CHUNK_SIZE
+    )
+    while page:
+        track_ids.extend((item.get("track") or {}).get("id") for item in page["items"])
+        page = sp.next(page) if page.get("next") else None
+    return track_ids
+
+
+def apply_operations(
+    sp: spotipy.Spotify, playlist_id: str, operations: List[tuple], snapshot_id: str
+) -> Optional[str]:
+    """
+    Send planned operations in order.
+
+    Returns:
+        Optional[str]: The playlist's snapshot ID after the last operation.
+    """
+    for operation in operations:
+        kind = operation[0]
+        if kind == "remove":
+            response = sp.playlist_remove_all_occurrences_of_items(
+                playlist_id, operation[1], snapshot_id=snapshot_id
+            )
+        elif kind == "reorder":
+            _, range_start, insert_before, range_length = operation
+            response = sp.playlist_reorder_items(
+                playlist_id,
+                range_start,
+                insert_before,
+                range_length=range_length,
+                snapshot_id=snapshot_id,
+            )
+        elif kind == "add":
+            response = sp.playlist_add_items(playlist_id, operation[1], operation[2])
+        else:
+            response = sp.playlist_replace_items(playlist_id, operation[1])
+        snapshot_id = (response or {}).get("snapshot_id", snapshot_id)
+    return snapshot_id
+
+
+def sync_playlist(
+    sp: spotipy.Spotify,
+    playlist_id: str,
+    track_ids: Sequence[str],
+    description: Optional[str] = None,
+    cache: Optional[SnapshotCache] = None,
+) -> dict:
+    """
+    Make a playlist hold exactly `track_ids`, in order, and carry `description`.
+
+    Args:
+        sp (spotipy.Spotify): An authenticated Spotify client.
+        playlist_id (str): The playlist to update.
+        track_ids (Sequence[str]): The wanted track IDs; any number of them.
+        description (Optional[str], optional): The wanted description; left alone when None.
+        cache (Optional[SnapshotCache], optional): Snapshots from earlier syncs.
+
+    Returns:
+        dict: "strategy" ("unchanged", "incremental" or "replace"), "calls" (API
+              requests made, reads included), "description_changed", "added" and
+              "removed".
+    """
+    cache = cache if cache is not None else SnapshotCache()
+    track_ids = list(track_ids)
+    calls = 1
+    details = sp.playlist(playlist_id, fields="snapshot_id,description")
+    snapshot_id = details["snapshot_id"]
+
+    cached = cache.get(playlist_id)
+    if cached and cached["snapshot_id"] == snapshot_id:
+        current = cached["track_ids"]
+    else:
+        current = fetch_playlist_tracks(sp, playlist_id)
+        calls += max(1, -(-len(current) // CHUNK_SIZE))
+
+    if any(track is None for track in current):
+        # Local files have no ID to remove or reorder by.
+        strategy, operations = "replace", replace_operations(track_ids)
+    else:
+        strategy, operations = plan_playlist_sync(current, track_ids)
+    snapshot_id = apply_operations(sp, playlist_id, operations, snapshot_id)
+    calls += len(operations)
+
+    description_changed = (
+        description is not None and description != (details.get("description") or "")
+    )
+    if description_changed:
+        sp.playlist_change_details(playlist_id, description=description)
+        calls += 1
+        # A details change may also produce a new snapshot ID; the next sync then
+        # reads the tracks again.
+
+    cache.set(playlist_id, {"snapshot_id": snapshot_id, "track_ids": track_ids})
+    return {
+        "strategy": strategy,
+        "calls": calls,
+        "description_changed": description_changed,
+        "added": len(set(track_ids) - set(current)),
+        "removed": len(set(current) - set(track_ids)),
+    }
@@ -0,0 +1,105 @@
+import heapq
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+
+@dataclass(order=True)
+class Job:
+    """A function run every `interval` seconds, give or take `jitter` seconds."""
+
+    next_run: float
+    name: str = field(compare=False)
+    func: Callable[[], None] = field(compare=False)
+    interval: float = field(compare=False)
+    jitter: float = field(compare=False, default=0.0)
+    lock: threading.Lock = field(compare=False, default_factory=threading.Lock)
+
+    def schedule_next(self, now: float) -> None:
+        offset = random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        self.next_run = now + max(1.0, self.interval + offset)
+
+
+class Scheduler:
+    """
+    In-process interval scheduler for long running daemons.
+
+    Jobs run on a small thread pool so a slow job does not delay the others. Each job
+    holds its own lock while it runs; when a job is due while its previous run is still
+    in progress the new run is skipped instead of piling up.
+
+    Args:
+        logger (logging.Logger): Logger receiving job start, skip and failure messages.
+        max_workers (int, optional): Maximum number of jobs running at the same time.
+    """
+
+    def __init__(self, logger, max_workers: int = 4):
+        self.logger = logger
+        self.max_workers = max_workers
+        self.jobs: List[Job] = []
+        self.stop_event = threading.Event()
+
+    def add_job(
+        self,
+        name: str,
+        func: Callable[[], None],
+        interval: float,
+        jitter: float = 0.0,
+        run_immediately: bool = True,
+    ) -> None:
+        """
+        Register a job.
+
+        Args:
+            name (str): Name used in log messages.
+            func (Callable[[], None]): The work to run.
+            interval (float): Seconds between the starts of two runs.
+            jitter (float, optional): Maximum random offset applied to each interval.
+            run_immediately (bool, optional): Run once as soon as the scheduler starts.
+        """
+        job = Job(next_run=0.0, name=name, func=func, interval=interval, jitter=jitter)
+        now = time.monotonic()
+        if run_immediately:
+            job.next_run = now + (random.uniform(0, jitter) if jitter else 0.0)
+        else:
+            job.schedule_next(now)
+        heapq.heappush(self.jobs, job)
+
+    def _run_job(self, job: Job) -> None:
+        if not job.lock.acquire(blocking=False):
+            self.logger.warning("Skipping %s: previous run still in progress", job.name)
+            return
+        try:
+            start = time.perf_counter()
+            job.func()
+            self.logger.info(
+                "Job %s finished in %.1f ms", job.name, (time.perf_counter() - start) * 1000
+            )
+        except Exception as e:
+            self.logger.error("Job %s failed: %s", job.name, e)
+        finally:
+            job.lock.release()
+
+    def run(self) -> None:
+        """
+        Run jobs as they fall due until stop() is called, then wait for running jobs.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while self.jobs and not self.stop_event.is_set():
+                job = self.jobs[0]
+                delay = job.next_run - time.monotonic()
+                if delay > 0:
+                    self.stop_event.wait(delay)
+                    continue
+
+                heapq.heappop(self.jobs)
+                executor.submit(self._run_job, job)
+                job.schedule_next(time.monotonic())
+                heapq.heappush(self.jobs, job)
+
+    def stop(self, *args) -> None:
+        """Stop scheduling new runs; usable as a signal handler."""
+        self.stop_event.set()
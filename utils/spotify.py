@@ -0,0 +1,413 @@
+import copy
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple, Union
+
+import requests
+import spotipy
+import urllib3
+from requests.adapters import HTTPAdapter
+from spotipy.oauth2 import CacheFileHandler, SpotifyOAuth
+
+"""Spotify API Modules"""
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# A write may already have been applied when a 5xx or a broken connection comes
+# back, so writes that are not idempotent are only retried when the server provably
+# did not act on them.
+WRITE_RETRY_STATUS_CODES = (429,)
+# Player state changes from second to second, so it is never served from the cache.
+UNCACHED_PREFIXES = ("me/player/currently-playing",)
+
+_clients: Dict[tuple, spotipy.Spotify] = {}
+_clients_lock = threading.Lock()
+
+
+def create_new_playlist(
+    playlist_name: str, playlist_desc: str, sp: spotipy.Spotify
+) -> tuple[str, None]:
+    """
+    Create a new Spotify playlist for the current user.
+
+    Args:
+        playlist_name (str): The name of the new playlist.
+        playlist_desc (str): The description of the new playlist.
+        sp (spotipy.Spotify): The Spotipy client instance authenticated with the user's credentials.
+
+    Returns:
+        tuple[None, str]: A tuple containing either None (if the playlist was created successfully)
+                          or an error message (if there was an issue with the Spotify authentication).
+
+    Raises:
+        spotipy.SpotifyException: If there is an error in the Spotify authentication process.
+    """
+    try:
+        response = sp.current_user()
+        user_id = response["id"]
+
+        playlist = sp.user_playlist_create(
+            user_id, playlist_name, public=True, description=playlist_desc
+        )
+
+        playlist_id = playlist["id"]
+
+        return (
+            f"Playlist '{playlist_name}' created successfully with ID: {playlist_id}",
+            None,
+        )
+
+    except spotipy.SpotifyException as e:
+        return None, e
+
+
+def get_spotify_client(credentials: dict) -> Union[spotipy.Spotify, str]:
+    """Create a Spotify client object for accessing Spotify's Web API.
+
+    The client is a ResilientSpotify and is shared: every call with the same
+    credentials in a process returns the same client, so its connection pool, token,
+    rate limiter and response cache are shared as well. Optional keys tune it:
+    `max_retries` (5), `calls_per_second` (10), `cache_ttl` (5 seconds, 0 disables
+    the cache), `cache_size` (256 responses), `pool_size` (10) and `refresh_margin`
+    (300 seconds before expiry).
+
+    This function initializes and returns a Spotify client object using the provided
+    credentials for authentication and authorization. The client can be used to make
+    requests to the Spotify Web API for retrieving user data, accessing playlists,
+    and performing other operations related to music and user profiles.
+
+    Args:
+        credentials (dict): A dictionary containing the required authentication
+        credentials for the Spotify client. It should have the following keys:
+            - 'cache_path' (str): The file path where the Spotify OAuth token cache
+              will be stored.
+            - 'client_id' (str): The client ID obtained from the Spotify Developer
+              Dashboard for your application.
+            - 'client_secret' (str): The client secret obtained from the Spotify
+              Developer Dashboard for your application.
+            - 'redirect_uri' (str): The URI to redirect the user after successful
+              authorization through the Spotify Web API.
+            - 'scope' (str): The scope of access required for the application. This
+              specifies the level of permissions the user grants to the application.
+
+    Returns:
+        Union[spotipy.Spotify, str]: If successful, returns a Spotify client object
+        that can be used to make requests to the Spotify Web API. If there's an error,
+        returns an error message as a string.
+
+    Example:
+        credentials = {
+            'cache_path': '/path/to/cache_file',
+            'client_id': 'your_client_id',
+            'client_secret': 'your_client_secret',
+            'redirect_uri': 'https://your_redirect_uri.com',
+            'scope': 'user-library-read user-read-recently-played',
+        }
+        spotify_client = create_spotify_client(credentials)
+        if isinstance(spotify_client, spotipy.Spotify):
+            user_playlists = spotify_client.current_user_playlists()
+            print(user_playlists)
+        else:
+            print(f"Error: {spotify_client}")
+    """
+    key = tuple(sorted(credentials.items()))
+    try:
+        with _clients_lock:
+            if key not in _clients:
+                cache_handler = CacheFileHandler(credentials["cache_path"])
+
+                auth_manager = EarlyRefreshOAuth(
+                    cache_handler=cache_handler,
+                    client_id=credentials["client_id"],
+                    client_secret=credentials["client_secret"],
+                    redirect_uri=credentials["redirect_uri"],
+                    scope=credentials["scope"],
+                    open_browser=False,
+                    requests_timeout=10,
+                    refresh_margin=float(credentials.get("refresh_margin", 300)),
+                )
+
+                _clients[key] = ResilientSpotify(
+                    auth_manager=auth_manager,
+                    max_retries=int(credentials.get("max_retries", 5)),
+                    calls_per_second=float(credentials.get("calls_per_second", 10)),
+                    cache_ttl=float(credentials.get("cache_ttl", 5)),
+                    cache_size=int(credentials.get("cache_size", 256)),
+                    pool_size=int(credentials.get("pool_size", 10)),
+                )
+            return _clients[key]
+    except Exception as e:
+        return str(e)
+
+
+def is_spotify_instance(spotify_object: spotipy.Spotify) -> bool:
+    return isinstance(spotify_object, spotipy.Spotify)
+
+
+def prompt_for_playlist_info() -> tuple[str, str]:
+    playlist_name = input("Enter the playlist name: ")
+    playlist_desc = input("Enter the playlist description: ")
+    return playlist_name, playlist_desc
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket that spaces out calls to at most `rate` per second.
+
+    Args:
+        rate (float): Sustained number of calls allowed per second.
+        burst (int, optional): Number of calls that may be made back to back.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a call is allowed."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller for `seconds`, e.g. for a 429 Retry-After."""
+        with self._lock:
+            self._tokens = min(self._tokens, 1 - seconds * self.rate)
+            self._updated = time.monotonic()
+
+
+def request_not_sent(error: requests.exceptions.ConnectionError) -> bool:
+    """
+    Return whether a connection error happened before the request reached the server
+    (the connection could not be opened), as opposed to a connection that broke
+    while the server may have been processing the request.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0] if error.args else None, "reason", None)
+    return isinstance(
+        reason,
+        (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ConnectTimeoutError),
+    )
+
+
+def is_idempotent(method: str, payload) -> bool:
+    """
+    Return whether repeating a request leaves the same state as sending it once.
+
+    Reads, removing every occurrence of some items (DELETE) and replacing a
+    playlist's items or details (PUT) are idempotent. Adding items (POST), reordering
+    them (PUT with `range_start`) and removing items at given positions are not: a
+    repeat would add, move or remove them a second time.
+    """
+    if method == "GET":
+        return True
+    if method == "DELETE":
+        return not any(
+            "positions" in track for track in (payload or {}).get("tracks", [])
+        )
+    if method == "PUT":
+        return not (isinstance(payload, dict) and "range_start" in payload)
+    return False
+
+
+class EarlyRefreshOAuth(SpotifyOAuth):
+    """
+    SpotifyOAuth that refreshes the access token `refresh_margin` seconds before it
+    expires (spotipy waits until the last minute), once for all threads.
+    """
+
+    def __init__(self, *args, refresh_margin: float = 300.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.refresh_margin = refresh_margin
+        self._token_lock = threading.Lock()
+
+    def is_token_expired(self, token_info: dict) -> bool:
+        return token_info["expires_at"] - time.time() < self.refresh_margin
+
+    def get_access_token(self, *args, **kwargs):
+        with self._token_lock:
+            return super().get_access_token(*args, **kwargs)
+
+
+class ResilientSpotify(spotipy.Spotify):
+    """
+    Spotify client with connection pooling, retries, a rate limit and a GET cache.
+
+    - One requests session with a connection pool of `pool_size` is reused for every
+      call and thread.
+    - Every request first waits for the client's RateLimiter; a 429 pauses the
+      limiter for Retry-After seconds, so all threads back off together.
+    - Idempotent calls (see is_idempotent) are retried on 429, 5xx and connection
+      errors; the other writes (adding and reordering items) only on 429 and on
+      connection failures before the request was sent, so they are never applied
+      twice. Up to `max_retries`
+      retries wait Retry-After when given and otherwise an exponential delay with
+      full jitter (a random wait up to `backoff_base * 2**attempt`, capped at
+      `backoff_cap`).
+    - GET responses are cached for `cache_ttl` seconds, keyed by URL and parameters,
+      except UNCACHED_PREFIXES. Any write to a resource drops the cached GETs under it.
+      Expired entries are swept on every store and at most `cache_size` entries are
+      kept, evicting the least recently used.
+
+    Args:
+        max_retries (int, optional): Retries per request after the first attempt.
+        calls_per_second (float, optional): Sustained request rate.
+        cache_ttl (float, optional): Seconds a GET response is reused; 0 disables it.
+        cache_size (int, optional): Most GET responses kept.
+        pool_size (int, optional): Connections kept open to the API.
+        backoff_base (float, optional): First retry delay in seconds.
+        backoff_cap (float, optional): Longest retry delay in seconds.
+        **kwargs: Passed to spotipy.Spotify (e.g. `auth_manager`, `auth`).
+    """
+
+    def __init__(
+        self,
+        *args,
+        max_retries: int = 5,
+        calls_per_second: float = 10.0,
+        cache_ttl: float = 5.0,
+        cache_size: int = 256,
+        pool_size: int = 10,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 30.0,
+        **kwargs,
+    ):
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        kwargs.setdefault("requests_session", session)
+        kwargs.setdefault("requests_timeout", 10)
+        super().__init__(*args, **kwargs)
+
+        self.max_retries = max_retries
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.rate_limiter = RateLimiter(calls_per_second, burst=max(1, pool_size))
+        self.counters = {"requests": 0, "retries": 0, "throttled": 0, "cache_hits": 0}
+        self._counters_lock = threading.Lock()
+        self._cache: "OrderedDict[tuple, Tuple[float, object]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _count(self, counter: str) -> None:
+        with self._counters_lock:
+            self.counters[counter] += 1
+
+    def _cache_key(self, url: str, params: dict) -> tuple:
+        if url.startswith(self.prefix):
+            url = url[len(self.prefix) :]
+        return url, json.dumps(params, sort_keys=True, default=str)
+
+    def _cached(self, key: tuple):
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._cache.pop(key, None)
+                return False, None
+            self._cache.move_to_end(key)
+            self._count("cache_hits")
+            return True, copy.deepcopy(entry[1])
+
+    def _store(self, key: tuple, result) -> None:
+        now = time.monotonic()
+        with self._cache_lock:
+            for stored in [
+                stored for stored, entry in self._cache.items() if entry[0] < now
+            ]:
+                del self._cache[stored]
+            self._cache[key] = (now + self.cache_ttl, copy.deepcopy(result))
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _invalidate(self, url: str) -> None:
+        # playlists/{id}/tracks invalidates everything cached under playlists/{id}.
+        resource = "/".join(self._cache_key(url, {})[0].split("?")[0].split("/")[:2])
+        with self._cache_lock:
+            for key in [key for key in self._cache if key[0].startswith(resource)]:
+                del self._cache[key]
+
+    def retry_delay(self, attempt: int, error: Exception) -> float:
+        headers = getattr(error, "headers", None) or {}
+        retry_after = headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                return float(retry_after) + random.uniform(0, self.backoff_base)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2**attempt))
+
+    def _internal_call(self, method, url, payload, params):
+        key = None
+        if method == "GET" and self.cache_ttl > 0:
+            key = self._cache_key(url, params)
+            if not key[0].startswith(UNCACHED_PREFIXES):
+                hit, result = self._cached(key)
+                if hit:
+                    return result
+            else:
+                key = None
+
+        try:
+            result = self._call_with_retries(method, url, payload, params)
+        finally:
+            if method != "GET":
+                # A write that failed may still have been applied.
+                self._invalidate(url)
+        if key is not None:
+            self._store(key, result)
+        return result
+
+    def _call_with_retries(self, method, url, payload, params):
+        idempotent = is_idempotent(method, payload)
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            self._count("requests")
+            try:
+                # spotipy consumes some of the parameters, so each attempt gets a copy.
+                return super()._internal_call(method, url, payload, dict(params))
+            except (spotipy.SpotifyException, requests.exceptions.ConnectionError) as e:
+                status = getattr(e, "http_status", None)
+                if isinstance(e, spotipy.SpotifyException):
+                    retry_codes = RETRY_STATUS_CODES
+                    if not idempotent:
+                        retry_codes = WRITE_RETRY_STATUS_CODES
+                    if status not in retry_codes:
+                        raise
+                elif not idempotent and not request_not_sent(e):
+                    raise
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.retry_delay(attempt, e)
+                self._count("retries")
+                attempt += 1
+                if status == 429:
+                    # The next acquire() waits out the pause, here and in every thread.
+                    self._count("throttled")
+                    self.rate_limiter.pause(delay)
+                else:
+                    time.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._counters_lock:
+            return dict(self.counters)
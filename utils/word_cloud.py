@@ -0,0 +1,254 @@
+import functools
+import hashlib
+import json
+import os
+import random
+import resource
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+from wordcloud import WordCloud, ImageColorGenerator
+
+"""WordCloud Modules"""
+
+
+def grey_color_func(
+    word, font_size, position, orientation, random_state=None, **kwargs
+) -> str:
+    """Returns grey color for word cloud font"""
+    random.seed(42)
+    return "hsl(0, 0%%, %d%%)" % random.randint(60, 100)
+
+
+@functools.lru_cache(maxsize=8)
+def load_mask(mask_image: str, max_size: Optional[int] = None) -> np.ndarray:
+    """
+    Load a mask image once per process, shrunk so its longest side is at most `max_size`.
+
+    The word cloud canvas has the size of the mask, so `max_size` bounds the render
+    resolution (and memory) regardless of the mask file's size.
+
+    Returns:
+        np.ndarray: The read-only mask pixels.
+    """
+    with Image.open(mask_image) as image:
+        if max_size and max(image.size) > max_size:
+            image.thumbnail((max_size, max_size))
+        mask = np.array(image)
+    mask.flags.writeable = False
+    return mask
+
+
+def file_digest(path: Optional[str]) -> str:
+    if not path:
+        return ""
+    with open(path, "rb") as fp:
+        return hashlib.sha256(fp.read()).hexdigest()
+
+
+def render_cache_key(
+    freq_dict: dict,
+    font_path: Optional[str],
+    mask_image: Optional[str],
+    multi_flag: bool,
+    dpi: int,
+    max_size: Optional[int],
+) -> str:
+    """
+    Hash everything that changes the rendered image: frequencies, mask, font and size.
+    """
+    payload = json.dumps(
+        {
+            "frequencies": sorted(freq_dict.items()),
+            "font": file_digest(font_path),
+            "mask": file_digest(mask_image),
+            "multi": multi_flag,
+            "dpi": dpi,
+            "max_size": max_size,
+        }
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def generate_word_cloud(
+    font_path: str,
+    freq_dict: dict,
+    outfile_path: str,
+    mask_image: str,
+    multi_flag: bool,
+    dpi: int = 300,
+    max_size: Optional[int] = 2000,
+):
+    """
+    Generates a word cloud from frequency_dict, mask_image, and stores result in file_path.
+
+    The single cloud is written straight from the WordCloud canvas at the mask's
+    size (bounded by `max_size`); the multi panel figure is drawn on an Agg figure
+    at `dpi` without touching pyplot's global state.
+    """
+    mask = load_mask(mask_image, max_size) if mask_image else None
+    size = {}
+    if mask is None:
+        size = {"width": max_size or 2000, "height": (max_size or 2000) // 2}
+
+    wc = WordCloud(
+        background_color="black",
+        font_path=font_path,
+        mask=mask,
+        **size,
+    ).generate_from_frequencies(freq_dict)
+
+    if multi_flag and mask is not None:
+        image_colors = ImageColorGenerator(mask)
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        axes = fig.subplots(1, 3)
+        axes[0].imshow(wc, interpolation="bilinear")
+        axes[1].imshow(wc.recolor(color_func=image_colors), interpolation="bilinear")
+        axes[2].imshow(mask, cmap="gray", interpolation="bilinear")
+        for ax in axes:
+            ax.set_axis_off()
+        fig.savefig(
+            outfile_path,
+            bbox_inches="tight",
+            pad_inches=0,
+            dpi=dpi,
+        )
+    else:
+        wc.recolor(color_func=grey_color_func).to_file(outfile_path)
+
+
+def word_cloud_path(job: dict) -> str:
+    """
+    Return `<output_dir>/<name>-<hash>.png`, where the hash covers the frequencies,
+    mask, font and size of the job.
+    """
+    key = render_cache_key(
+        job["frequencies"],
+        job["font_path"],
+        job["mask_image"],
+        job["multi_flag"],
+        job["dpi"],
+        job["max_size"],
+    )
+    return os.path.join(job["output_dir"], f"{job['name']}-{key[:16]}.png")
+
+
+def render_word_cloud_job(job: dict) -> dict:
+    """
+    Render one word cloud to its word_cloud_path; runs in a worker process.
+
+    Args:
+        job (dict): "name", "frequencies", "output_dir", "font_path", "mask_image",
+                    "multi_flag", "dpi", "max_size" and "trace_memory".
+
+    Returns:
+        dict: "name", "path", "cached" (False), "seconds", the worker's peak resident
+              set size ("max_rss_kb") and, with "trace_memory", the peak memory
+              allocated through Python while rendering ("peak_traced_bytes").
+    """
+    start = time.perf_counter()
+    path = word_cloud_path(job)
+    tmp_path = f"{path}.tmp.png"
+
+    if job.get("trace_memory"):
+        tracemalloc.start()
+    try:
+        generate_word_cloud(
+            job["font_path"],
+            job["frequencies"],
+            tmp_path,
+            job["mask_image"],
+            job["multi_flag"],
+            job["dpi"],
+            job["max_size"],
+        )
+        peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+    finally:
+        tracemalloc.stop()
+    os.replace(tmp_path, path)
+
+    return {
+        "name": job["name"],
+        "path": path,
+        "cached": False,
+        "seconds": round(time.perf_counter() - start, 3),
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "peak_traced_bytes": peak,
+    }
+
+
+def render_word_clouds(jobs: List[dict], max_workers: int = 2) -> List[dict]:
+    """
+    Render the word clouds whose image is not cached yet, in parallel worker processes.
+
+    Jobs whose word_cloud_path already exists are answered without starting a worker.
+    Every render gets a fresh process, which keeps each job's peak memory measurement
+    separate and returns the memory of large renders to the system when the job ends.
+
+    Args:
+        jobs (List[dict]): See render_word_cloud_job.
+        max_workers (int, optional): Number of renders running at the same time.
+
+    Returns:
+        List[dict]: One result per job, in job order.
+    """
+    results = {}
+    pending = []
+    for index, job in enumerate(jobs):
+        path = word_cloud_path(job)
+        if os.path.exists(path):
+            results[index] = {
+                "name": job["name"],
+                "path": path,
+                "cached": True,
+                "seconds": 0.0,
+                "max_rss_kb": None,
+                "peak_traced_bytes": None,
+            }
+        else:
+            os.makedirs(job["output_dir"], exist_ok=True)
+            pending.append(index)
+
+    if pending:
+        with ProcessPoolExecutor(
+            max_workers=min(max_workers, len(pending)), max_tasks_per_child=1
+        ) as executor:
+            for index, result in zip(
+                pending,
+                executor.map(render_word_cloud_job, [jobs[index] for index in pending]),
+            ):
+                results[index] = result
+
+    return [results[index] for index in range(len(jobs))]
+
+
+def generate_thumbnail(in_file: str, size=(512, 512)) -> None:
+    """Generates a thumbnail image from the word cloud plot.
+
+    Args:
+        in_file (str): The input file path of the image to generate the thumbnail from.
+        size (tuple, optional): The size of the thumbnail. Defaults to (512, 512).
+
+    Raises:
+        FileNotFoundError: If the input file is not found.
+
+    Returns:
+        None
+    """
+    try:
+        with Image.open(in_file) as tn:
+            tn.thumbnail(size)
+            tn.copy().save(f"{in_file}.thumbnail", "PNG")
+    except FileNotFoundError as e:
+        raise FileNotFoundError(f"No file found at {in_file}...") from e